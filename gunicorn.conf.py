@@ -0,0 +1,18 @@
+# Gunicorn reads this file automatically from the working directory.
+import os
+
+# Build the app once in the master so workers fork with modules imported and
+# the app configured; set GUNICORN_PRELOAD=false to build it in each worker
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+def on_starting(server):
+    # Map the feature matrix in the master so forked workers share its pages
+    from music_ml.stores.feature_matrix import get_feature_matrix
+    get_feature_matrix()
+
+
+def post_worker_init(worker):
+    # Threads don't survive fork, so each worker starts its own
+    from music_ml.app import start_background_tasks
+    start_background_tasks(worker.wsgi)
@@ -3,19 +3,16 @@ from flask import Blueprint, redirect, request, session, url_for, jsonify, curre
 import requests
 from urllib.parse import urlencode
 import logging
-from dotenv import load_dotenv
 from music_ml.models.track import Track
 from music_ml.models.artist import Artist
 from music_ml.models.playlist import Playlist
 from music_ml.services.spotify_service import create_spotify_playlist
+from music_ml.stores.cooccurrence_store import record_playlist
+from music_ml.utils.metrics import track_upstream
+from music_ml.utils.spotify_utils import SPOTIFY_ACCOUNTS_URL, SPOTIFY_API_URL
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv(override=True)  # Force reload environment variables
-
 def init_session_config(app):
     app.secret_key = os.getenv('FLASK_SECRET_KEY', 'dev-secret-key')  # Fallback for development
     app.config.update(
@@ -35,8 +32,6 @@ FRONTEND_URL = os.getenv('FRONTEND_URL')
 @auth_bp.route('/login')
 def login():
     """Redirect users to Spotify's authorization page"""
-    logger.debug("Login route accessed")
-    logger.debug(f"Current session: {session}")
     if not CLIENT_ID:
         logger.error("SPOTIFY_CLIENT_ID not set")
         return jsonify({'error': 'Spotify client ID not configured'}), 500
@@ -44,11 +39,7 @@ def login():
     if not REDIRECT_URI:
         logger.error("SPOTIFY_REDIRECT_URI not set")
         return jsonify({'error': 'Redirect URI not configured'}), 500
-        
-    # Debug log the environment variables
-    logger.debug(f"Using CLIENT_ID: {CLIENT_ID}")
-    logger.debug(f"Using REDIRECT_URI: {REDIRECT_URI}")
-    
+
     scope = 'playlist-modify-public playlist-modify-private'
     params = {
         'client_id': CLIENT_ID,
@@ -58,38 +49,27 @@ def login():
         'show_dialog': True
     }
     
-    auth_url = f'https://accounts.spotify.com/authorize?{urlencode(params)}'
-    logger.debug(f"Generated auth URL: {auth_url}")
+    auth_url = f'{SPOTIFY_ACCOUNTS_URL}/authorize?{urlencode(params)}'
+    logger.debug("Redirecting to Spotify authorization with redirect URI %s", REDIRECT_URI)
     return jsonify({'auth_url': auth_url})
 
 @auth_bp.route('/callback')
 def callback():
     """Handle the callback from Spotify"""
-    logger.debug("Callback route accessed")
-    logger.debug(f"Current session: {session}")
-    logger.debug(f"Callback received with headers: {dict(request.headers)}")
-    logger.debug(f"Session before processing: {session}")
-    
-    # Make session permanent
-    session.permanent = True
-    
     error = request.args.get('error')
     code = request.args.get('code')
-    
-    logger.debug(f"Callback received - Code: {code}, Error: {error}")
-    logger.debug(f"Environment variables - REDIRECT_URI: {REDIRECT_URI}, FRONTEND_URL: {FRONTEND_URL}")
-    
+
     if error:
-        logger.error(f"Spotify auth error: {error}")
+        logger.warning("Spotify authorization failed: %s", error)
         return redirect(f"{FRONTEND_URL}?error={error}")
 
     if not code:
-        logger.error("No code received from Spotify")
+        logger.warning("No code received from Spotify")
         return redirect(f"{FRONTEND_URL}?error=no_code")
 
     try:
         # Exchange the code for access token
-        token_url = 'https://accounts.spotify.com/api/token'
+        token_url = f'{SPOTIFY_ACCOUNTS_URL}/api/token'
         payload = {
             'grant_type': 'authorization_code',
             'code': code,
@@ -98,48 +78,30 @@ def callback():
             'client_secret': CLIENT_SECRET,
         }
 
-        logger.debug(f"Making token request with payload: {payload}")
-        
-        response = requests.post(token_url, data=payload)
-        logger.debug(f"Token response status: {response.status_code}")
-        logger.debug(f"Token response content: {response.text}")
-        
+        response = track_upstream(token_url, lambda: requests.post(token_url, data=payload))
         response.raise_for_status()
         token_info = response.json()
         
-        # Store tokens in session
+        # Store tokens in a permanent session; failed callbacks create none
+        session.permanent = True
         session['access_token'] = token_info['access_token']
         session['refresh_token'] = token_info['refresh_token']
         session['token_expiry'] = token_info['expires_in']
 
-        logger.debug("Successfully stored tokens in session")
+        logger.debug("Stored Spotify tokens in session")
         return redirect(f"{FRONTEND_URL}?success=true")
 
     except requests.exceptions.RequestException as e:
-        logger.error(f"Token exchange error: {str(e)}")
-        logger.error(f"Response content: {getattr(response, 'text', 'No response content')}")
+        logger.error("Token exchange failed: %s (status %s)", e, getattr(e.response, 'status_code', None))
         return redirect(f"{FRONTEND_URL}?error=token_exchange_failed")
-    except Exception as e:
-        logger.error(f"Unexpected error in callback: {str(e)}", exc_info=True)
+    except Exception:
+        logger.exception("Unexpected error in callback")
         return redirect(f"{FRONTEND_URL}?error=unexpected_error")
 
 @auth_bp.route('/check-auth')
 def check_auth():
     """Check if user is authenticated"""
-    logger.debug("Check-auth endpoint accessed")
-    logger.debug(f"Session contents: {session}")
-    logger.debug(f"Request cookies: {request.cookies}")
-    logger.debug(f"Request headers: {dict(request.headers)}")
-    
-    is_authenticated = 'access_token' in session
-    logger.debug(f"Is authenticated: {is_authenticated}")
-    
-    if is_authenticated:
-        logger.debug("User is authenticated")
-        return jsonify({'authenticated': True})
-    else:
-        logger.debug("User is not authenticated")
-        return jsonify({'authenticated': False})
+    return jsonify({'authenticated': 'access_token' in session})
 
 @auth_bp.route('/logout')
 def logout():
@@ -154,7 +116,8 @@ def get_user_info():
         return jsonify({'error': 'Not authenticated'}), 401
         
     headers = {"Authorization": f"Bearer {session['access_token']}"}
-    response = requests.get('https://api.spotify.com/v1/me', headers=headers)
+    me_url = f'{SPOTIFY_API_URL}/me'
+    response = track_upstream(me_url, lambda: requests.get(me_url, headers=headers))
     
     if response.status_code == 200:
         return jsonify(response.json())
@@ -189,6 +152,7 @@ def export_playlist():
         
         # Create the playlist
         result = create_spotify_playlist(playlist_name, playlist.tracks, description)
+        record_playlist(playlist.tracks, source='exported')
         
         return jsonify({
             'success': True,
@@ -196,5 +160,5 @@ def export_playlist():
         })
         
     except Exception as e:
-        logging.error(f"Failed to export playlist: {str(e)}")
+        logger.exception("Failed to export playlist")
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -1,39 +1,112 @@
 import requests
 import logging
+from typing import Tuple
 
 from flask import Blueprint, request, jsonify
 from music_ml.models.track import Track
 from music_ml.models.playlist import Playlist
 from music_ml.matchers.artist_matcher import ArtistMatcher
+from music_ml.matchers.cooccurrence_matcher import CooccurrenceMatcher
+from music_ml.matchers.related_artist_matcher import RelatedArtistMatcher
+from music_ml.rerankers.mmr_reranker import MMRReranker
+from music_ml.services.cache_warmer import get_cache_warmer
 from music_ml.services.spotify_service import get_track_by_id
+from music_ml.stores.cooccurrence_store import record_playlist
+from music_ml.stores.feature_matrix import get_feature_matrix
+from music_ml.stores.tiered_cache import get_cache
+from music_ml.utils.http_caching import apply_caching, compute_etag, not_modified
+from music_ml.utils.json_serializer import parse_projection, playlist_response, track_from_version, track_version
+from music_ml.utils.profiling import span
 
 # Blueprint for playlist API routes
 playlist_bp = Blueprint('playlist', __name__)
 
+MATCHER_NAMES = ('artist', 'related_artist', 'cooccurrence')
+PLAYLIST_SIZE = 20
+# Matchers return this many times the tracks we need so the re-ranker has room to diversify
+OVERFETCH_FACTOR = 2
+
+def get_matcher(name):
+    """Instantiate the matcher registered under `name`."""
+    if name == 'related_artist':
+        return RelatedArtistMatcher()
+    if name == 'cooccurrence':
+        return CooccurrenceMatcher()
+    return ArtistMatcher()
+
+def playlist_cache_key(spotify_track_id, matcher_name, max_per_artist) -> str:
+    return f'{spotify_track_id}|{matcher_name}|{max_per_artist}'
+
+def load_playlist(spotify_track_id, matcher_name='artist', max_per_artist=None, refresh=False) -> Tuple[Playlist, bool]:
+    """
+    Generate the playlist for a seed track, or return it from the cache unless
+    `refresh` is set. Also returns whether it was generated by this call.
+    """
+    generated = []
+
+    def generate():
+        # Use the new service to get the Track object
+        input_track = get_track_by_id(spotify_track_id)
+
+        # Instantiate the requested matcher
+        matcher = get_matcher(matcher_name)
+
+        # Get candidate tracks, then pick and order the playlist for diversity
+        with span(f'{type(matcher).__name__}.match'):
+            candidates = matcher.match(input_track, n=(PLAYLIST_SIZE - 1) * OVERFETCH_FACTOR)
+        with span('MMRReranker.rerank'):
+            reranker = MMRReranker(max_per_artist=max_per_artist, feature_matrix=get_feature_matrix().current())
+            matching_tracks = reranker.rerank(input_track, candidates, n=PLAYLIST_SIZE - 1)
+
+        generated.append(True)
+        # Playlist including the original track, cached as plain tuples
+        return [track_version(track) for track in [input_track] + matching_tracks]
+
+    key = playlist_cache_key(spotify_track_id, matcher_name, max_per_artist)
+    versions = get_cache().get_or_load('playlist', key, generate, refresh=refresh)
+    return Playlist(tracks=[track_from_version(version) for version in versions]), bool(generated)
+
+def build_playlist(spotify_track_id, matcher_name='artist', max_per_artist=None, refresh=False) -> Playlist:
+    """Like load_playlist, logging the playlist for co-occurrence if it was generated rather than cached."""
+    playlist, generated = load_playlist(spotify_track_id, matcher_name, max_per_artist, refresh)
+    if generated:
+        record_playlist(playlist.tracks, source='generated')
+    return playlist
+
 @playlist_bp.route('/generate_playlist', methods=['GET'])
 def generate_playlist():
     spotify_track_id = request.args.get('spotify_track_id')
+    matcher_name = request.args.get('matcher', 'artist')
+    max_per_artist = request.args.get('max_per_artist', type=int)
 
     if not spotify_track_id:
         return jsonify({'error': 'spotify_track_id is required'}), 400
 
-    try:
-        # Use the new service to get the Track object
-        input_track = get_track_by_id(spotify_track_id)
-
-        # Instantiate ArtistMatcher
-        artist_matcher = ArtistMatcher()
+    if matcher_name not in MATCHER_NAMES:
+        return jsonify({'error': f'matcher must be one of {", ".join(MATCHER_NAMES)}'}), 400
 
-        # Get matching tracks
-        matching_tracks = artist_matcher.match(input_track, n=19)
+    if max_per_artist is not None and max_per_artist < 1:
+        return jsonify({'error': 'max_per_artist must be at least 1'}), 400
 
-        # Create playlist including the original track
-        playlist_tracks = [input_track] + matching_tracks
+    try:
+        fields, compact = parse_projection(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-        # Create a Playlist object
-        playlist = Playlist(tracks=playlist_tracks)
+    try:
+        playlist, generated = load_playlist(spotify_track_id, matcher_name, max_per_artist)
+        get_cache_warmer().record_seed(spotify_track_id, matcher_name, max_per_artist)
 
-        return jsonify({'playlist': playlist})
+        etag = compute_etag([track.spotify_track_id for track in playlist.tracks], fields, compact)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        # Logged only when generated and sent: cache hits were logged when generated, and 304s repeat a playlist
+        if generated:
+            record_playlist(playlist.tracks, source='generated')
+        with span('serialize'):
+            response = playlist_response(playlist, fields, compact)
+        return apply_caching(response, etag)
 
     except requests.exceptions.RequestException as e:
         logging.exception("RequestException occurred.")
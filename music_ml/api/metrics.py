@@ -0,0 +1,11 @@
+from flask import Blueprint, Response
+
+from music_ml.utils.metrics import CONTENT_TYPE, collect_metrics
+
+# Blueprint for the Prometheus scrape endpoint
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Request, Spotify and cache metrics for every worker process, in Prometheus text format."""
+    return Response(collect_metrics(), mimetype=None, content_type=CONTENT_TYPE)
@@ -1,25 +1,166 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, copy_current_request_context, request, jsonify
+from music_ml.indexes.prefix_index import Suggestion, get_prefix_index
+from music_ml.indexes.text_index import get_text_index
+from music_ml.services.cache_warmer import get_cache_warmer
 from music_ml.services.spotify_service import search_spotify_tracks
 from music_ml.models.track import Track
+from music_ml.utils.http_caching import apply_caching, compute_etag, not_modified
+from music_ml.utils.json_serializer import encode_value, json_bytes_response, parse_projection, search_response
+from music_ml.utils.pagination import decode_cursor, next_cursor, normalize_page_size
+
+logger = logging.getLogger(__name__)
+
+# 'fallback': Spotify first, the local catalog index when Spotify fails; 'local_first':
+# the local index first, Spotify when it finds nothing; 'spotify': Spotify only
+SEARCH_MODE = os.getenv('SEARCH_MODE', 'fallback')
+
+PREFETCH_WORKERS = 4
+
+SUGGEST_LIMIT = 8
+MAX_SUGGEST_LIMIT = 20
 
 # Blueprint for search API routes
 search_bp = Blueprint('search', __name__)
 
+_prefetching = set()
+_prefetching_lock = threading.Lock()
+_prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='search-prefetch')
+
 @search_bp.route('/search', methods=['GET'])
 def search_tracks():
-    query = request.args.get('query')
-    limit = request.args.get('limit', 20)
+    """
+    Search tracks one page at a time. The first page is requested with
+    `query` (and optional `limit`); each response carries a `next_cursor`
+    to pass back as `cursor` for the following page, which is prefetched in
+    the background while the client shows the current one.
+    """
+    try:
+        if request.args.get('cursor'):
+            query, offset, limit = decode_cursor(request.args['cursor'])
+        else:
+            query, offset, limit = request.args.get('query'), 0, normalize_page_size(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e) if request.args.get('cursor') else 'limit must be a positive integer'}), 400
 
     if not query:
         return jsonify({'error': 'Query parameter is required'}), 400
 
-    # Use the Spotify search service to get track data
     try:
-        tracks = search_spotify_tracks(query, limit)
+        fields, compact = parse_projection(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        tracks, source = find_tracks(query, limit, offset)
+    except requests.exceptions.RequestException as e:
+        return jsonify({'error': str(e)}), 500
+    if offset == 0:
+        get_cache_warmer().record_query(query, limit)
+
+    cursor = next_cursor(query, offset, limit, len(tracks))
+    if cursor:
+        prefetch_page(query, offset + limit, limit)
 
-        return jsonify({'tracks': tracks, 'total_results': len(tracks)})
+    etag = compute_etag([track.spotify_track_id for track in tracks], fields, compact, cursor)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    response = apply_caching(search_response(tracks, fields, compact, next_cursor=cursor), etag)
+    response.headers['X-Search-Source'] = source
+    return response
 
+def prefetch_page(query: str, offset: int, limit: int):
+    """
+    Fetch a page in the background. Spotify results land in the shared cache,
+    so the client's next request is answered without an upstream call by
+    whichever worker receives it.
+    """
+    key = (query, offset, limit)
+    with _prefetching_lock:
+        if key in _prefetching:
+            return
+        _prefetching.add(key)
+
+    # Spotify calls read the user's token from the session, so run with this request's context
+    @copy_current_request_context
+    def fetch():
+        try:
+            find_tracks(query, limit, offset)
+        except requests.exceptions.RequestException as e:
+            logger.info('Prefetching search page failed: %s', e)
+        finally:
+            with _prefetching_lock:
+                _prefetching.discard(key)
+
+    _prefetch_executor.submit(fetch)
+
+def find_tracks(query: str, limit: int, offset: int = 0):
+    """
+    Search Spotify and/or the local catalog index according to SEARCH_MODE.
+    Returns (tracks, source); raises the Spotify error when there is no local answer.
+    """
+    index = get_text_index()
+    if SEARCH_MODE == 'local_first':
+        tracks = index.search(query, offset + limit)[offset:]
+        if tracks:
+            return tracks, 'local'
+
+    try:
+        tracks = search_spotify_tracks(query, limit, offset)
     except requests.exceptions.RequestException as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        if SEARCH_MODE == 'spotify':
+            raise
+        tracks = index.search(query, offset + limit)[offset:]
+        if not tracks:
+            raise
+        logger.warning('Spotify search failed, answering from the local index: %s', e)
+        return tracks, 'local'
+
+    get_prefix_index().add_search(query, tracks)
+    if SEARCH_MODE != 'spotify':
+        index.add_tracks(tracks)
+    return tracks, 'spotify'
+
+@search_bp.route('/search/suggest', methods=['GET'])
+def suggest():
+    """
+    Search-as-you-type: complete a partial query from the local prefix index.
+    Only prefixes the index cannot answer (and that are long enough) go to
+    Spotify, and their results are indexed so the following keystrokes don't.
+    """
+    query = request.args.get('query', '')
+    try:
+        limit = min(max(int(request.args.get('limit', SUGGEST_LIMIT)), 1), MAX_SUGGEST_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    index = get_prefix_index()
+    suggestions = index.lookup(query, limit)
+    source = 'local'
+    if not suggestions and index.should_fetch(query):
+        try:
+            tracks = search_spotify_tracks(query, MAX_SUGGEST_LIMIT)
+        except requests.exceptions.RequestException as e:
+            # Suggestions are best effort; an empty list is better than an error on every keystroke
+            logger.warning('Upstream suggestion search failed: %s', e)
+            tracks = []
+        else:
+            index.mark_fetched(query)
+            index.add_tracks(tracks)
+            source = 'spotify'
+        # Spotify matches more loosely than a prefix; keep its ranking if nothing matches locally
+        suggestions = index.lookup(query, limit) or [
+            Suggestion(track.track_name, 'track', track.spotify_track_id, track.artist.name) for track in tracks[:limit]
+        ]
+
+    return json_bytes_response(encode_value({
+        'suggestions': [suggestion.to_dict() for suggestion in suggestions],
+        'source': source,
+    }))
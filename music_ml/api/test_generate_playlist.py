@@ -98,4 +98,91 @@ def test_generate_playlist_api_error(mock_get_track_by_id, client):
 
     # Assert that the error message is returned
     assert 'error' in json_data
-    assert json_data['error'] == 'Spotify API error'
\ No newline at end of file
+    assert json_data['error'] == 'Spotify API error'
+
+@patch('music_ml.api.generate_playlist.get_track_by_id')
+@patch('music_ml.api.generate_playlist.RelatedArtistMatcher')
+def test_generate_playlist_related_artist_matcher(mock_related_matcher_class, mock_get_track_by_id, client):
+    input_track = Track(
+        spotify_track_id='track1',
+        track_name='Input Track',
+        artist=Artist(spotify_artist_id='artist123', name='Test Artist')
+    )
+    mock_get_track_by_id.return_value = input_track
+    mock_related_matcher_class.return_value.match.return_value = [
+        Track(
+            spotify_track_id='track2',
+            track_name='Related Track',
+            artist=Artist(spotify_artist_id='artist456', name='Related Artist')
+        )
+    ]
+
+    response = client.get('/generate_playlist?spotify_track_id=track1&matcher=related_artist')
+
+    assert response.status_code == 200
+    tracks = response.get_json()['playlist']['tracks']
+    assert [track['spotify_track_id'] for track in tracks] == ['track1', 'track2']
+
+def test_generate_playlist_unknown_matcher(client):
+    response = client.get('/generate_playlist?spotify_track_id=track1&matcher=unknown')
+
+    assert response.status_code == 400
+    assert 'matcher must be one of' in response.get_json()['error']
+
+def test_generate_playlist_rejects_max_per_artist_below_one(client):
+    for value in ('0', '-2'):
+        response = client.get(f'/generate_playlist?spotify_track_id=track1&max_per_artist={value}')
+
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'max_per_artist must be at least 1'
+
+@patch('music_ml.api.generate_playlist.record_playlist')
+@patch('music_ml.api.generate_playlist.get_track_by_id')
+@patch('music_ml.api.generate_playlist.ArtistMatcher')
+def test_generate_playlist_conditional_get(mock_artist_matcher_class, mock_get_track_by_id, mock_record_playlist,
+                                           client):
+    artist = Artist(spotify_artist_id='artist123', name='Test Artist')
+    mock_get_track_by_id.return_value = Track(spotify_track_id='track1', track_name='Input Track', artist=artist)
+    mock_artist_matcher_class.return_value.match.return_value = [
+        Track(spotify_track_id='track2', track_name='Test Track 2', artist=artist)
+    ]
+
+    first = client.get('/generate_playlist?spotify_track_id=track1')
+    assert first.headers['ETag']
+    assert 'max-age' in first.headers['Cache-Control']
+
+    with patch('music_ml.api.generate_playlist.get_cache') as mock_get_cache:
+        # Regenerated, as if the cached playlist had expired, and unchanged
+        mock_get_cache.return_value.get_or_load.side_effect = lambda namespace, key, load, **options: load()
+        second = client.get('/generate_playlist?spotify_track_id=track1',
+                            headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+    # The 304 repeats a playlist the client already has, so it is not logged again
+    mock_record_playlist.assert_called_once()
+
+    # A different projection is a different representation
+    third = client.get('/generate_playlist?spotify_track_id=track1&fields=spotify_track_id',
+                       headers={'If-None-Match': first.headers['ETag']})
+    assert third.status_code == 200
+
+@patch('music_ml.api.generate_playlist.record_playlist')
+@patch('music_ml.api.generate_playlist.get_track_by_id')
+@patch('music_ml.api.generate_playlist.ArtistMatcher')
+def test_generate_playlist_is_cached(mock_artist_matcher_class, mock_get_track_by_id, mock_record_playlist, client):
+    input_track = Track(spotify_track_id='track1', track_name='Input Track',
+                        artist=Artist(spotify_artist_id='artist123', name='Test Artist'), tempo=120.0)
+    mock_get_track_by_id.return_value = input_track
+    mock_artist_matcher_class.return_value.match.return_value = [
+        Track(spotify_track_id='track2', track_name='Test Track 2',
+              artist=Artist(spotify_artist_id='artist123', name='Test Artist'))
+    ]
+
+    first = client.get('/generate_playlist?spotify_track_id=track1')
+    second = client.get('/generate_playlist?spotify_track_id=track1')
+
+    assert first.get_json() == second.get_json()
+    assert second.get_json()['playlist']['tracks'][0]['tempo'] == 120.0
+    mock_get_track_by_id.assert_called_once()
+    mock_artist_matcher_class.return_value.match.assert_called_once()
+    # Only the generated playlist is logged for co-occurrence, not the cache hit
+    mock_record_playlist.assert_called_once()
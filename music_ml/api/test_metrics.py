@@ -0,0 +1,28 @@
+from unittest.mock import patch
+
+import pytest
+from flask import Flask
+
+from music_ml.api.metrics import metrics_bp
+from music_ml.utils.metrics import MetricsStore
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = Flask(__name__)
+    app.register_blueprint(metrics_bp)
+    app.config['TESTING'] = True
+
+    with patch('music_ml.utils.metrics.get_metrics_store', return_value=MetricsStore(str(tmp_path / 'metrics.db'))):
+        with app.test_client() as client:
+            yield client
+
+
+def test_metrics_text_format(client):
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    assert '# TYPE music_ml_spotify_request_duration_seconds histogram' in text
+    assert 'music_ml_cache_requests_total{namespace="search",layer="l1",result="hit"} 0.0' in text
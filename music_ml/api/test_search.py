@@ -1,7 +1,10 @@
 import pytest
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask
 from music_ml.api.search import search_bp
+from music_ml.indexes.prefix_index import PrefixIndex
+from music_ml.indexes.text_index import TextIndex
 from unittest.mock import patch
 from music_ml.models.track import Track
 from music_ml.models.artist import Artist
@@ -17,6 +20,14 @@ def client():
     with app.test_client() as client:
         yield client
 
+@pytest.fixture(autouse=True)
+def text_index():
+    # Fresh local indexes per test, so results learned in one test don't answer another
+    index = TextIndex()
+    with patch('music_ml.api.search.get_text_index', return_value=index), \
+            patch('music_ml.api.search.get_prefix_index', return_value=PrefixIndex()):
+        yield index
+
 @patch('music_ml.api.search.search_spotify_tracks')
 def test_search_tracks_success(mock_search_spotify_tracks, client):
     # Mock the response from the search_spotify_tracks function
@@ -73,4 +84,194 @@ def test_search_tracks_api_error(mock_search_spotify_tracks, client):
 
     # Assert that the error message is returned
     assert 'error' in json_data
-    assert json_data['error'] == "Spotify API error"
\ No newline at end of file
+    assert json_data['error'] == "Spotify API error"
+
+@patch('music_ml.api.search.search_spotify_tracks')
+def test_search_tracks_compact_projection(mock_search_spotify_tracks, client):
+    mock_search_spotify_tracks.return_value = [
+        Track(
+            spotify_track_id='track123',
+            track_name='Test Track',
+            artist=Artist(spotify_artist_id='id', name='Test Artist')
+        )
+    ]
+
+    response = client.get('/search?query=test&fields=spotify_track_id,artist.name&format=compact')
+
+    assert response.status_code == 200
+    assert response.get_json() == {
+        'fields': ['spotify_track_id', 'artist.name'],
+        'total_results': 1,
+        'tracks': [['track123', 'Test Artist']]
+    }
+
+def test_search_tracks_unknown_field(client):
+    response = client.get('/search?query=test&fields=popularity')
+
+    assert response.status_code == 400
+    assert 'Unknown field' in response.get_json()['error']
+
+@patch('music_ml.api.search.search_spotify_tracks')
+def test_search_tracks_conditional_get(mock_search_spotify_tracks, client):
+    mock_search_spotify_tracks.return_value = [
+        Track(
+            spotify_track_id='track123',
+            track_name='Test Track',
+            artist=Artist(spotify_artist_id='id', name='Test Artist')
+        )
+    ]
+
+    first = client.get('/search?query=test')
+    assert 'max-age' in first.headers['Cache-Control']
+
+    second = client.get('/search?query=test', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+
+@patch('music_ml.api.search.search_spotify_tracks')
+def test_suggest_answers_locally_after_first_upstream_call(mock_search_spotify_tracks, client):
+    mock_search_spotify_tracks.return_value = [
+        Track(
+            spotify_track_id='track123',
+            track_name='Yesterday',
+            artist=Artist(spotify_artist_id='id', name='The Beatles')
+        )
+    ]
+
+    with patch('music_ml.api.search.get_prefix_index', return_value=PrefixIndex()):
+        response = client.get('/search/suggest?query=yes')
+        assert response.status_code == 200
+        assert response.get_json()['source'] == 'spotify'
+        assert response.get_json()['suggestions'][0]['spotify_id'] == 'track123'
+
+        for query in ('yest', 'yesterd', 'beat', 'y', 'yesz'):
+            response = client.get(f'/search/suggest?query={query}')
+            assert response.get_json()['source'] == 'local'
+
+    mock_search_spotify_tracks.assert_called_once_with('yes', 20)
+
+@patch('music_ml.api.search.search_spotify_tracks')
+def test_suggest_learns_from_search(mock_search_spotify_tracks, client):
+    mock_search_spotify_tracks.return_value = [
+        Track(
+            spotify_track_id='track123',
+            track_name='Test Track',
+            artist=Artist(spotify_artist_id='id', name='Test Artist')
+        )
+    ]
+
+    with patch('music_ml.api.search.get_prefix_index', return_value=PrefixIndex()):
+        client.get('/search?query=test')
+        response = client.get('/search/suggest?query=te')
+
+    assert [s['text'] for s in response.get_json()['suggestions']] == ['test', 'Test Track', 'Test Artist']
+    mock_search_spotify_tracks.assert_called_once()
+
+@patch('music_ml.api.search.search_spotify_tracks')
+def test_suggest_upstream_error_returns_empty(mock_search_spotify_tracks, client):
+    mock_search_spotify_tracks.side_effect = requests.exceptions.RequestException('API error')
+
+    with patch('music_ml.api.search.get_prefix_index', return_value=PrefixIndex()):
+        response = client.get('/search/suggest?query=anything')
+
+    assert response.status_code == 200
+    assert response.get_json()['suggestions'] == []
+
+def test_suggest_invalid_limit(client):
+    response = client.get('/search/suggest?query=a&limit=x')
+    assert response.status_code == 400
+
+@patch('music_ml.api.search.search_spotify_tracks')
+def test_search_falls_back_to_local_index(mock_search_spotify_tracks, client, text_index):
+    text_index.add_tracks([
+        Track(spotify_track_id='track123', track_name='Test Track', artist=Artist(spotify_artist_id='id', name='Artist'))
+    ])
+    mock_search_spotify_tracks.side_effect = requests.exceptions.RequestException('429 Too Many Requests')
+
+    response = client.get('/search?query=test')
+
+    assert response.status_code == 200
+    assert response.headers['X-Search-Source'] == 'local'
+    assert response.get_json()['tracks'][0]['spotify_track_id'] == 'track123'
+
+    with patch('music_ml.api.search.SEARCH_MODE', 'spotify'):
+        assert client.get('/search?query=test').status_code == 500
+
+@patch('music_ml.api.search.search_spotify_tracks')
+def test_search_indexes_spotify_results(mock_search_spotify_tracks, client, text_index):
+    mock_search_spotify_tracks.return_value = [
+        Track(spotify_track_id='track123', track_name='Test Track', artist=Artist(spotify_artist_id='id', name='Artist'))
+    ]
+
+    response = client.get('/search?query=test')
+
+    assert response.headers['X-Search-Source'] == 'spotify'
+    assert [track.spotify_track_id for track in text_index.search('artist')] == ['track123']
+
+@patch('music_ml.api.search.search_spotify_tracks')
+def test_search_local_first(mock_search_spotify_tracks, client, text_index):
+    text_index.add_tracks([
+        Track(spotify_track_id='track123', track_name='Test Track', artist=Artist(spotify_artist_id='id', name='Artist'))
+    ])
+    mock_search_spotify_tracks.return_value = []
+
+    with patch('music_ml.api.search.SEARCH_MODE', 'local_first'):
+        local = client.get('/search?query=test')
+        remote = client.get('/search?query=unknown')
+
+    assert local.headers['X-Search-Source'] == 'local'
+    assert remote.headers['X-Search-Source'] == 'spotify'
+    mock_search_spotify_tracks.assert_called_once_with('unknown', 20, 0)
+
+
+def make_page(query, limit=20, offset=0):
+    return [
+        Track(spotify_track_id=f'track{offset + i}', track_name=f'{query} {offset + i}',
+              artist=Artist(spotify_artist_id='id', name='Test Artist'))
+        for i in range(limit)
+    ]
+
+@patch('music_ml.api.search.search_spotify_tracks')
+def test_search_cursor_pagination_with_prefetch(mock_search_spotify_tracks, client):
+    mock_search_spotify_tracks.side_effect = make_page
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    with patch('music_ml.api.search._prefetch_executor', executor):
+        first = client.get('/search?query=test')
+        executor.shutdown(wait=True)
+
+    first_page = first.get_json()
+    assert [track['spotify_track_id'] for track in first_page['tracks']][:2] == ['track0', 'track1']
+    # The second page was prefetched while the first was being read
+    mock_search_spotify_tracks.assert_called_with('test', 20, 20)
+    assert mock_search_spotify_tracks.call_count == 2
+
+    with patch('music_ml.api.search.prefetch_page'):
+        second = client.get(f"/search?cursor={first_page['next_cursor']}")
+    assert second.get_json()['tracks'][0]['spotify_track_id'] == 'track20'
+    assert second.get_json()['next_cursor']
+    mock_search_spotify_tracks.assert_called_with('test', 20, 20)
+
+@patch('music_ml.api.search.search_spotify_tracks')
+def test_search_last_page_has_no_cursor(mock_search_spotify_tracks, client):
+    mock_search_spotify_tracks.return_value = make_page('test', limit=3)
+
+    response = client.get('/search?query=test')
+
+    assert 'next_cursor' not in response.get_json()
+    assert mock_search_spotify_tracks.call_count == 1
+
+@patch('music_ml.api.search.search_spotify_tracks')
+def test_search_limit_is_normalized(mock_search_spotify_tracks, client):
+    mock_search_spotify_tracks.return_value = []
+
+    client.get('/search?query=test&limit=500')
+    client.get('/search?query=other&limit=15')
+
+    assert [call.args for call in mock_search_spotify_tracks.call_args_list] == [('test', 50, 0), ('other', 20, 0)]
+
+def test_search_invalid_limit_and_cursor(client):
+    assert client.get('/search?query=test&limit=abc').status_code == 400
+    assert client.get('/search?query=test&limit=0').status_code == 400
+    response = client.get('/search?cursor=garbage')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid cursor'
@@ -1,52 +1,38 @@
+import time
+
+_import_started = time.perf_counter()
+
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify
+
+# Load environment variables before any music_ml module reads its settings
+load_dotenv()
+
+from flask import Flask
 from flask_cors import CORS
-from flask_session import Session
-from flask_sqlalchemy import SQLAlchemy
 from datetime import timedelta
+from typing import Optional
 import logging
 import os
-import secrets
-
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__)
-
-# Load environment variables
-load_dotenv()
 
-app = Flask(__name__)
-
-# Database configuration
-if os.getenv('FLASK_ENV') == 'development':
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///dev.db'
-else:
-    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', '').replace('postgres://', 'postgresql://')
-
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Session configuration
-app.config.update(
-    SECRET_KEY=os.getenv('FLASK_SECRET_KEY', 'dev-secret-key'),
-    SESSION_TYPE='sqlalchemy',
-    PERMANENT_SESSION_LIFETIME=timedelta(hours=24),
-    SESSION_COOKIE_NAME='spotify_auth_session',
-    SESSION_COOKIE_SECURE=False if os.getenv('FLASK_ENV') == 'development' else True,
-    SESSION_COOKIE_HTTPONLY=True,
-    SESSION_COOKIE_SAMESITE='Lax' if os.getenv('FLASK_ENV') == 'development' else 'None',
-    SESSION_COOKIE_DOMAIN='127.0.0.1' if os.getenv('FLASK_ENV') == 'development' else None
-)
-
-# Initialize SQLAlchemy
-db = SQLAlchemy(app)
-app.config['SESSION_SQLALCHEMY'] = db
+from music_ml.api.auth import auth_bp
+from music_ml.api.generate_playlist import playlist_bp
+from music_ml.api.metrics import metrics_bp
+from music_ml.api.search import search_bp
+from music_ml.services.cache_warmer import start_cache_warmer
+from music_ml.stores.catalog_store import get_database_url
+from music_ml.stores.cooccurrence_store import start_cooccurrence_updater
+from music_ml.stores.session_store import SESSION_BACKEND, create_schema, init_sessions, start_session_purger
+from music_ml.utils.metrics import init_metrics, start_metrics_flusher
+from music_ml.utils.profiling import init_profiling
+from music_ml.utils.rate_limit import init_rate_limiting
+from music_ml.utils.structured_logging import configure_logging, init_request_logging
+from music_ml.utils.traffic_capture import init_traffic_capture
 
-# Initialize Flask-Session
-Session(app)
+# Structured logs written by a background thread (LOG_LEVEL, LOG_FORMAT)
+configure_logging()
+logger = logging.getLogger(__name__)
 
-# Create tables
-with app.app_context():
-    db.create_all()
+IMPORT_SECONDS = time.perf_counter() - _import_started
 
 # Define allowed origins
 ALLOWED_ORIGINS = [
@@ -57,34 +43,105 @@ ALLOWED_ORIGINS = [
     'https://musaic-backend-3d46a4f2ff11.herokuapp.com'
 ]
 
-# Update CORS configuration
-CORS(app, 
-     origins=ALLOWED_ORIGINS,
-     supports_credentials=True,
-     allow_headers=["Content-Type", "Authorization", "Access-Control-Allow-Credentials"],
-     expose_headers=["Set-Cookie"],
-     methods=["GET", "POST", "OPTIONS"])
-
-@app.after_request
-def after_request(response):
-    if os.getenv('FLASK_ENV') == 'development':
-        response.headers.add('Access-Control-Allow-Origin', 'http://127.0.0.1:3000')
-    else:
-        response.headers.add('Access-Control-Allow-Origin', 'https://musaic-frontend-7a12a4566f21.herokuapp.com')
-    response.headers.add('Access-Control-Allow-Credentials', 'true')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-    response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
-    return response
-
-# Import and register blueprints
-from music_ml.api.search import search_bp
-from music_ml.api.generate_playlist import playlist_bp
-from music_ml.api.auth import auth_bp
 
-app.register_blueprint(search_bp)
-app.register_blueprint(playlist_bp)
-app.register_blueprint(auth_bp)
+def create_app(config: Optional[dict] = None) -> Flask:
+    """
+    Build the Flask app; `config` overrides the environment-derived settings.
+
+    Nothing here connects to a database or Spotify or starts a thread, so the
+    app can be built once in gunicorn's master (preload_app) and forked;
+    each serving process then calls start_background_tasks().
+    """
+    started = time.perf_counter()
+    app = Flask(__name__)
+    development = os.getenv('FLASK_ENV') == 'development'
+
+    # Database and session configuration
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=get_database_url(),
+        SESSION_BACKEND=SESSION_BACKEND,
+        SECRET_KEY=os.getenv('FLASK_SECRET_KEY', 'dev-secret-key'),
+        PERMANENT_SESSION_LIFETIME=timedelta(hours=24),
+        SESSION_COOKIE_NAME='spotify_auth_session',
+        SESSION_COOKIE_SECURE=not development,
+        SESSION_COOKIE_HTTPONLY=True,
+        SESSION_COOKIE_SAMESITE='Lax' if development else 'None',
+        SESSION_COOKIE_DOMAIN='127.0.0.1' if development else None
+    )
+    app.config.update(config or {})
+
+    # Server-side sessions, loaded only by requests that use them
+    app.extensions['session_store'] = init_sessions(
+        app, backend=app.config['SESSION_BACKEND'], database_url=app.config['SQLALCHEMY_DATABASE_URI'])
+
+    CORS(app,
+         origins=ALLOWED_ORIGINS,
+         supports_credentials=True,
+         allow_headers=["Content-Type", "Authorization", "Access-Control-Allow-Credentials"],
+         expose_headers=["Set-Cookie"],
+         methods=["GET", "POST", "OPTIONS"])
+
+    @app.after_request
+    def after_request(response):
+        if development:
+            response.headers.add('Access-Control-Allow-Origin', 'http://127.0.0.1:3000')
+        else:
+            response.headers.add('Access-Control-Allow-Origin', 'https://musaic-frontend-7a12a4566f21.herokuapp.com')
+        response.headers.add('Access-Control-Allow-Credentials', 'true')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+        return response
+
+    app.register_blueprint(search_bp)
+    app.register_blueprint(playlist_bp)
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(metrics_bp)
+
+    # Per-route latency, status and in-flight metrics, published for the other workers to report
+    init_metrics(app)
+    # Opt-in capture of sanitized requests for replay (TRAFFIC_CAPTURE_DIR); ahead of rate limiting so 429s are kept
+    init_traffic_capture(app)
+    # Per-client token buckets (RATE_LIMITS) and fair shares of the Spotify budget; 429 + Retry-After when exceeded
+    init_rate_limiting(app)
+    # Opt-in request profiling: sampled, header-triggered or slow requests get a span breakdown
+    init_profiling(app)
+    # One access line per sampled request (LOG_SAMPLE_RATES); unsampled requests skip DEBUG/INFO records
+    init_request_logging(app)
+
+    @app.cli.command('init-db')
+    def init_db():
+        """Create the session tables (they are otherwise created on first use)."""
+        create_schema(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    app.config['BOOT_TIMINGS'] = {'import': IMPORT_SECONDS, 'create_app': time.perf_counter() - started}
+    logger.info('App created in %.1f ms (imports took %.1f ms)',
+                app.config['BOOT_TIMINGS']['create_app'] * 1000, IMPORT_SECONDS * 1000)
+    return app
+
+
+def start_background_tasks(app: Flask):
+    """Start this process's background threads. Call once per serving process, after any fork."""
+    # Per-worker metrics snapshots for /metrics
+    start_metrics_flusher()
+    # Fold generated and exported playlists into the co-occurrence store
+    start_cooccurrence_updater()
+    # Keep popular playlists and searches warm in the shared cache
+    start_cache_warmer()
+    # Batch-delete expired sessions (stores that expire on their own need nothing)
+    start_session_purger(app.extensions.get('session_store'))
+
+
+def __getattr__(name):
+    # `music_ml.app:app` keeps working; the app is only built when first asked for
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
 
 if __name__ == '__main__':
+    app = create_app()
+    start_background_tasks(app)
     port = int(os.getenv('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=port)
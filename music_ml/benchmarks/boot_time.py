@@ -0,0 +1,118 @@
+"""
+Measure how long the app takes to import, build and serve its first request,
+in fresh interpreters, and how long gunicorn takes to become ready with and
+without preload_app.
+
+    python -m music_ml.benchmarks.boot_time --runs 5 --workers 4
+"""
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from music_ml.benchmarks.load_test import free_port, stop_servers
+
+# Runs in a fresh interpreter; times are in seconds
+PROBE = """
+import json, time
+started = time.perf_counter()
+import music_ml.app as module
+imported = time.perf_counter()
+app = module.create_app()
+created = time.perf_counter()
+app.test_client().get('/api/auth/check-auth')
+served = time.perf_counter()
+print(json.dumps({'import': imported - started, 'create_app': created - imported, 'first_request': served - created}))
+"""
+
+
+def scratch_env(workdir: str) -> dict:
+    """Environment that keeps every local store in `workdir`."""
+    return {
+        **os.environ,
+        'SPOTIFY_CLIENT_ID': 'benchmark', 'SPOTIFY_CLIENT_SECRET': 'benchmark',
+        'SPOTIFY_REDIRECT_URI': 'http://127.0.0.1/callback',
+        'DATABASE_URL': f'sqlite:///{os.path.join(workdir, "app.db")}',
+        'CACHE_DB_PATH': os.path.join(workdir, 'cache.db'),
+        'METRICS_DB_PATH': os.path.join(workdir, 'metrics.db'),
+        'COOCCURRENCE_DB_PATH': os.path.join(workdir, 'cooccurrence.db'),
+        'ARTIST_GRAPH_DB_PATH': os.path.join(workdir, 'artist_graph.db'),
+        'FEATURE_MATRIX_PATH': os.path.join(workdir, 'feature_matrix'),
+        'PROFILE_DIR': os.path.join(workdir, 'profiles'),
+    }
+
+
+def measure_in_process(env: dict) -> dict:
+    output = subprocess.check_output([sys.executable, '-c', PROBE], env=env, text=True, stderr=subprocess.DEVNULL)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_gunicorn(env: dict, workers: int, preload: bool, timeout: float = 60.0) -> float:
+    """
+    Seconds from starting gunicorn until it answers and every worker has
+    finished post_worker_init (each worker's metrics flusher publishes
+    immediately, so the shared metrics file lists the workers that are up).
+    """
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen([
+        sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+        '--log-level', 'warning', 'music_ml.app:create_app()',
+    ], env={**env, 'GUNICORN_PRELOAD': str(preload).lower()}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        ready = 0
+        while time.perf_counter() - started < timeout:
+            try:
+                requests.get(f'http://127.0.0.1:{port}/api/auth/check-auth', timeout=5)
+                ready = published_workers(env['METRICS_DB_PATH'])
+                if ready >= workers:
+                    return time.perf_counter() - started
+            except (requests.exceptions.RequestException, sqlite3.Error):
+                pass
+            time.sleep(0.02)
+        raise RuntimeError(f'only {ready} of {workers} workers came up within {timeout}s')
+    finally:
+        stop_servers([process])
+
+
+def published_workers(path: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    with sqlite3.connect(path, timeout=5) as conn:
+        return conn.execute('SELECT COUNT(*) FROM worker_metrics').fetchone()[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure app import, build and gunicorn start-up time.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers (0 skips the gunicorn runs)')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='music_ml-boot-') as workdir:
+        env = scratch_env(workdir)
+        samples = [measure_in_process(env) for _ in range(args.runs)]
+        for phase in ('import', 'create_app', 'first_request'):
+            values = [sample[phase] * 1000 for sample in samples]
+            print(f'{phase:>14}: median {statistics.median(values):7.1f} ms  max {max(values):7.1f} ms')
+
+        if args.workers:
+            for preload in (False, True):
+                timings = []
+                for _ in range(args.runs):
+                    for suffix in ('', '-wal', '-shm'):
+                        if os.path.exists(env['METRICS_DB_PATH'] + suffix):
+                            os.remove(env['METRICS_DB_PATH'] + suffix)
+                    timings.append(measure_gunicorn(env, args.workers, preload) * 1000)
+                print(f'gunicorn {args.workers} workers, preload={str(preload).lower():5}: '
+                      f'median {statistics.median(timings):7.1f} ms to all workers ready')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+"""
+End-to-end load test: runs the app under gunicorn against the local Spotify
+stand-in and measures throughput and latency per endpoint and concurrency.
+
+    python -m music_ml.benchmarks.load_test --concurrency 1 8 32 --duration 10 \\
+        --output bench/latest.json --compare bench/baseline.json
+
+Results are written as JSON (one entry per scenario and concurrency level,
+plus the run's parameters and git revision), so runs can be compared with
+--compare or diffed by other tools.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import requests
+
+from music_ml.benchmarks.spotify_stub import ARTIST_COUNT, TRACKS_PER_ARTIST, track_id
+
+SCENARIOS = ('search', 'generate_playlist', 'export_playlist')
+QUERY_POOL = 500
+SEED_POOL = 200
+# Popularity skew of queries and seeds; real traffic is dominated by a few
+ZIPF_EXPONENT = 1.1
+# p50/p99 growth or RPS drop beyond this fraction is reported as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=5)
+            return
+        except requests.exceptions.RequestException:
+            # Not listening yet, or a worker still importing the app
+            time.sleep(0.1)
+    raise RuntimeError(f'{url} did not come up within {timeout}s')
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], statuses: Counter, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    total = len(latencies)
+    errors = sum(count for status, count in statuses.items() if not str(status).startswith(('2', '3')))
+    return {
+        'requests': total,
+        'rps': total / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p90_ms': percentile(latencies, 0.90) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': (latencies[-1] if latencies else 0.0) * 1000,
+        'error_rate': errors / total if total else 0.0,
+        'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+    }
+
+
+class Workload:
+    """Zipf-distributed queries and seed tracks, so caches see a realistic hit pattern."""
+
+    def __init__(self, seed: int = 0):
+        self.queries = [f'song {i}' for i in range(QUERY_POOL)]
+        self.seeds = [track_id((i * 7919) % (ARTIST_COUNT * TRACKS_PER_ARTIST)) for i in range(SEED_POOL)]
+        self.weights_queries = [1 / (rank + 1) ** ZIPF_EXPONENT for rank in range(QUERY_POOL)]
+        self.weights_seeds = [1 / (rank + 1) ** ZIPF_EXPONENT for rank in range(SEED_POOL)]
+        self.seed = seed
+
+    def request(self, scenario: str, rng: random.Random, session: requests.Session, base_url: str):
+        if scenario == 'search':
+            query = rng.choices(self.queries, self.weights_queries)[0]
+            return session.get(f'{base_url}/search', params={'query': query}, timeout=30)
+        seed = rng.choices(self.seeds, self.weights_seeds)[0]
+        if scenario == 'generate_playlist':
+            return session.get(f'{base_url}/generate_playlist', params={'spotify_track_id': seed}, timeout=30)
+        tracks = [{'spotify_track_id': seed, 'track_name': 'Seed',
+                   'artist': {'spotify_artist_id': 'a' + seed[1:], 'name': 'Artist'}}]
+        return session.post(f'{base_url}/api/auth/export-playlist', json={'tracks': tracks}, timeout=30)
+
+
+def login(session: requests.Session, base_url: str):
+    """Go through the OAuth callback (the stand-in accepts any code) so the session holds a user token."""
+    session.get(f'{base_url}/api/auth/callback', params={'code': 'benchmark'}, allow_redirects=False, timeout=30)
+
+
+def run_level(scenario: str, concurrency: int, duration: float, warmup: float, base_url: str,
+              workload: Workload) -> dict:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    lock = threading.Lock()
+    start = time.monotonic() + warmup
+    end = start + duration
+
+    def worker(index: int):
+        rng = random.Random(workload.seed * 1000 + index)
+        session = requests.Session()
+        if scenario == 'export_playlist':
+            login(session, base_url)
+        local_latencies, local_statuses = [], Counter()
+        while True:
+            sent = time.monotonic()
+            if sent >= end:
+                break
+            try:
+                status = workload.request(scenario, rng, session, base_url).status_code
+            except requests.exceptions.RequestException:
+                status = 'error'
+            finished = time.monotonic()
+            if sent >= start:
+                local_latencies.append(finished - sent)
+                local_statuses[status] += 1
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {'scenario': scenario, 'concurrency': concurrency, **summarize(latencies, statuses, duration)}
+
+
+def start_servers(args, workdir: str, env: Optional[Dict[str, str]] = None):
+    """
+    Start the Spotify stand-in and the app under gunicorn, with `env` added
+    to the app's environment. Returns (processes, app base URL, stub URL).
+    """
+    stub_port, app_port = free_port(), free_port()
+    stub = subprocess.Popen([
+        sys.executable, '-m', 'music_ml.benchmarks.spotify_stub', '--port', str(stub_port),
+        '--latency-ms', str(args.latency_ms), '--latency-sigma', str(args.latency_sigma),
+        '--rate-limit-rate', str(args.rate_limit_rate), '--failure-rate', str(args.failure_rate),
+    ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL if not args.verbose else None)
+    stub_url = f'http://127.0.0.1:{stub_port}'
+
+    app_env = {
+        **os.environ,
+        'FLASK_ENV': 'development',
+        'SPOTIFY_API_URL': f'{stub_url}/v1',
+        'SPOTIFY_ACCOUNTS_URL': stub_url,
+        'SPOTIFY_CLIENT_ID': 'benchmark', 'SPOTIFY_CLIENT_SECRET': 'benchmark',
+        'SPOTIFY_REDIRECT_URI': 'http://127.0.0.1/callback', 'FRONTEND_URL': 'http://127.0.0.1',
+        # Keep every local store of the run in a scratch directory
+        'CACHE_DB_PATH': os.path.join(workdir, 'cache.db'),
+        'METRICS_DB_PATH': os.path.join(workdir, 'metrics.db'),
+        'COOCCURRENCE_DB_PATH': os.path.join(workdir, 'cooccurrence.db'),
+        'ARTIST_GRAPH_DB_PATH': os.path.join(workdir, 'artist_graph.db'),
+        'FEATURE_MATRIX_PATH': os.path.join(workdir, 'feature_matrix'),
+        'PROFILE_DIR': os.path.join(workdir, 'profiles'),
+        'DATABASE_URL': '',
+        # Every simulated client shares one IP
+        'RATE_LIMIT_ENABLED': 'false',
+        **(env or {}),
+    }
+    app = subprocess.Popen([
+        sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{app_port}', '--workers', str(args.workers),
+        '--threads', str(args.threads), '--log-level', 'warning',
+        # Sessions go to a scratch database rather than the development one
+        f"music_ml.app:create_app({{'SQLALCHEMY_DATABASE_URI': 'sqlite:///{os.path.join(workdir, 'app.db')}'}})",
+    ], env=app_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL if not args.verbose else None)
+    base_url = f'http://127.0.0.1:{app_port}'
+    try:
+        wait_for(f'{stub_url}/stats')
+        wait_for(f'{base_url}/metrics')
+    except BaseException:
+        stop_servers([stub, app])
+        raise
+    return [stub, app], base_url, stub_url
+
+
+def stop_servers(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> dict:
+    workload = Workload(seed=args.seed)
+    results = []
+    with tempfile.TemporaryDirectory(prefix='music_ml_bench_') as workdir:
+        processes, base_url, stub_url = start_servers(args, workdir)
+        try:
+            for scenario in args.scenarios:
+                for concurrency in args.concurrency:
+                    requests.get(f'{stub_url}/stats', params={'reset': 1}, timeout=5)
+                    result = run_level(scenario, concurrency, args.duration, args.warmup, base_url, workload)
+                    upstream = requests.get(f'{stub_url}/stats', timeout=5).json()
+                    result['upstream_requests'] = sum(
+                        count for name, count in upstream.items() if name not in ('rate_limited', 'failed')
+                    )
+                    results.append(result)
+                    print(format_result(result), file=sys.stderr, flush=True)
+        finally:
+            stop_servers(processes)
+    return {
+        'meta': {
+            'revision': git_revision(), 'timestamp': time.time(), 'python': sys.version.split()[0],
+            'duration': args.duration, 'warmup': args.warmup, 'workers': args.workers, 'threads': args.threads,
+            'latency_ms': args.latency_ms, 'latency_sigma': args.latency_sigma,
+            'rate_limit_rate': args.rate_limit_rate, 'failure_rate': args.failure_rate, 'seed': args.seed,
+        },
+        'results': results,
+    }
+
+
+def format_result(result: dict) -> str:
+    return (f"{result['scenario']:>17} c={result['concurrency']:<3} {result['rps']:8.1f} rps  "
+            f"p50 {result['p50_ms']:7.1f}ms  p99 {result['p99_ms']:7.1f}ms  "
+            f"errors {result['error_rate'] * 100:5.1f}%")
+
+
+def compare(baseline: dict, current: dict, threshold: float = REGRESSION_THRESHOLD) -> List[dict]:
+    """Match results by scenario and concurrency; flag RPS drops and p50/p99 growth beyond `threshold`."""
+    previous: Dict[tuple, dict] = {(r['scenario'], r['concurrency']): r for r in baseline['results']}
+    rows = []
+    for result in current['results']:
+        before = previous.get((result['scenario'], result['concurrency']))
+        if before is None:
+            continue
+        row = {'scenario': result['scenario'], 'concurrency': result['concurrency'], 'regressions': []}
+        for metric, higher_is_better in (('rps', True), ('p50_ms', False), ('p99_ms', False)):
+            change = (result[metric] - before[metric]) / before[metric] if before[metric] else 0.0
+            row[metric] = change
+            if (-change if higher_is_better else change) > threshold:
+                row['regressions'].append(metric)
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load-test the API against a local Spotify stand-in.')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=10.0, help='measured seconds per level')
+    parser.add_argument('--warmup', type=float, default=2.0, help='unmeasured seconds before each level')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='threads per gunicorn worker')
+    parser.add_argument('--latency-ms', type=float, default=40.0, help='median Spotify latency')
+    parser.add_argument('--latency-sigma', type=float, default=0.5)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON results to compare against')
+    parser.add_argument('--verbose', action='store_true', help='show server output')
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            rows = compare(json.load(f), report)
+        for row in rows:
+            flag = f"  REGRESSION: {', '.join(row['regressions'])}" if row['regressions'] else ''
+            print(f"{row['scenario']:>17} c={row['concurrency']:<3} rps {row['rps'] * 100:+6.1f}%  "
+                  f"p50 {row['p50_ms'] * 100:+6.1f}%  p99 {row['p99_ms'] * 100:+6.1f}%{flag}", file=sys.stderr)
+        if any(row['regressions'] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
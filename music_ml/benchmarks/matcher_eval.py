@@ -0,0 +1,405 @@
+"""
+Offline comparison of the playlist matchers: replays one fixed seed set
+against every matcher in MATCHER_NAMES and reports cost and quality side by side.
+
+    python -m music_ml.benchmarks.matcher_eval --seeds 200 --output bench/matchers.json \\
+        --compare bench/matchers_baseline.json
+
+By default matchers run against the local Spotify stand-in, with a synthetic
+listening history and feature matrix. With --live they use the configured
+Spotify API (set SPOTIFY_HTTP_CACHE_PATH to replay cached responses), the
+co-occurrence log and the feature matrix.
+
+The logged playlists are split in two. Every --holdout-every'th playlist is
+held out, and the co-occurrence matcher only learns from the rest. Seeds are
+the first tracks of held-out playlists, unless --seeds-file gives them.
+
+Each matcher runs in its own process with empty caches. Every seed is matched
+once cold and once warm. The process reports match latencies, Spotify
+requests per playlist and resident memory growth. The playlists are re-ranked
+as /generate_playlist serves them, then scored for:
+
+- artist diversity
+- recall of the tracks held-out playlists put next to the seed
+- feature coherence with the seed
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import requests
+
+from music_ml.api.generate_playlist import MATCHER_NAMES, OVERFETCH_FACTOR, PLAYLIST_SIZE, get_matcher
+from music_ml.benchmarks.boot_time import scratch_env
+from music_ml.benchmarks.load_test import REGRESSION_THRESHOLD, ZIPF_EXPONENT, git_revision, percentile
+from music_ml.benchmarks.spotify_stub import (
+    ARTIST_COUNT,
+    TRACKS_PER_ARTIST,
+    StubConfig,
+    artist_id,
+    create_stub_app,
+    serve_in_thread,
+    track_id,
+    track_object,
+)
+from music_ml.matchers.cooccurrence_matcher import CooccurrenceMatcher
+from music_ml.models.track import Track
+from music_ml.models.track_batch import FEATURE_FIELDS
+from music_ml.rerankers.mmr_reranker import MMRReranker
+from music_ml.services.spotify_service import get_track_by_id
+from music_ml.stores.catalog_store import AUDIO_FEATURE_FIELDS
+from music_ml.stores.cooccurrence_store import COOCCURRENCE_DB_PATH, CooccurrenceStore
+from music_ml.stores.feature_matrix import (
+    CURRENT_LINK,
+    FEATURE_MATRIX_PATH,
+    FeatureMatrix,
+    get_feature_matrix,
+    write_feature_matrix,
+)
+from music_ml.utils.metrics import UPSTREAM_REQUESTS
+from music_ml.utils.spotify_utils import load_spotify_tracks
+
+HOLDOUT_EVERY = 5
+HISTORY_PLAYLISTS = 3000
+HISTORY_LENGTH = 12
+SCENE_SIZE = 3  # related artists mixed into a synthetic playlist besides its main artist
+
+# Runs in a fresh interpreter per matcher: argv is the matcher name and a JSON file of seeds
+WORKER = """
+import json, sys
+from music_ml.benchmarks.matcher_eval import measure_matcher
+with open(sys.argv[2]) as f:
+    seeds = json.load(f)
+print(json.dumps(measure_matcher(sys.argv[1], seeds)))
+"""
+
+
+def rss_mb() -> float:
+    """Resident memory now, or where /proc is unavailable, the peak so far."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except OSError:
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def upstream_requests() -> int:
+    """Spotify requests made by this process so far, from every thread."""
+    return int(sum(value for _, value in UPSTREAM_REQUESTS.snapshot()['values']))
+
+
+def measure_matcher(matcher_name: str, seeds: Sequence[str], n: int = PLAYLIST_SIZE - 1) -> dict:
+    """
+    Match every seed twice (cold, then warm caches), timing matcher.match()
+    alone. Seed lookups happen first and count against neither pass nor the
+    memory growth, which does include the matcher's own stores and caches.
+    The cold pass's candidates are re-ranked into the playlists that get scored.
+    """
+    reranker = MMRReranker(feature_matrix=get_feature_matrix().current())
+    seed_tracks: Dict[str, Track] = {}
+    for seed in seeds:
+        try:
+            seed_tracks[seed] = get_track_by_id(seed)
+        except requests.exceptions.RequestException:
+            pass
+
+    rss_before = rss_mb()
+    matcher = get_matcher(matcher_name)
+    if isinstance(matcher, CooccurrenceMatcher):
+        # Load the training history, as the app's updater thread would have
+        matcher.store.sync()
+
+    result = {'matcher': matcher_name, 'seeds': len(seed_tracks), 'missing_seeds': len(seeds) - len(seed_tracks),
+              'playlists': {}}
+    for phase in ('cold', 'warm'):
+        latencies, errors, calls = [], 0, upstream_requests()
+        for seed, track in seed_tracks.items():
+            started = time.perf_counter()
+            try:
+                candidates = matcher.match(track, n=n * OVERFETCH_FACTOR)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if phase == 'cold':
+                result['playlists'][seed] = [[match.spotify_track_id, match.artist.spotify_artist_id]
+                                             for match in reranker.rerank(track, candidates, n)]
+        result[phase] = {'latencies': latencies, 'errors': errors, 'upstream_requests': upstream_requests() - calls}
+    result['rss_mb'] = rss_mb()
+    result['rss_growth_mb'] = result['rss_mb'] - rss_before
+    return result
+
+
+def split_history(store: CooccurrenceStore, holdout_every: int = HOLDOUT_EVERY
+                  ) -> Tuple[List[Tuple[List[Track], str]], List[List[Track]]]:
+    """(training playlists with their sources, held-out playlists), split by log ID."""
+    training, held_out = [], []
+    for log_id, source, tracks in store.iter_log():
+        if log_id % holdout_every == 0:
+            held_out.append(tracks)
+        else:
+            training.append((tracks, source))
+    return training, held_out
+
+
+def held_out_neighbors(playlists: List[List[Track]]) -> Dict[str, Set[str]]:
+    """For each track, the other tracks held-out playlists put it with."""
+    neighbors = defaultdict(set)
+    for tracks in playlists:
+        ids = {track.spotify_track_id for track in tracks}
+        for member in ids:
+            neighbors[member] |= ids - {member}
+    return neighbors
+
+
+def seeds_from(playlists: List[List[Track]], count: int) -> List[str]:
+    seeds = dict.fromkeys(tracks[0].spotify_track_id for tracks in playlists if tracks)
+    return list(seeds)[:count]
+
+
+def synthetic_history(count: int = HISTORY_PLAYLISTS, length: int = HISTORY_LENGTH,
+                      seed: int = 0) -> List[List[Track]]:
+    """
+    Stand-in listening history over the stub catalog: each playlist mixes one
+    artist (Zipf-popular) with a few of its related artists, as the stub
+    reports them.
+    """
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) ** ZIPF_EXPONENT for rank in range(ARTIST_COUNT)]
+    stub = create_stub_app().test_client()
+    scenes: Dict[int, List[int]] = {}
+    playlists = []
+    for _ in range(count):
+        artist = rng.choices(range(ARTIST_COUNT), weights)[0]
+        if artist not in scenes:
+            related = stub.get(f'/v1/artists/{artist_id(artist)}/related-artists').get_json()['artists']
+            scenes[artist] = [artist] + [int(item['id'][1:]) for item in related[:SCENE_SIZE]]
+        numbers = {rng.choice(scenes[artist]) + ARTIST_COUNT * rng.randrange(TRACKS_PER_ARTIST)
+                   for _ in range(length)}
+        playlists.append(load_spotify_tracks({'tracks': {'items': [track_object(n) for n in numbers]}}))
+    return playlists
+
+
+def synthetic_feature_matrix(root: str, seed: int = 0) -> str:
+    """Stand-in audio features for the stub catalog, clustered by artist."""
+    rng = np.random.default_rng(seed)
+    count = ARTIST_COUNT * TRACKS_PER_ARTIST
+    centers = rng.normal(size=(ARTIST_COUNT, len(AUDIO_FEATURE_FIELDS)))
+    vectors = centers[np.arange(count) % ARTIST_COUNT] + rng.normal(scale=0.5, size=(count, len(centers[0])))
+    # Roughly Spotify's ranges: tempo in BPM, the rest between 0 and 1
+    scale, offset = np.array([25.0, 0.15, 0.15, 0.15]), np.array([120.0, 0.5, 0.5, 0.5])
+    return write_feature_matrix(root, [track_id(n) for n in range(count)],
+                                (vectors * scale + offset).astype(np.float32), AUDIO_FEATURE_FIELDS)
+
+
+def playlist_quality(playlists: Dict[str, List[List[str]]], neighbors: Dict[str, Set[str]],
+                     matrix: Optional[FeatureMatrix], n: int = PLAYLIST_SIZE - 1) -> dict:
+    """
+    Mean over seeds of:
+    - coverage: playlist length / n
+    - artist diversity: distinct artists per track
+    - held-out recall: share of the seed's held-out neighbours found, out of at most n
+    - feature coherence: RBF similarity to the seed, with the re-ranker's kernel on standardized features
+    """
+    coverage, diversity, recall, coherence = [], [], [], []
+    columns = matrix.columns(FEATURE_FIELDS) if matrix is not None and len(matrix) else None
+    if columns is not None:
+        features = np.asarray(matrix.vectors[:, columns], dtype=float)
+        mean, std = features.mean(axis=0), features.std(axis=0)
+        std[std == 0] = 1.0
+    for seed, playlist in playlists.items():
+        coverage.append(len(playlist) / n)
+        if not playlist:
+            continue
+        diversity.append(len({artist for _, artist in playlist}) / len(playlist))
+        if neighbors.get(seed):
+            found = sum(track in neighbors[seed] for track, _ in playlist)
+            recall.append(found / min(len(neighbors[seed]), n))
+        if columns is not None:
+            rows = matrix.rows_for([seed] + [track for track, _ in playlist])
+            if rows[0] >= 0 and (rows[1:] >= 0).any():
+                scaled = (features[rows[rows >= 0]] - mean) / std
+                distances = np.square(scaled[1:] - scaled[0]).sum(axis=1)
+                coherence.append(float(np.exp(-distances / len(columns)).mean()))
+
+    def mean_of(values):
+        return float(np.mean(values)) if values else None
+
+    return {'coverage': mean_of(coverage), 'artist_diversity': mean_of(diversity),
+            'heldout_recall': mean_of(recall), 'feature_coherence': mean_of(coherence)}
+
+
+def summarize_matcher(measured: dict, neighbors: Dict[str, Set[str]], matrix: Optional[FeatureMatrix]) -> dict:
+    result = {'matcher': measured['matcher'], 'seeds': measured['seeds'], 'missing_seeds': measured['missing_seeds']}
+    for phase in ('cold', 'warm'):
+        latencies = sorted(measured[phase]['latencies'])
+        result[f'{phase}_p50_ms'] = percentile(latencies, 0.50) * 1000
+        result[f'{phase}_p90_ms'] = percentile(latencies, 0.90) * 1000
+        result[f'{phase}_p99_ms'] = percentile(latencies, 0.99) * 1000
+        result[f'{phase}_upstream_per_playlist'] = measured[phase]['upstream_requests'] / max(measured['seeds'], 1)
+        result[f'{phase}_errors'] = measured[phase]['errors']
+    result['rss_mb'] = measured['rss_mb']
+    result['rss_growth_mb'] = measured['rss_growth_mb']
+    result.update(playlist_quality(measured['playlists'], neighbors, matrix))
+    return result
+
+
+def run(args) -> dict:
+    with tempfile.TemporaryDirectory(prefix='music_ml_matchers_') as workdir:
+        server = None
+        if args.live:
+            env = dict(os.environ)
+        else:
+            # The stand-in's access log would drown out the results
+            logging.getLogger('werkzeug').setLevel(logging.WARNING)
+            server = serve_in_thread(StubConfig(latency_ms=args.latency_ms, latency_sigma=args.latency_sigma,
+                                                seed=args.seed))
+            stub_url = f'http://127.0.0.1:{server.server_port}'
+            env = {**scratch_env(workdir), 'SPOTIFY_API_URL': f'{stub_url}/v1', 'SPOTIFY_ACCOUNTS_URL': stub_url}
+            env.pop('SPOTIFY_HTTP_CACHE_PATH', None)
+            CooccurrenceStore(env['COOCCURRENCE_DB_PATH']).log_playlists(
+                [(tracks, 'generated') for tracks in synthetic_history(seed=args.seed)])
+            synthetic_feature_matrix(env['FEATURE_MATRIX_PATH'], seed=args.seed)
+        try:
+            training, held_out = split_history(
+                CooccurrenceStore(env.get('COOCCURRENCE_DB_PATH', COOCCURRENCE_DB_PATH)), args.holdout_every)
+            training_path = os.path.join(workdir, 'training.db')
+            CooccurrenceStore(training_path).log_playlists(training)
+            if args.seeds_file:
+                with open(args.seeds_file) as f:
+                    seeds = [line.strip() for line in f if line.strip()][:args.seeds]
+            else:
+                seeds = seeds_from(held_out, args.seeds)
+            seeds_path = os.path.join(workdir, 'seeds.json')
+            with open(seeds_path, 'w') as f:
+                json.dump(seeds, f)
+            matrix_path = os.path.join(env.get('FEATURE_MATRIX_PATH', FEATURE_MATRIX_PATH), CURRENT_LINK)
+            matrix = FeatureMatrix(matrix_path) if os.path.exists(matrix_path) else None
+            neighbors = held_out_neighbors(held_out)
+
+            results = []
+            for name in args.matchers:
+                matcher_env = {
+                    **env,
+                    'COOCCURRENCE_DB_PATH': training_path,
+                    # Nothing cached from earlier matchers (or other runs) except replayed HTTP responses
+                    'CACHE_BACKEND': 'memory',
+                    'ARTIST_GRAPH_DB_PATH': os.path.join(workdir, f'artist_graph_{name}.db'),
+                    'LOG_LEVEL': 'WARNING',
+                }
+                output = subprocess.check_output(
+                    [sys.executable, '-c', WORKER, name, seeds_path], env=matcher_env, text=True,
+                    stderr=None if args.verbose else subprocess.DEVNULL)
+                result = summarize_matcher(json.loads(output.strip().splitlines()[-1]), neighbors, matrix)
+                results.append(result)
+                print(format_result(result), file=sys.stderr, flush=True)
+        finally:
+            if server is not None:
+                server.shutdown()
+    return {
+        'meta': {
+            'revision': git_revision(), 'timestamp': time.time(), 'python': sys.version.split()[0],
+            'data': 'live' if args.live else 'stand-in', 'seeds': len(seeds), 'held_out_playlists': len(held_out),
+            'training_playlists': len(training), 'holdout_every': args.holdout_every,
+            'latency_ms': args.latency_ms, 'latency_sigma': args.latency_sigma, 'seed': args.seed,
+        },
+        'results': results,
+    }
+
+
+def _format_metric(value: Optional[float]) -> str:
+    return '   n/a' if value is None else f'{value:6.3f}'
+
+
+def format_result(result: dict) -> str:
+    return (f"{result['matcher']:>15}  cold p50 {result['cold_p50_ms']:7.1f}ms p99 {result['cold_p99_ms']:7.1f}ms  "
+            f"warm p50 {result['warm_p50_ms']:6.1f}ms  upstream {result['cold_upstream_per_playlist']:5.1f}/playlist  "
+            f"rss +{result['rss_growth_mb']:5.1f}MB  diversity {_format_metric(result['artist_diversity'])}  "
+            f"recall {_format_metric(result['heldout_recall'])}  "
+            f"coherence {_format_metric(result['feature_coherence'])}")
+
+
+# (metric, higher is better, smallest change worth flagging) checked against a baseline run
+COMPARED_METRICS = (
+    ('cold_p50_ms', False, 1.0), ('cold_p99_ms', False, 1.0), ('warm_p50_ms', False, 1.0),
+    ('cold_upstream_per_playlist', False, 0.1), ('rss_growth_mb', False, 1.0),
+    ('heldout_recall', True, 0.01), ('feature_coherence', True, 0.01), ('artist_diversity', True, 0.01),
+)
+
+
+def compare(baseline: dict, current: dict, threshold: float = REGRESSION_THRESHOLD) -> List[dict]:
+    """
+    Match results by matcher; flag metrics that moved the wrong way by more
+    than `threshold` (relative) and by more than the metric's noise floor.
+    """
+    previous = {result['matcher']: result for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        before = previous.get(result['matcher'])
+        if before is None:
+            continue
+        row = {'matcher': result['matcher'], 'regressions': []}
+        for metric, higher_is_better, min_change in COMPARED_METRICS:
+            if result.get(metric) is None or before.get(metric) is None:
+                continue
+            delta = result[metric] - before[metric]
+            change = delta / before[metric] if before[metric] else math.copysign(math.inf, delta) if delta else 0.0
+            row[metric] = change
+            if abs(delta) >= min_change and (-change if higher_is_better else change) > threshold:
+                row['regressions'].append(metric)
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare playlist matchers on latency, cost and quality.')
+    parser.add_argument('--matchers', nargs='+', choices=MATCHER_NAMES, default=list(MATCHER_NAMES))
+    parser.add_argument('--seeds', type=int, default=100, help='number of seed tracks')
+    parser.add_argument('--seeds-file', help='seed track IDs, one per line (default: from held-out playlists)')
+    parser.add_argument('--holdout-every', type=int, default=HOLDOUT_EVERY,
+                        help='hold out every Nth logged playlist from the co-occurrence training data')
+    parser.add_argument('--live', action='store_true',
+                        help='use the configured Spotify API, co-occurrence log and feature matrix')
+    parser.add_argument('--latency-ms', type=float, default=40.0, help='median stand-in Spotify latency')
+    parser.add_argument('--latency-sigma', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0, help='random seed for the stand-in data')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON results to compare against')
+    parser.add_argument('--verbose', action='store_true', help='show matcher process output')
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            rows = compare(json.load(f), report)
+        for row in rows:
+            changes = '  '.join(f'{metric} {row[metric] * 100:+.1f}%' for metric, _, _ in COMPARED_METRICS
+                                if metric in row)
+            flag = f"  REGRESSION: {', '.join(row['regressions'])}" if row['regressions'] else ''
+            print(f"{row['matcher']:>15}  {changes}{flag}", file=sys.stderr)
+        if any(row['regressions'] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare the cached byte serializer with Flask's jsonify for playlist and
+search responses.
+
+    python -m music_ml.benchmarks.serialization_benchmark --tracks 20 100 500
+"""
+import argparse
+import json
+import timeit
+
+from flask import Flask, jsonify
+
+from music_ml.models.artist import intern_artist
+from music_ml.models.playlist import Playlist
+from music_ml.models.track import Track
+from music_ml.utils.json_serializer import playlist_response, search_response
+
+
+def make_tracks(n: int):
+    return [
+        Track(
+            spotify_track_id=f'{i:022d}',
+            track_name=f'Track {i}',
+            artist=intern_artist(f'{i % 10:022d}', f'Artist {i % 10}'),
+            album_image_url=f'https://i.scdn.co/image/{i:040d}'
+        )
+        for i in range(n)
+    ]
+
+
+def run(sizes, repeat: int = 5):
+    """Return per-call timings (seconds) of each serializer for each playlist size."""
+    app = Flask(__name__)
+    results = []
+    with app.app_context():
+        for size in sizes:
+            playlist = Playlist(tracks=make_tracks(size))
+            number = max(1, 20000 // size)
+            cases = {
+                'jsonify_playlist': lambda: jsonify({'playlist': playlist}).get_data(),
+                'cached_playlist': lambda: playlist_response(playlist).get_data(),
+                'jsonify_search': lambda: jsonify({'tracks': playlist.tracks,
+                                                   'total_results': len(playlist.tracks)}).get_data(),
+                'cached_search': lambda: search_response(playlist.tracks).get_data(),
+            }
+            timings = {
+                name: min(timeit.repeat(case, number=number, repeat=repeat)) / number
+                for name, case in cases.items()
+            }
+            results.append({'tracks': size, **timings})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark response serialization.')
+    parser.add_argument('--tracks', type=int, nargs='+', default=[20, 100, 500])
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args(argv)
+
+    results = run(args.tracks)
+    if args.json:
+        print(json.dumps(results))
+        return
+    for result in results:
+        print(
+            f"{result['tracks']:>5} tracks: playlist jsonify {result['jsonify_playlist'] * 1e6:8.1f}us, "
+            f"cached {result['cached_playlist'] * 1e6:8.1f}us "
+            f"({result['jsonify_playlist'] / result['cached_playlist']:.1f}x); "
+            f"search jsonify {result['jsonify_search'] * 1e6:8.1f}us, "
+            f"cached {result['cached_search'] * 1e6:8.1f}us "
+            f"({result['jsonify_search'] / result['cached_search']:.1f}x)"
+        )
+
+
+if __name__ == '__main__':
+    main()
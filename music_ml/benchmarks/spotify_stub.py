@@ -0,0 +1,200 @@
+"""
+Local stand-in for the Spotify endpoints the app uses, with configurable
+latency, rate limiting and failures, for benchmarks and load tests.
+
+    python -m music_ml.benchmarks.spotify_stub --port 8001 --latency-ms 40 --rate-limit-rate 0.01
+
+Point the app at it with SPOTIFY_API_URL=http://127.0.0.1:8001/v1 and
+SPOTIFY_ACCOUNTS_URL=http://127.0.0.1:8001. Responses are generated
+deterministically from IDs and queries over a synthetic catalog.
+"""
+import argparse
+import hashlib
+import math
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+ARTIST_COUNT = 500
+TRACKS_PER_ARTIST = 20
+SEARCH_TOTAL = 1000
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 0.0  # median
+    latency_sigma: float = 0.5  # lognormal shape; p99 is about median * exp(2.33 * sigma)
+    rate_limit_rate: float = 0.0  # fraction of requests answered with 429
+    failure_rate: float = 0.0  # fraction of requests answered with 503
+    retry_after: int = 1  # seconds, sent with 429s
+    seed: int = 0
+
+
+def _number(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'big')
+
+
+def track_id(n: int) -> str:
+    return f't{n:021d}'
+
+
+def artist_id(n: int) -> str:
+    return f'a{n:021d}'
+
+
+def stand_in_id(spotify_id: str, prefix: str) -> str:
+    """
+    The catalog ID ('t' tracks, 'a' artists) standing in for a real Spotify
+    ID; the same ID always maps to the same one, and catalog IDs to themselves.
+    """
+    if _parse_id(spotify_id, prefix) is not None:
+        return spotify_id
+    n = _number(spotify_id)
+    return artist_id(n % ARTIST_COUNT) if prefix == 'a' else track_id(n % (ARTIST_COUNT * TRACKS_PER_ARTIST))
+
+
+def track_object(n: int) -> dict:
+    artist = n % ARTIST_COUNT
+    return {
+        'id': track_id(n),
+        'name': f'Track {n}',
+        'artists': [{'id': artist_id(artist), 'name': f'Artist {artist}'}],
+        'album': {'images': [
+            {'url': f'https://i.scdn.co/image/{n:040d}-640', 'height': 640, 'width': 640},
+            {'url': f'https://i.scdn.co/image/{n:040d}-300', 'height': 300, 'width': 300},
+            {'url': f'https://i.scdn.co/image/{n:040d}-64', 'height': 64, 'width': 64},
+        ]},
+        'popularity': n % 100,
+    }
+
+
+def _parse_id(value: str, prefix: str):
+    if len(value) != 22 or not value.startswith(prefix) or not value[1:].isdigit():
+        return None
+    return int(value[1:])
+
+
+def create_stub_app(config: StubConfig = None) -> Flask:
+    config = config or StubConfig()
+    app = Flask(__name__)
+    app.config['STUB'] = config
+    counts = app.config['STUB_COUNTS'] = Counter()
+    lock = threading.Lock()
+    rng = random.Random(config.seed)
+
+    @app.before_request
+    def inject():
+        if request.path == '/stats':
+            return None
+        with lock:
+            counts[request.endpoint or 'unknown'] += 1
+            draw, latency_draw = rng.random(), rng.gauss(0, 1)
+        if config.latency_ms:
+            time.sleep(config.latency_ms * math.exp(config.latency_sigma * latency_draw) / 1000)
+        if draw < config.rate_limit_rate:
+            with lock:
+                counts['rate_limited'] += 1
+            response = jsonify({'error': {'status': 429, 'message': 'API rate limit exceeded'}})
+            response.status_code = 429
+            response.headers['Retry-After'] = str(config.retry_after)
+            return response
+        if draw < config.rate_limit_rate + config.failure_rate:
+            with lock:
+                counts['failed'] += 1
+            return jsonify({'error': {'status': 503, 'message': 'Service unavailable'}}), 503
+        return None
+
+    @app.route('/api/token', methods=['POST'])
+    def token():
+        return jsonify({'access_token': f'stub-{rng.getrandbits(64):016x}', 'token_type': 'Bearer',
+                        'expires_in': 3600, 'refresh_token': 'stub-refresh'})
+
+    @app.route('/v1/search')
+    def search():
+        query = request.args.get('q', '')
+        limit = min(request.args.get('limit', 20, type=int), 50)
+        offset = request.args.get('offset', 0, type=int)
+        base = _number(query.lower())
+        count = max(0, min(limit, SEARCH_TOTAL - offset))
+        items = [track_object((base + offset + i) % (ARTIST_COUNT * TRACKS_PER_ARTIST)) for i in range(count)]
+        return jsonify({'tracks': {'items': items, 'limit': limit, 'offset': offset, 'total': SEARCH_TOTAL}})
+
+    @app.route('/v1/tracks/<spotify_track_id>')
+    def track(spotify_track_id):
+        n = _parse_id(spotify_track_id, 't')
+        if n is None:
+            return jsonify({'error': {'status': 400, 'message': 'invalid id'}}), 400
+        return jsonify(track_object(n))
+
+    @app.route('/v1/artists/<spotify_artist_id>/top-tracks')
+    def top_tracks(spotify_artist_id):
+        n = _parse_id(spotify_artist_id, 'a')
+        if n is None:
+            return jsonify({'error': {'status': 400, 'message': 'invalid id'}}), 400
+        return jsonify({'tracks': [track_object(n % ARTIST_COUNT + ARTIST_COUNT * i) for i in range(10)]})
+
+    @app.route('/v1/artists/<spotify_artist_id>/related-artists')
+    def related_artists(spotify_artist_id):
+        n = _parse_id(spotify_artist_id, 'a')
+        if n is None:
+            return jsonify({'error': {'status': 400, 'message': 'invalid id'}}), 400
+        related = [(n * 7 + i * 13) % ARTIST_COUNT for i in range(1, 11)]
+        return jsonify({'artists': [{'id': artist_id(a), 'name': f'Artist {a}'} for a in related]})
+
+    @app.route('/v1/me')
+    def me():
+        return jsonify({'id': 'stub-user', 'display_name': 'Stub User'})
+
+    @app.route('/v1/users/<user_id>/playlists', methods=['POST'])
+    def create_playlist(user_id):
+        playlist_id = f'p{rng.getrandbits(64):021d}'[:22]
+        return jsonify({'id': playlist_id, 'external_urls': {'spotify': f'https://open.spotify.com/playlist/{playlist_id}'}}), 201
+
+    @app.route('/v1/playlists/<playlist_id>/tracks', methods=['POST'])
+    def add_tracks(playlist_id):
+        return jsonify({'snapshot_id': 'stub-snapshot'}), 201
+
+    @app.route('/stats')
+    def stats():
+        """Requests received per endpoint since startup (or the last ?reset=1)."""
+        with lock:
+            snapshot = dict(counts)
+            if request.args.get('reset'):
+                counts.clear()
+        return jsonify(snapshot)
+
+    return app
+
+
+def serve_in_thread(config: StubConfig = None, host: str = '127.0.0.1', port: int = 0):
+    """Start the stub on a background thread; returns the server (its port is server.server_port)."""
+    server = make_server(host, port, create_stub_app(config), threaded=True)
+    threading.Thread(target=server.serve_forever, name='spotify-stub', daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve a local stand-in for the Spotify API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='median response latency')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='lognormal spread of latency')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fraction of 429 responses')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fraction of 503 responses')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    config = StubConfig(latency_ms=args.latency_ms, latency_sigma=args.latency_sigma,
+                        rate_limit_rate=args.rate_limit_rate, failure_rate=args.failure_rate, seed=args.seed)
+    server = make_server(args.host, args.port, create_stub_app(config), threaded=True)
+    print(f'Spotify stub listening on http://{args.host}:{server.server_port}', flush=True)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
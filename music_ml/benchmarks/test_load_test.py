@@ -0,0 +1,38 @@
+from collections import Counter
+
+from music_ml.benchmarks.load_test import compare, percentile, summarize
+
+
+def test_percentile():
+    values = [i / 100 for i in range(1, 101)]
+
+    assert percentile(values, 0.5) == 0.5
+    assert percentile(values, 0.99) == 0.99
+    assert percentile([], 0.5) == 0.0
+
+
+def test_summarize():
+    result = summarize([0.01, 0.02, 0.03, 0.5], Counter({200: 3, 429: 1}), elapsed=2.0)
+
+    assert result['requests'] == 4
+    assert result['rps'] == 2.0
+    assert result['p50_ms'] == 20.0
+    assert result['max_ms'] == 500.0
+    assert result['error_rate'] == 0.25
+    assert result['statuses'] == {'200': 3, '429': 1}
+
+
+def test_compare_flags_regressions():
+    baseline = {'results': [
+        {'scenario': 'search', 'concurrency': 8, 'rps': 100.0, 'p50_ms': 10.0, 'p99_ms': 50.0},
+        {'scenario': 'search', 'concurrency': 32, 'rps': 100.0, 'p50_ms': 10.0, 'p99_ms': 50.0},
+    ]}
+    current = {'results': [
+        {'scenario': 'search', 'concurrency': 8, 'rps': 80.0, 'p50_ms': 10.5, 'p99_ms': 70.0},
+        {'scenario': 'search', 'concurrency': 32, 'rps': 120.0, 'p50_ms': 9.0, 'p99_ms': 40.0},
+        {'scenario': 'generate_playlist', 'concurrency': 8, 'rps': 1.0, 'p50_ms': 1.0, 'p99_ms': 1.0},
+    ]}
+
+    rows = compare(baseline, current)
+
+    assert [(row['concurrency'], row['regressions']) for row in rows] == [(8, ['rps', 'p99_ms']), (32, [])]
@@ -0,0 +1,89 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from music_ml.benchmarks.matcher_eval import (
+    compare,
+    held_out_neighbors,
+    measure_matcher,
+    playlist_quality,
+    seeds_from,
+    split_history,
+)
+from music_ml.models.artist import Artist
+from music_ml.models.track import Track
+from music_ml.stores.cooccurrence_store import CooccurrenceStore
+from music_ml.stores.feature_matrix import FeatureMatrix, write_feature_matrix
+from music_ml.utils.metrics import UPSTREAM_REQUESTS
+
+
+def make_track(track_id, artist_id='a1'):
+    return Track(spotify_track_id=track_id, track_name=track_id,
+                 artist=Artist(spotify_artist_id=artist_id, name=artist_id))
+
+
+def test_history_is_split_by_log_id_and_seeds_come_from_held_out_playlists():
+    store = CooccurrenceStore(':memory:')
+    store.log_playlists([([make_track(f't{i}'), make_track('shared')], 'generated') for i in range(1, 7)])
+
+    training, held_out = split_history(store, holdout_every=3)
+
+    assert [tracks[0].spotify_track_id for tracks, _ in training] == ['t1', 't2', 't4', 't5']
+    assert seeds_from(held_out, 10) == ['t3', 't6']
+    assert held_out_neighbors(held_out)['shared'] == {'t3', 't6'}
+
+
+def test_playlist_quality(tmp_path):
+    root = write_feature_matrix(str(tmp_path), ['s', 'near', 'far'],
+                                np.array([[120, .5, .5, .5], [120, .5, .5, .5], [60, 1, 0, 0]], dtype=np.float32),
+                                ('tempo', 'energy', 'valence', 'danceability'))
+    playlists = {
+        's': [['near', 'a1'], ['far', 'a2'], ['x', 'a2'], ['y', 'a3']],
+        'empty': [],
+    }
+
+    quality = playlist_quality(playlists, {'s': {'near', 'z'}}, FeatureMatrix(root), n=4)
+
+    assert quality['coverage'] == 0.5
+    assert quality['artist_diversity'] == 0.75
+    assert quality['heldout_recall'] == 0.5
+    # 'near' is identical to the seed; 'far' is 18 squared standard deviations away over 4 features
+    assert quality['feature_coherence'] == pytest.approx((1 + np.exp(-18 / 4)) / 2)
+
+
+def test_measure_matcher_times_cold_and_warm_passes():
+    seed = make_track('seed')
+    matcher = MagicMock()
+
+    def match(track, n):
+        if matcher.match.call_count == 1:
+            UPSTREAM_REQUESTS.inc(endpoint='artist_top_tracks', status=200)
+        return [make_track('m1', 'a2'), make_track('m2', 'a3')]
+    matcher.match.side_effect = match
+
+    with patch('music_ml.benchmarks.matcher_eval.get_track_by_id', return_value=seed), \
+            patch('music_ml.benchmarks.matcher_eval.get_matcher', return_value=matcher), \
+            patch('music_ml.benchmarks.matcher_eval.get_feature_matrix') as mock_get_feature_matrix:
+        mock_get_feature_matrix.return_value.current.return_value = None
+        result = measure_matcher('artist', ['seed'], n=2)
+
+    assert result['seeds'] == 1
+    assert result['cold']['upstream_requests'] == 1
+    assert result['warm']['upstream_requests'] == 0
+    assert len(result['cold']['latencies']) == len(result['warm']['latencies']) == 1
+    assert sorted(result['playlists']['seed']) == [['m1', 'a2'], ['m2', 'a3']]
+
+
+def test_compare_flags_regressions_beyond_noise():
+    baseline = {'results': [{'matcher': 'artist', 'cold_p50_ms': 30.0, 'warm_p50_ms': 0.02,
+                             'cold_upstream_per_playlist': 0.0, 'heldout_recall': 0.20}]}
+    current = {'results': [{'matcher': 'artist', 'cold_p50_ms': 40.0, 'warm_p50_ms': 0.04,
+                            'cold_upstream_per_playlist': 1.5, 'heldout_recall': 0.21},
+                           {'matcher': 'new', 'cold_p50_ms': 1.0}]}
+
+    rows = compare(baseline, current)
+
+    assert [row['matcher'] for row in rows] == ['artist']
+    assert rows[0]['regressions'] == ['cold_p50_ms', 'cold_upstream_per_playlist']
+    assert rows[0]['warm_p50_ms'] == pytest.approx(1.0)
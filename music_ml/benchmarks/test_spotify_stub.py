@@ -0,0 +1,57 @@
+import pytest
+
+from music_ml.benchmarks.spotify_stub import StubConfig, create_stub_app, track_id
+from music_ml.utils.spotify_utils import load_spotify_tracks
+
+
+@pytest.fixture
+def client():
+    with create_stub_app().test_client() as client:
+        yield client
+
+
+def test_search_is_deterministic_and_paged(client):
+    first = client.get('/v1/search?q=Daft+Punk&type=track&limit=20&offset=0').get_json()
+    again = client.get('/v1/search?q=daft+punk&type=track&limit=20&offset=0').get_json()
+    second = client.get('/v1/search?q=daft+punk&type=track&limit=20&offset=20').get_json()
+
+    assert first == again
+    assert len(first['tracks']['items']) == 20
+    assert not {item['id'] for item in first['tracks']['items']} & {item['id'] for item in second['tracks']['items']}
+    # Responses parse with the same helpers as real Spotify ones
+    assert load_spotify_tracks(first)[0].album_image_url.endswith('-300')
+
+
+def test_track_and_artist_endpoints(client):
+    track = client.get(f'/v1/tracks/{track_id(42)}').get_json()
+    artist_id = track['artists'][0]['id']
+
+    top_tracks = client.get(f'/v1/artists/{artist_id}/top-tracks?market=US').get_json()['tracks']
+    related = client.get(f'/v1/artists/{artist_id}/related-artists').get_json()['artists']
+
+    assert track['id'] == track_id(42)
+    assert all(item['artists'][0]['id'] == artist_id for item in top_tracks)
+    assert len(related) == 10
+    assert client.get('/v1/tracks/not-an-id').status_code == 400
+
+
+def test_user_and_playlist_endpoints(client):
+    assert client.post('/api/token', data={'grant_type': 'client_credentials'}).get_json()['expires_in'] == 3600
+    user_id = client.get('/v1/me').get_json()['id']
+    playlist = client.post(f'/v1/users/{user_id}/playlists', json={'name': 'x'}).get_json()
+
+    assert client.post(f"/v1/playlists/{playlist['id']}/tracks", json={'uris': []}).status_code == 201
+
+
+def test_fault_injection_and_stats():
+    app = create_stub_app(StubConfig(rate_limit_rate=0.5, failure_rate=0.5, retry_after=2))
+    client = app.test_client()
+
+    statuses = [client.get('/v1/me') for _ in range(20)]
+
+    assert {response.status_code for response in statuses} == {429, 503}
+    assert all(response.headers['Retry-After'] == '2' for response in statuses if response.status_code == 429)
+    stats = client.get('/stats?reset=1').get_json()
+    assert stats['me'] == 20
+    assert stats['rate_limited'] + stats['failed'] == 20
+    assert client.get('/stats').get_json() == {}
@@ -0,0 +1,91 @@
+import json
+import time
+
+import pytest
+
+from music_ml.benchmarks.spotify_stub import serve_in_thread, track_id
+from music_ml.benchmarks.traffic_replay import (
+    compare,
+    load_records,
+    replay,
+    stand_in_ids,
+    summarize_capture,
+    summarize_replay,
+)
+
+
+def captured(time_, endpoint='search.search_tracks', **fields):
+    return {'time': time_, 'method': 'GET', 'endpoint': endpoint, 'path': '/search', 'args': {},
+            'status': 200, 'duration_ms': 10.0, 'upstream_requests': 0, 'cache_hits': 0, 'cache_misses': 0,
+            **fields}
+
+
+def test_load_records_merges_worker_files_in_time_order(tmp_path):
+    (tmp_path / 'traffic-1.jsonl').write_text(
+        json.dumps(captured(3.0)) + '\n' + json.dumps(captured(1.0, endpoint=None)) + '\n')
+    # The newest line of a worker that was killed mid-write
+    (tmp_path / 'traffic-2.jsonl.1').write_text(json.dumps(captured(2.0)) + '\n{"time": 4.0, "meth')
+    (tmp_path / 'other.json').write_text('not a capture')
+
+    records = load_records([str(tmp_path)])
+
+    assert [record['time'] for record in records] == [1.0, 2.0, 3.0]
+    assert records[0]['endpoint'] == 'unmatched'
+    assert [record['time'] for record in load_records([str(tmp_path)], since=2.0)] == [2.0, 3.0]
+
+
+def test_stand_in_ids_map_repeats_to_the_same_catalog_ids():
+    record = {'args': {'spotify_track_id': '4uLU6hMCjMI75M1A2tKUQC'},
+              'json': {'tracks': [{'spotify_track_id': '4uLU6hMCjMI75M1A2tKUQC',
+                                   'artist': {'spotify_artist_id': '0gxyHStUsqpMadRV0Di1Qt'}},
+                                  {'spotify_track_id': track_id(7)}]}}
+
+    mapped = stand_in_ids(record)
+
+    seed = mapped['args']['spotify_track_id']
+    assert seed.startswith('t') and seed[1:].isdigit()
+    assert mapped['json']['tracks'][0]['spotify_track_id'] == seed
+    assert mapped['json']['tracks'][0]['artist']['spotify_artist_id'].startswith('a')
+    assert mapped['json']['tracks'][1]['spotify_track_id'] == track_id(7)
+
+
+def test_replay_keeps_captured_spacing_at_the_given_speed():
+    server = serve_in_thread()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    records = [captured(100.0, endpoint='track', path=f'/v1/tracks/{track_id(1)}'),
+               captured(100.4, endpoint='missing', path='/v1/tracks/bad')]
+    try:
+        started = time.monotonic()
+        results = replay(records, base_url, speed=2.0, log_in=False)
+        elapsed = time.monotonic() - started
+    finally:
+        server.shutdown()
+
+    assert [(result['endpoint'], result['status']) for result in results] == [('track', 200), ('missing', 400)]
+    assert elapsed == pytest.approx(0.2, abs=0.15)
+    rows = summarize_replay(results, elapsed, captured=summarize_capture(records))
+    assert [row['endpoint'] for row in rows] == ['*', 'missing', 'track']
+    assert rows[0]['error_rate'] == 0.5
+    assert rows[2]['captured']['requests'] == 1
+
+
+def test_summarize_capture_and_compare_report_cache_hit_deltas():
+    records = [captured(1.0, upstream_requests=2, cache_hits=1, cache_misses=3),
+               captured(2.0, cache_hits=2, duration_ms=30.0)]
+    summary = summarize_capture(records)
+    assert summary['*']['upstream_per_request'] == 1.0
+    assert summary['*']['cache_hit_rate'] == 0.5
+    assert summary['*']['p99_ms'] == 30.0
+
+    baseline = {'results': [{'endpoint': '*', 'p50_ms': 20.0, 'p99_ms': 100.0, 'error_rate': 0.0,
+                             'upstream_per_request': 1.0, 'cache_hit_rate': 0.5}]}
+    current = {'results': [{'endpoint': '*', 'p50_ms': 20.5, 'p99_ms': 90.0, 'error_rate': 0.0,
+                            'upstream_per_request': 1.5, 'cache_hit_rate': 0.4},
+                           {'endpoint': 'new', 'p50_ms': 1.0}]}
+
+    rows = compare(baseline, current)
+
+    assert [row['endpoint'] for row in rows] == ['*']
+    # 0.5 ms of p50 growth is under the noise floor
+    assert rows[0]['regressions'] == ['upstream_per_request', 'cache_hit_rate']
+    assert rows[0]['deltas']['cache_hit_rate'] == pytest.approx(-0.1)
@@ -0,0 +1,338 @@
+"""
+Replay captured production traffic (see music_ml/utils/traffic_capture.py)
+against a local instance and report latency, Spotify requests and cache hit
+rates per endpoint, next to what the capture itself recorded.
+
+    python -m music_ml.benchmarks.traffic_replay captured/ --speed 2 --output bench/replay.json
+    python -m music_ml.benchmarks.traffic_replay captured/ --speed 2 --compare bench/replay.json
+
+By default the app is started under gunicorn against the Spotify stand-in,
+as for load_test, with capture switched on so the Spotify requests and cache
+lookups of every replayed request are counted server-side. Spotify IDs in
+the capture are mapped onto the stand-in catalog consistently, so repeated
+seeds stay repeated. --target sends the requests to an instance that is
+already running instead; pass its TRAFFIC_CAPTURE_DIR as --server-capture
+to get its upstream and cache figures too.
+
+Requests keep their captured spacing divided by --speed (0 sends them as
+fast as --concurrency allows). Login, callback and logout are skipped;
+every other request is sent from a session logged in to the stand-in.
+"""
+import argparse
+import glob
+import json
+import logging
+import math
+import os
+import sys
+import queue
+import tempfile
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import requests
+
+from music_ml.benchmarks.load_test import (
+    REGRESSION_THRESHOLD,
+    git_revision,
+    login,
+    percentile,
+    start_servers,
+    stop_servers,
+    summarize,
+)
+from music_ml.benchmarks.spotify_stub import stand_in_id
+from music_ml.utils.json_stream import open_text
+
+logger = logging.getLogger(__name__)
+
+# Requests that log in or out would change the replaying session rather than exercise the app
+SESSION_ENDPOINTS = frozenset({'auth.login', 'auth.callback', 'auth.logout'})
+STAND_IN_KEYS = {'spotify_track_id': 't', 'spotify_artist_id': 'a'}
+ALL_ENDPOINTS = '*'
+
+# (metric, higher is better, smallest change worth flagging) checked against a baseline run
+COMPARED_METRICS = (
+    ('p50_ms', False, 1.0), ('p99_ms', False, 1.0), ('server_p50_ms', False, 1.0), ('server_p99_ms', False, 1.0),
+    ('error_rate', False, 0.01), ('upstream_per_request', False, 0.1), ('cache_hit_rate', True, 0.01),
+)
+
+
+def capture_files(paths: Iterable[str]) -> List[str]:
+    """The given files, plus every capture file (rotated or gzipped too) in the given directories."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, 'traffic-*.jsonl*'))))
+        else:
+            files.append(path)
+    return files
+
+
+def load_records(paths: Iterable[str], since: float = 0.0) -> List[dict]:
+    """
+    Captured requests from files and directories, oldest first. Lines cut
+    short by a worker that stopped mid-write are skipped.
+    """
+    records, skipped = [], 0
+    for path in capture_files(paths):
+        with open_text(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    skipped += 1
+                    continue
+                if record['time'] >= since:
+                    record['endpoint'] = record.get('endpoint') or 'unmatched'
+                    records.append(record)
+    if skipped:
+        logger.warning('Skipped %d unreadable capture lines', skipped)
+    records.sort(key=lambda record: record['time'])
+    return records
+
+
+def stand_in_ids(value):
+    """Copy of a captured value with Spotify track and artist IDs swapped for stand-in catalog IDs."""
+    if isinstance(value, dict):
+        return {key: stand_in_id(item, STAND_IN_KEYS[key]) if key in STAND_IN_KEYS and isinstance(item, str)
+                else stand_in_ids(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [stand_in_ids(item) for item in value]
+    return value
+
+
+def replay(records: List[dict], base_url: str, speed: float = 1.0, concurrency: int = 32,
+           log_in: bool = True) -> List[dict]:
+    """
+    Send each record's request at its captured offset divided by `speed`
+    (0: no delay), at most `concurrency` at a time. Returns each request's
+    endpoint, status, latency and lag (seconds sent behind schedule).
+    """
+    sessions: queue.Queue = queue.Queue()
+
+    def new_session():
+        session = requests.Session()
+        if log_in:
+            login(session, base_url)
+        sessions.put(session)
+
+    def send(record: dict, due: float) -> dict:
+        session = sessions.get()
+        sent = time.monotonic()
+        try:
+            status = session.request(record['method'], base_url + record['path'], params=record.get('args'),
+                                     json=record.get('json'), timeout=30).status_code
+        except requests.exceptions.RequestException:
+            status = 'error'
+        finally:
+            sessions.put(session)
+        return {'endpoint': record['endpoint'], 'status': status,
+                'latency': time.monotonic() - sent, 'lag': max(0.0, sent - due)}
+
+    if not records:
+        return []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # Log every session in before the clock starts, so logins don't compete with the replay
+        list(pool.map(lambda _: new_session(), range(concurrency)))
+        first = records[0]['time']
+        start = time.monotonic()
+        futures = []
+        for record in records:
+            due = start + (record['time'] - first) / speed if speed else start
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(send, record, due))
+        return [future.result() for future in futures]
+
+
+def _by_endpoint(items: Iterable[dict]) -> Dict[str, List[dict]]:
+    groups = defaultdict(list)
+    for item in items:
+        groups[item['endpoint']].append(item)
+        groups[ALL_ENDPOINTS].append(item)
+    return groups
+
+
+def summarize_capture(records: Iterable[dict]) -> Dict[str, dict]:
+    """Per endpoint ('*' for all): requests, p50/p99 duration, Spotify requests per request and cache hit rate."""
+    summaries = {}
+    for endpoint, group in _by_endpoint(records).items():
+        durations = sorted(record['duration_ms'] for record in group)
+        hits = sum(record['cache_hits'] for record in group)
+        lookups = hits + sum(record['cache_misses'] for record in group)
+        summaries[endpoint] = {
+            'requests': len(group),
+            'p50_ms': percentile(durations, 0.50),
+            'p99_ms': percentile(durations, 0.99),
+            'upstream_per_request': sum(record['upstream_requests'] for record in group) / len(group),
+            'cache_hit_rate': hits / lookups if lookups else None,
+        }
+    return summaries
+
+
+def summarize_replay(results: List[dict], elapsed: float, served: Optional[Dict[str, dict]] = None,
+                     captured: Optional[Dict[str, dict]] = None) -> List[dict]:
+    """
+    One row per endpoint ('*' first): client-side latency and errors, the
+    server's own durations, Spotify requests and cache hit rate when `served`
+    (a summarize_capture() of the replay) is given, and the original capture's.
+    """
+    rows = []
+    groups = _by_endpoint(results)
+    for endpoint in sorted(groups, key=lambda name: (name != ALL_ENDPOINTS, name)):
+        group = groups[endpoint]
+        row = {
+            'endpoint': endpoint,
+            **summarize([result['latency'] for result in group], Counter(result['status'] for result in group),
+                        elapsed),
+            'lag_p99_ms': percentile(sorted(result['lag'] for result in group), 0.99) * 1000,
+        }
+        server = (served or {}).get(endpoint, {})
+        row['server_p50_ms'] = server.get('p50_ms')
+        row['server_p99_ms'] = server.get('p99_ms')
+        row['upstream_per_request'] = server.get('upstream_per_request')
+        row['cache_hit_rate'] = server.get('cache_hit_rate')
+        row['captured'] = (captured or {}).get(endpoint)
+        rows.append(row)
+    return rows
+
+
+def run(args) -> dict:
+    records = load_records(args.paths)
+    records = [record for record in records if record['endpoint'] not in SESSION_ENDPOINTS
+               and (not args.endpoints or record['endpoint'] in args.endpoints)][:args.limit]
+    if not records:
+        raise SystemExit('No captured requests to replay')
+    captured = summarize_capture(records)
+    endpoints = set(captured)
+
+    def replay_and_collect(base_url: str, capture_dir: Optional[str], log_in: bool):
+        started_at, started = time.time(), time.monotonic()
+        results = replay(records, base_url, args.speed, args.concurrency, log_in)
+        elapsed = time.monotonic() - started
+        served = None
+        if capture_dir:
+            served = summarize_capture(record for record in load_records([capture_dir], since=started_at)
+                                       if record['endpoint'] in endpoints)
+        return results, elapsed, served
+
+    if args.target:
+        results, elapsed, served = replay_and_collect(args.target.rstrip('/'), args.server_capture, log_in=False)
+    else:
+        records = [stand_in_ids(record) for record in records]
+        with tempfile.TemporaryDirectory(prefix='music_ml_replay_') as workdir:
+            capture_dir = os.path.join(workdir, 'capture')
+            processes, base_url, _ = start_servers(args, workdir, env={
+                'TRAFFIC_CAPTURE_DIR': capture_dir, 'TRAFFIC_CAPTURE_SAMPLE_RATE': '1',
+            })
+            try:
+                results, elapsed, _ = replay_and_collect(base_url, None, log_in=True)
+            finally:
+                # Workers write out their last captured requests as they exit
+                stop_servers(processes)
+            served = summarize_capture(record for record in load_records([capture_dir])
+                                       if record['endpoint'] in endpoints)
+
+    return {
+        'meta': {
+            'revision': git_revision(), 'timestamp': time.time(), 'python': sys.version.split()[0],
+            'capture': list(args.paths), 'requests': len(records), 'speed': args.speed,
+            'concurrency': args.concurrency, 'elapsed': elapsed, 'target': args.target,
+            'workers': args.workers, 'threads': args.threads,
+            'latency_ms': args.latency_ms, 'latency_sigma': args.latency_sigma,
+        },
+        'results': summarize_replay(results, elapsed, served, captured),
+    }
+
+
+def _format_optional(value: Optional[float], fmt: str) -> str:
+    return 'n/a'.rjust(len(format(0.0, fmt))) if value is None else format(value, fmt)
+
+
+def format_result(row: dict) -> str:
+    captured = row['captured'] or {}
+    return (f"{row['endpoint']:>26} {row['requests']:6d} req  p50 {row['p50_ms']:7.1f}ms  "
+            f"p99 {row['p99_ms']:7.1f}ms  errors {row['error_rate'] * 100:5.1f}%  "
+            f"server p50 {_format_optional(row['server_p50_ms'], '7.1f')}ms "
+            f"(captured {_format_optional(captured.get('p50_ms'), '7.1f')}ms)  "
+            f"upstream {_format_optional(row['upstream_per_request'], '5.2f')}/req "
+            f"(captured {_format_optional(captured.get('upstream_per_request'), '5.2f')})  "
+            f"cache hits {_format_optional(row['cache_hit_rate'], '6.1%')} "
+            f"(captured {_format_optional(captured.get('cache_hit_rate'), '6.1%')})")
+
+
+def compare(baseline: dict, current: dict, threshold: float = REGRESSION_THRESHOLD) -> List[dict]:
+    """
+    Match rows by endpoint; flag metrics that moved the wrong way by more
+    than `threshold` (relative) and by more than the metric's noise floor.
+    Each row has the relative change per metric, and the absolute one under 'deltas'.
+    """
+    previous = {result['endpoint']: result for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        before = previous.get(result['endpoint'])
+        if before is None:
+            continue
+        row = {'endpoint': result['endpoint'], 'deltas': {}, 'regressions': []}
+        for metric, higher_is_better, min_change in COMPARED_METRICS:
+            if result.get(metric) is None or before.get(metric) is None:
+                continue
+            delta = result[metric] - before[metric]
+            change = delta / before[metric] if before[metric] else math.copysign(math.inf, delta) if delta else 0.0
+            row[metric] = change
+            row['deltas'][metric] = delta
+            if abs(delta) >= min_change and (-change if higher_is_better else change) > threshold:
+                row['regressions'].append(metric)
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay captured traffic and compare latency and cache hits.')
+    parser.add_argument('paths', nargs='+', help='capture files or directories (TRAFFIC_CAPTURE_DIR)')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='replay speed relative to the capture (0: as fast as possible)')
+    parser.add_argument('--concurrency', type=int, default=32, help='requests in flight at most')
+    parser.add_argument('--endpoints', nargs='+', help='only replay these endpoints (e.g. search.search_tracks)')
+    parser.add_argument('--limit', type=int, help='replay at most this many requests')
+    parser.add_argument('--target', help='base URL of a running instance (default: start one on the stand-in)')
+    parser.add_argument('--server-capture', help="the target's TRAFFIC_CAPTURE_DIR, for its upstream and cache counts")
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='threads per gunicorn worker')
+    parser.add_argument('--latency-ms', type=float, default=40.0, help='median stand-in Spotify latency')
+    parser.add_argument('--latency-sigma', type=float, default=0.5)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON results to compare against')
+    parser.add_argument('--verbose', action='store_true', help='show server output')
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    for row in report['results']:
+        print(format_result(row), file=sys.stderr)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            rows = compare(json.load(f), report)
+        for row in rows:
+            changes = '  '.join(f'{metric} {row["deltas"][metric]:+.3g} ({row[metric] * 100:+.1f}%)'
+                                for metric, _, _ in COMPARED_METRICS if metric in row)
+            flag = f"  REGRESSION: {', '.join(row['regressions'])}" if row['regressions'] else ''
+            print(f"{row['endpoint']:>26}  {changes}{flag}", file=sys.stderr)
+        if any(row['regressions'] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
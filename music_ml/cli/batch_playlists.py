@@ -0,0 +1,235 @@
+"""
+Generate playlists for many seed tracks without going through the HTTP API.
+
+    python -m music_ml.cli.batch_playlists seeds.txt --output playlists.jsonl
+
+Seeds are Spotify track IDs, one per line ('-' reads stdin; blank lines and
+'#' comments are skipped), and are read as a stream. Each seed runs the same
+matcher and re-ranker pipeline as /generate_playlist in a pool of worker
+processes, which share the app's cache (Redis or the SQLite file) and one
+rate budget for Spotify requests that miss it.
+
+Playlists are appended to the output as JSON Lines as they finish, and the
+output doubles as the checkpoint: running the same command again skips
+seeds already written and retries the ones that failed.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from typing import IO, Iterable, Iterator, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+# Spotify credentials, REDIS_URL and DATABASE_URL may come from .env, as for the app; music_ml modules
+# read their settings on import, so it is loaded before any of them
+load_dotenv()
+
+from music_ml.api.generate_playlist import MATCHER_NAMES, load_playlist
+from music_ml.services.spotify_service import set_upstream_throttle
+from music_ml.stores.feature_matrix import get_feature_matrix
+from music_ml.utils.json_serializer import encode_tracks, encode_value
+from music_ml.utils.json_stream import open_text
+from music_ml.utils.rate_limit import refill
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_UPSTREAM_RATE = 10.0  # Spotify requests per second, across all workers
+DEFAULT_UPSTREAM_BURST = 10.0
+IN_FLIGHT_PER_WORKER = 4  # seeds queued per worker, so workers never wait on the reader
+PROGRESS_INTERVAL = 5.0  # seconds
+
+
+class SharedTokenBucket:
+    """A token bucket in shared memory, so every worker process draws from one budget."""
+
+    def __init__(self, rate: float, burst: float, context=None):
+        context = context or multiprocessing.get_context()
+        self.rate = rate
+        self.burst = burst
+        # [tokens, updated]; time.monotonic() is system-wide, so all processes agree on it
+        self._state = context.Array('d', [burst, time.monotonic()])
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self._state.get_lock():
+                now = time.monotonic()
+                tokens = refill(self._state[0], self._state[1], self.rate, self.burst, now)
+                if tokens >= 1:
+                    self._state[0], self._state[1] = tokens - 1, now
+                    return
+                self._state[0], self._state[1] = tokens, now
+            time.sleep((1 - tokens) / self.rate)
+
+
+def iter_seeds(stream: IO[str]) -> Iterator[str]:
+    for line in stream:
+        seed = line.strip()
+        if seed and not seed.startswith('#'):
+            yield seed
+
+
+def read_checkpoint(path: str, matcher_name: str, max_per_artist: Optional[int]) -> Set[str]:
+    """
+    Seeds already written to `path` with these settings. A line cut short by
+    an interrupted run is truncated so appending can resume cleanly.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'rb+') as f:
+        complete = 0
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            complete += len(line)
+            entry = json.loads(line)
+            if ('error' not in entry and entry['matcher'] == matcher_name
+                    and entry['max_per_artist'] == max_per_artist):
+                done.add(entry['spotify_track_id'])
+        f.truncate(complete)
+    return done
+
+
+def generate_line(spotify_track_id: str, matcher_name: str, max_per_artist: Optional[int]) -> Tuple[bool, bytes]:
+    """(succeeded, output line) for one seed: its playlist, or the error that prevented it."""
+    header = {'spotify_track_id': spotify_track_id, 'matcher': matcher_name, 'max_per_artist': max_per_artist}
+    try:
+        # Not logged for co-occurrence: batch output is not what listeners asked for
+        playlist, _ = load_playlist(spotify_track_id, matcher_name, max_per_artist)
+    except Exception as e:
+        logger.warning('Failed to generate a playlist for %s: %s', spotify_track_id, e)
+        return False, encode_value({**header, 'error': str(e)}) + b'\n'
+    # Tracks are encoded here, in the worker, with the API's cached fragments
+    return True, encode_value(header)[:-1] + b',"tracks":' + encode_tracks(playlist.tracks) + b'}\n'
+
+
+def _init_worker(throttle: Optional[SharedTokenBucket], worker_process: bool = False):
+    if worker_process:
+        # Ctrl-C reaches the whole process group; only the parent should act on it
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+    set_upstream_throttle(throttle.acquire if throttle else None)
+
+
+def generate_lines(seeds: Iterable[str], matcher_name: str, max_per_artist: Optional[int], workers: int,
+                   throttle: Optional[SharedTokenBucket] = None) -> Iterator[Tuple[bool, bytes]]:
+    """generate_line() results in completion order; `workers` 0 runs everything in this process."""
+    if workers == 0:
+        _init_worker(throttle)
+        try:
+            for seed in seeds:
+                yield generate_line(seed, matcher_name, max_per_artist)
+        finally:
+            set_upstream_throttle(None)
+        return
+
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(throttle, True))
+    try:
+        pending = set()
+        for seed in seeds:
+            pending.add(pool.submit(generate_line, seed, matcher_name, max_per_artist))
+            if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
+    except BaseException:
+        # Interrupted: unfinished seeds aren't in the output yet, so stop the workers rather than wait
+        for process in multiprocessing.active_children():
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+
+
+class Progress:
+    """Counts finished seeds and periodically reports totals and throughput."""
+
+    def __init__(self, interval: float = PROGRESS_INTERVAL, stream=None):
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.counts = {'generated': 0, 'failed': 0, 'skipped': 0}
+        self.started = time.monotonic()
+        self._reported = self.started
+
+    def add(self, kind: str):
+        self.counts[kind] += 1
+        if time.monotonic() - self._reported >= self.interval:
+            self.report()
+
+    def report(self, final: bool = False):
+        self._reported = time.monotonic()
+        elapsed = max(self._reported - self.started, 1e-9)
+        finished = self.counts['generated'] + self.counts['failed']
+        print(
+            f"{'done' if final else 'progress'}: {finished:,} playlists in {elapsed:.1f}s "
+            f"({finished / elapsed:,.1f}/s) - failed {self.counts['failed']:,}, "
+            f"skipped {self.counts['skipped']:,} already in the output",
+            file=self.stream
+        )
+
+
+def run(seeds: Iterable[str], output_path: str, matcher_name: str = 'artist',
+        max_per_artist: Optional[int] = None, workers: Optional[int] = None,
+        upstream_rate: float = DEFAULT_UPSTREAM_RATE, upstream_burst: float = DEFAULT_UPSTREAM_BURST,
+        progress: Progress = None) -> Progress:
+    """Append a playlist line to `output_path` for every seed not already in it."""
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    progress = progress or Progress()
+    done = read_checkpoint(output_path, matcher_name, max_per_artist)
+
+    def todo():
+        for seed in seeds:
+            if seed in done:
+                progress.add('skipped')
+                continue
+            done.add(seed)
+            yield seed
+
+    # Map the feature matrix before forking so the workers share its pages
+    get_feature_matrix()
+    throttle = SharedTokenBucket(upstream_rate, upstream_burst) if upstream_rate > 0 else None
+    with open(output_path, 'ab') as output:
+        for succeeded, line in generate_lines(todo(), matcher_name, max_per_artist, workers, throttle):
+            output.write(line)
+            # Written lines are the checkpoint, so don't leave them in our buffer
+            output.flush()
+            progress.add('generated' if succeeded else 'failed')
+    progress.report(final=True)
+    return progress
+
+
+def max_per_artist_arg(value: str) -> int:
+    number = int(value)
+    # Same rule as /generate_playlist; below 1 the re-ranker keeps no candidates
+    if number < 1:
+        raise argparse.ArgumentTypeError('max_per_artist must be at least 1')
+    return number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate playlists for a file of seed track IDs.')
+    parser.add_argument('seeds', nargs='?', default='-', help="file of seed track IDs (optionally .gz), or '-'")
+    parser.add_argument('--output', '-o', required=True, help='JSONL file to append playlists to and resume from')
+    parser.add_argument('--matcher', choices=MATCHER_NAMES, default='artist')
+    parser.add_argument('--max-per-artist', type=max_per_artist_arg)
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per core; 0 runs inline)')
+    parser.add_argument('--upstream-rate', type=float, default=DEFAULT_UPSTREAM_RATE,
+                        help='Spotify requests per second across all workers (0 for no limit)')
+    parser.add_argument('--upstream-burst', type=float, default=DEFAULT_UPSTREAM_BURST)
+    args = parser.parse_args(argv)
+
+    with open_text(args.seeds) as stream:
+        run(iter_seeds(stream), args.output, args.matcher, args.max_per_artist, args.workers,
+            args.upstream_rate, args.upstream_burst)
+
+
+if __name__ == '__main__':
+    main()
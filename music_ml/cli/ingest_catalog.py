@@ -0,0 +1,171 @@
+"""
+Bulk-load Spotify catalog dumps into the local catalog tables.
+
+    python -m music_ml.cli.ingest_catalog tracks.jsonl artists.json.gz features.jsonl
+
+Each input may be JSON Lines, a top-level JSON array, or concatenated Spotify
+API responses ({"tracks": {"items": [...]}}, {"audio_features": [...]}, ...),
+optionally gzipped; '-' reads stdin. Track, artist and audio-feature objects
+are told apart by their "type" field and parsed with the same helpers used
+for live API responses.
+"""
+import argparse
+import sys
+import time
+from typing import Iterator, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from music_ml.stores.catalog_store import (
+    AUDIO_FEATURE_FIELDS,
+    CatalogStore,
+    catalog_artists,
+    catalog_audio_features,
+    catalog_tracks,
+)
+from music_ml.stores.feature_matrix import FEATURE_MATRIX_PATH, write_feature_matrix
+from music_ml.utils.json_stream import iter_json_records, open_text
+from music_ml.utils.spotify_utils import load_spotify_artist, load_spotify_audio_features, load_spotify_tracks
+
+DEFAULT_BATCH_SIZE = 5000
+PROGRESS_INTERVAL = 5.0  # seconds
+
+
+def iter_catalog_objects(record) -> Iterator[Tuple[str, dict]]:
+    """Yield (kind, object) pairs from a dump record, unwrapping API response envelopes."""
+    if not isinstance(record, dict):
+        return
+    for envelope in ('tracks', 'artists', 'audio_features'):
+        if envelope in record and 'id' not in record:
+            items = record[envelope]
+            if isinstance(items, dict):
+                items = items.get('items', [])
+            for item in items:
+                yield from iter_catalog_objects(item)
+            return
+
+    kind = record.get('type')
+    if kind == 'track' or (kind is None and 'album' in record):
+        yield 'track', record
+    elif kind == 'audio_features' or (kind is None and 'danceability' in record):
+        yield 'audio_features', record
+    elif kind == 'artist' or (kind is None and 'name' in record and 'id' in record):
+        yield 'artist', record
+
+
+class Progress:
+    """Counts ingested objects and periodically reports totals and throughput."""
+
+    def __init__(self, interval: float = PROGRESS_INTERVAL, stream=sys.stderr):
+        self.interval = interval
+        self.stream = stream
+        self.counts = {'track': 0, 'artist': 0, 'audio_features': 0, 'skipped': 0}
+        self.started = time.monotonic()
+        self._reported = self.started
+
+    def add(self, kind: str, count: int = 1):
+        self.counts[kind] += count
+        if time.monotonic() - self._reported >= self.interval:
+            self.report()
+
+    def report(self, final: bool = False):
+        self._reported = time.monotonic()
+        elapsed = max(self._reported - self.started, 1e-9)
+        total = sum(count for kind, count in self.counts.items() if kind != 'skipped')
+        print(
+            f"{'done' if final else 'progress'}: {total:,} objects in {elapsed:.1f}s "
+            f"({total / elapsed:,.0f}/s) - tracks {self.counts['track']:,}, "
+            f"artists {self.counts['artist']:,}, audio features {self.counts['audio_features']:,}, "
+            f"skipped {self.counts['skipped']:,}",
+            file=self.stream
+        )
+
+
+class CatalogIngester:
+    """Buffers parsed objects per kind and flushes them as batched upserts."""
+
+    def __init__(self, store: CatalogStore, batch_size: int = DEFAULT_BATCH_SIZE, progress: Progress = None):
+        self.store = store
+        self.batch_size = batch_size
+        self.progress = progress or Progress()
+        self._buffers = {'track': [], 'artist': [], 'audio_features': []}
+
+    def ingest_stream(self, stream):
+        for record in iter_json_records(stream):
+            for kind, obj in iter_catalog_objects(record):
+                self.add(kind, obj)
+
+    def add(self, kind: str, obj: dict):
+        try:
+            if kind == 'track':
+                parsed = load_spotify_tracks({'tracks': {'items': [obj]}})[0]
+            elif kind == 'artist':
+                parsed = load_spotify_artist(obj)
+            else:
+                parsed = load_spotify_audio_features(obj)
+        except (KeyError, IndexError, TypeError):
+            self.progress.add('skipped')
+            return
+
+        buffer = self._buffers[kind]
+        buffer.append(parsed)
+        if len(buffer) >= self.batch_size:
+            self.flush(kind)
+
+    def flush(self, kind: str = None):
+        for name in ([kind] if kind else list(self._buffers)):
+            buffer = self._buffers[name]
+            if not buffer:
+                continue
+            if name == 'track':
+                self.store.upsert_tracks(buffer)
+            elif name == 'artist':
+                self.store.upsert_artists(buffer)
+            else:
+                self.store.upsert_audio_features(buffer)
+            self.progress.add(name, len(buffer))
+            self._buffers[name] = []
+
+
+def build_feature_matrix(store: CatalogStore, root: str = FEATURE_MATRIX_PATH) -> str:
+    """Write the catalog's audio features out as a memory-mapped feature matrix."""
+    track_ids, vectors = [], []
+    for batch in store.iter_audio_features():
+        track_ids.extend(row[0] for row in batch)
+        vectors.append(np.array([row[1:] for row in batch], dtype=np.float32))
+    matrix = np.nan_to_num(np.concatenate(vectors)) if vectors else np.empty((0, len(AUDIO_FEATURE_FIELDS)))
+    return write_feature_matrix(root, track_ids, matrix, AUDIO_FEATURE_FIELDS)
+
+
+def main(argv=None):
+    # DATABASE_URL / FLASK_ENV may come from .env, as for the app
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Bulk-load Spotify catalog dumps into the local catalog.')
+    parser.add_argument('paths', nargs='+', help="JSON/JSONL dump files (optionally .gz), or '-' for stdin")
+    parser.add_argument('--database-url', help='SQLAlchemy URL (defaults to the app database)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='objects per upsert batch')
+    parser.add_argument('--build-feature-matrix', nargs='?', const=FEATURE_MATRIX_PATH, metavar='PATH',
+                        help='rebuild the memory-mapped feature matrix after loading')
+    args = parser.parse_args(argv)
+
+    store = CatalogStore(args.database_url)
+    ingester = CatalogIngester(store, batch_size=args.batch_size)
+    for path in args.paths:
+        with open_text(path) as stream:
+            ingester.ingest_stream(stream)
+    ingester.flush()
+    ingester.progress.report(final=True)
+    print(
+        f"catalog now holds {store.count(catalog_tracks):,} tracks, {store.count(catalog_artists):,} artists, "
+        f"{store.count(catalog_audio_features):,} audio features",
+        file=sys.stderr
+    )
+
+    if args.build_feature_matrix:
+        path = build_feature_matrix(store, args.build_feature_matrix)
+        print(f"feature matrix written to {path}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
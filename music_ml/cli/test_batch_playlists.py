@@ -0,0 +1,101 @@
+import io
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from music_ml.cli.batch_playlists import Progress, SharedTokenBucket, iter_seeds, main, read_checkpoint, run
+from music_ml.models.artist import Artist
+from music_ml.models.playlist import Playlist
+from music_ml.models.track import Track
+
+
+def fake_load_playlist(spotify_track_id, matcher_name='artist', max_per_artist=None):
+    if spotify_track_id == 'missing':
+        raise requests.HTTPError('404 Client Error')
+    artist = Artist(spotify_artist_id='artist1', name='Artist')
+    return Playlist(tracks=[Track(spotify_track_id=spotify_track_id, track_name='Seed', artist=artist),
+                            Track(spotify_track_id=f'{spotify_track_id}-match', track_name='Match', artist=artist)]), True
+
+
+def quiet_progress():
+    return Progress(interval=float('inf'), stream=io.StringIO())
+
+
+def read_output(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_iter_seeds_skips_blank_lines_and_comments():
+    assert list(iter_seeds(io.StringIO('# seeds\nt1\n\n  t2 \n'))) == ['t1', 't2']
+
+
+@patch('music_ml.cli.batch_playlists.load_playlist', side_effect=fake_load_playlist)
+def test_run_writes_playlists_and_errors_as_jsonl(mock_load_playlist, tmp_path):
+    output = tmp_path / 'playlists.jsonl'
+
+    progress = run(['t1', 'missing', 't1'], str(output), matcher_name='cooccurrence', max_per_artist=2,
+                   workers=0, upstream_rate=0, progress=quiet_progress())
+
+    entries = read_output(output)
+    tracks = entries[0].pop('tracks')
+    assert entries[0] == {'spotify_track_id': 't1', 'matcher': 'cooccurrence', 'max_per_artist': 2}
+    assert [track['spotify_track_id'] for track in tracks] == ['t1', 't1-match']
+    assert tracks[0]['artist'] == {'name': 'Artist', 'spotify_artist_id': 'artist1'}
+    assert entries[1]['error'] == '404 Client Error'
+    assert progress.counts == {'generated': 1, 'failed': 1, 'skipped': 1}
+    mock_load_playlist.assert_any_call('t1', 'cooccurrence', 2)
+
+
+@patch('music_ml.cli.batch_playlists.load_playlist', side_effect=fake_load_playlist)
+def test_run_resumes_after_the_last_complete_line(mock_load_playlist, tmp_path):
+    output = tmp_path / 'playlists.jsonl'
+    run(['t1', 'missing'], str(output), workers=0, upstream_rate=0, progress=quiet_progress())
+    # An interrupted write leaves half a line behind
+    with open(output, 'ab') as f:
+        f.write(b'{"spotify_track_id": "t2", "tra')
+    mock_load_playlist.reset_mock()
+
+    progress = run(['t1', 'missing', 't2'], str(output), workers=0, upstream_rate=0, progress=quiet_progress())
+
+    # Failed seeds are retried; seeds generated with other settings don't count
+    assert [call.args[0] for call in mock_load_playlist.call_args_list] == ['missing', 't2']
+    assert [entry['spotify_track_id'] for entry in read_output(output)] == ['t1', 'missing', 'missing', 't2']
+    assert progress.counts['skipped'] == 1
+    assert read_checkpoint(str(output), 'artist', 5) == set()
+
+
+@patch('music_ml.cli.batch_playlists.load_playlist', side_effect=fake_load_playlist)
+def test_main_generates_in_worker_processes(mock_load_playlist, tmp_path, capsys):
+    seeds = tmp_path / 'seeds.txt'
+    seeds.write_text('\n'.join(f't{i}' for i in range(20)))
+    output = tmp_path / 'playlists.jsonl'
+
+    main([str(seeds), '--output', str(output), '--workers', '2', '--matcher', 'related_artist'])
+
+    entries = read_output(output)
+    assert sorted(entry['spotify_track_id'] for entry in entries) == sorted(f't{i}' for i in range(20))
+    assert {entry['matcher'] for entry in entries} == {'related_artist'}
+    assert 'done: 20 playlists' in capsys.readouterr().err
+
+
+@pytest.mark.parametrize('value', ['0', '-1'])
+def test_main_rejects_max_per_artist_below_one(value, tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        main(['-', '--output', str(tmp_path / 'playlists.jsonl'), '--max-per-artist', value])
+
+    assert 'max_per_artist must be at least 1' in capsys.readouterr().err
+    assert not (tmp_path / 'playlists.jsonl').exists()
+
+
+def test_shared_token_bucket_paces_after_burst():
+    bucket = SharedTokenBucket(rate=50.0, burst=2.0)
+
+    started = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+
+    # Two tokens from the burst, then two more at 50 per second
+    assert time.monotonic() - started == pytest.approx(0.04, abs=0.03)
@@ -0,0 +1,67 @@
+import gzip
+import io
+import json
+from music_ml.cli.ingest_catalog import CatalogIngester, Progress, iter_catalog_objects, main
+from music_ml.stores.catalog_store import CatalogStore, catalog_artists, catalog_audio_features, catalog_tracks
+from music_ml.stores.feature_matrix import FeatureMatrix
+
+def track_json(track_id, artist_id='artist1'):
+    return {
+        'type': 'track',
+        'id': track_id,
+        'name': f'Track {track_id}',
+        'artists': [{'id': artist_id, 'name': f'Artist {artist_id}'}],
+        'album': {'images': [{'url': 'large.jpg'}, {'url': 'medium.jpg'}]}
+    }
+
+def features_json(track_id, tempo=120.0):
+    return {'type': 'audio_features', 'id': track_id, 'tempo': tempo, 'energy': 0.5,
+            'valence': 0.4, 'danceability': 0.7}
+
+def test_iter_catalog_objects_unwraps_api_envelopes():
+    record = {'tracks': {'items': [track_json('t1'), track_json('t2')]}}
+    assert [kind for kind, _ in iter_catalog_objects(record)] == ['track', 'track']
+
+    record = {'audio_features': [features_json('t1'), None]}
+    assert [kind for kind, _ in iter_catalog_objects(record)] == ['audio_features']
+
+    record = {'type': 'artist', 'id': 'a1', 'name': 'Artist'}
+    assert list(iter_catalog_objects(record)) == [('artist', record)]
+
+def test_ingester_batches_upserts_and_skips_malformed_objects():
+    store = CatalogStore('sqlite://')
+    progress = Progress(interval=float('inf'), stream=io.StringIO())
+    ingester = CatalogIngester(store, batch_size=2, progress=progress)
+    lines = [track_json('t1'), track_json('t2'), track_json('t1'), {'type': 'track', 'id': 'bad'},
+             features_json('t1'), {'type': 'artist', 'id': 'artist2', 'name': 'Artist 2'}]
+    ingester.ingest_stream(io.StringIO('\n'.join(json.dumps(line) for line in lines)))
+    ingester.flush()
+
+    assert store.count(catalog_tracks) == 2
+    assert store.count(catalog_artists) == 2
+    assert store.count(catalog_audio_features) == 1
+    assert progress.counts == {'track': 3, 'artist': 1, 'audio_features': 1, 'skipped': 1}
+
+    tracks = store.get_tracks(['t2', 'missing', 't1'])
+    assert [track.spotify_track_id for track in tracks] == ['t2', 't1']
+    assert tracks[1].album_image_url == 'medium.jpg'
+    assert tracks[1].artist.name == 'Artist artist1'
+    assert tracks[1].tempo == 120.0
+    assert tracks[0].tempo == 0.0
+
+def test_main_loads_files_and_builds_feature_matrix(tmp_path, capsys):
+    tracks_path = tmp_path / 'tracks.json.gz'
+    with gzip.open(tracks_path, 'wt') as f:
+        json.dump([track_json('t1'), track_json('t2', 'artist2')], f)
+    features_path = tmp_path / 'features.jsonl'
+    features_path.write_text('\n'.join(json.dumps(features_json(t, tempo)) for t, tempo in [('t1', 100), ('t2', 140)]))
+    database_url = f"sqlite:///{tmp_path / 'catalog.db'}"
+    matrix_root = tmp_path / 'matrix'
+
+    main([str(tracks_path), str(features_path), '--database-url', database_url,
+          '--build-feature-matrix', str(matrix_root)])
+
+    output = capsys.readouterr().err
+    assert 'catalog now holds 2 tracks, 2 artists, 2 audio features' in output
+    matrix = FeatureMatrix(str(matrix_root / 'current'))
+    assert matrix.get('t2')[0] == 140
@@ -0,0 +1,10 @@
+import pytest
+from music_ml.stores.tiered_cache import TieredCache, set_cache
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    # Each test gets an empty in-process cache instead of the shared on-disk/Redis one
+    cache = TieredCache()
+    set_cache(cache)
+    yield cache
+    set_cache(None)
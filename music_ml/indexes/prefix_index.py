@@ -0,0 +1,219 @@
+import heapq
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from music_ml.models.track import Track
+from music_ml.stores.catalog_store import CatalogStore, get_database_url
+from music_ml.utils.text import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Prefixes this short are answered from precomputed top-k lists; longer ones by a range scan
+HEAD_LENGTH = 3
+HEAD_SIZE = 32
+# Upper bound on keys examined for one long prefix, to keep lookups in the microsecond range
+MAX_SCAN = 2000
+# A name is also indexed from its next few word starts, so 'beatles' finds 'The Beatles'
+MAX_WORD_STARTS = 3
+
+SUGGEST_UPSTREAM_MIN_LENGTH = int(os.getenv('SUGGEST_UPSTREAM_MIN_LENGTH', 3))
+SUGGEST_UPSTREAM_TTL = int(os.getenv('SUGGEST_UPSTREAM_TTL', 3600))  # seconds
+SUGGEST_CATALOG_LIMIT = int(os.getenv('SUGGEST_CATALOG_LIMIT', 200000))
+MAX_FETCHED_PREFIXES = 10000
+
+_END = chr(0x10ffff)
+
+
+@dataclass(slots=True)
+class Suggestion:
+    text: str
+    type: str  # 'track', 'artist' or 'query'
+    spotify_id: Optional[str] = None
+    artist_name: Optional[str] = None
+    weight: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {'text': self.text, 'type': self.type, 'spotify_id': self.spotify_id, 'artist_name': self.artist_name}
+
+
+class PrefixIndex:
+    """
+    In-memory search-as-you-type index over track names, artist names and
+    past queries.
+
+    Names are normalized and kept in one sorted list of keys, so a prefix is a
+    bisect plus a short scan. Prefixes of up to HEAD_LENGTH characters match
+    too many keys to scan, so each of them keeps a top-HEAD_SIZE list that is
+    maintained on insert (weights only ever grow, so the lists stay exact).
+    Writers take a lock; readers only bisect and copy, so they never block.
+    """
+
+    def __init__(self):
+        self._keys: List[str] = []  # '<normalized suffix>\x00<entry id>'
+        self._entries: Dict[str, Suggestion] = {}
+        self._heads: Dict[str, List[tuple]] = {}
+        self._fetched: 'OrderedDict[str, float]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, text: str, suggestion_type: str, spotify_id: Optional[str] = None,
+            artist_name: Optional[str] = None, weight: float = 1.0):
+        self.add_many([(text, suggestion_type, spotify_id, artist_name, weight)])
+
+    def add_many(self, items: Iterable[Tuple[str, str, Optional[str], Optional[str], float]]):
+        """Add (text, type, spotify_id, artist_name, weight) items; known entries gain weight."""
+        new_keys = []
+        with self._lock:
+            for text, suggestion_type, spotify_id, artist_name, weight in items:
+                normalized = normalize_text(text)
+                if not normalized:
+                    continue
+                entry_id = f'{suggestion_type}:{spotify_id or normalized}'
+                entry = self._entries.get(entry_id)
+                if entry is None:
+                    entry = self._entries[entry_id] = Suggestion(text, suggestion_type, spotify_id, artist_name)
+                    new_keys.extend(f'{suffix}\x00{entry_id}' for suffix in _word_suffixes(normalized))
+                    previous = None
+                else:
+                    previous = _rank(entry_id, entry)
+                    if entry.text != text:
+                        # Same Spotify ID under a new name; it stays indexed under the first one
+                        normalized = normalize_text(entry.text)
+                entry.weight += weight
+                self._update_heads(entry_id, entry, normalized, previous)
+
+            if len(new_keys) <= 16:
+                for key in new_keys:
+                    insort(self._keys, key)
+            else:
+                # Swap in a new list so concurrent readers keep a consistent snapshot
+                self._keys = sorted(self._keys + new_keys)
+
+    def add_tracks(self, tracks: Iterable[Track], weight: float = 1.0):
+        items = []
+        for track in tracks:
+            items.append((track.track_name, 'track', track.spotify_track_id, track.artist.name, weight))
+            items.append((track.artist.name, 'artist', track.artist.spotify_artist_id, None, weight))
+        self.add_many(items)
+
+    def add_search(self, query: str, tracks: List[Track]):
+        """Learn from a completed search: the query itself and the names it returned."""
+        if tracks:
+            self.add(query, 'query')
+        self.add_tracks(tracks)
+
+    def lookup(self, prefix: str, limit: int = 10) -> List[Suggestion]:
+        """Best-weighted entries with a word starting with `prefix`."""
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return []
+        if len(prefix) <= HEAD_LENGTH:
+            entry_ids = [item[3] for item in self._heads.get(prefix, [])[:limit]]
+        else:
+            keys = self._keys
+            lo = bisect_left(keys, prefix)
+            hi = min(bisect_left(keys, prefix + _END, lo), lo + MAX_SCAN)
+            matched = {key.split('\x00', 1)[1] for key in keys[lo:hi]}
+            entry_ids = heapq.nsmallest(
+                limit, matched, key=lambda entry_id: _rank(entry_id, self._entries[entry_id])
+            )
+        return [self._entries[entry_id] for entry_id in entry_ids]
+
+    def should_fetch(self, prefix: str) -> bool:
+        """
+        Whether an unanswered prefix is worth an upstream search: it must be
+        long enough, and neither it nor a shorter prefix of it may have been
+        fetched recently (whatever that search found is already indexed).
+        """
+        prefix = normalize_text(prefix)
+        if len(prefix) < SUGGEST_UPSTREAM_MIN_LENGTH:
+            return False
+        cutoff = time.monotonic() - SUGGEST_UPSTREAM_TTL
+        for end in range(SUGGEST_UPSTREAM_MIN_LENGTH, len(prefix) + 1):
+            fetched_at = self._fetched.get(prefix[:end])
+            if fetched_at is not None and fetched_at > cutoff:
+                return False
+        return True
+
+    def mark_fetched(self, prefix: str):
+        prefix = normalize_text(prefix)
+        with self._lock:
+            self._fetched[prefix] = time.monotonic()
+            self._fetched.move_to_end(prefix)
+            while len(self._fetched) > MAX_FETCHED_PREFIXES:
+                self._fetched.popitem(last=False)
+
+    def _update_heads(self, entry_id: str, entry: Suggestion, normalized: str, previous: Optional[tuple]):
+        # Heads hold (-weight, len, text, entry id) tuples in rank order; `previous` is the
+        # entry's rank before this update, to be replaced wherever it appears
+        rank = _rank(entry_id, entry)
+        prefixes = {suffix[:length] for suffix in _word_suffixes(normalized) for length in range(1, HEAD_LENGTH + 1)}
+        for prefix in prefixes:
+            head = self._heads.setdefault(prefix, [])
+            if previous is not None and previous <= head[-1]:
+                head.remove(previous)
+            if len(head) >= HEAD_SIZE:
+                if rank >= head[-1]:
+                    continue
+                head.pop()
+            insort(head, rank)
+
+
+def _rank(entry_id: str, entry: Suggestion) -> tuple:
+    return -entry.weight, len(entry.text), entry.text, entry_id
+
+
+def _word_suffixes(normalized: str) -> List[str]:
+    """The normalized name starting at each of its first few words."""
+    words = normalized.split(' ')
+    return [' '.join(words[i:]) for i in range(min(len(words), MAX_WORD_STARTS))]
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_prefix_index() -> PrefixIndex:
+    """Return the process-wide prefix index, loading catalog names in the background on first use."""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = PrefixIndex()
+            threading.Thread(target=load_catalog_names, args=(_default_index,),
+                             name='prefix-index-loader', daemon=True).start()
+    return _default_index
+
+
+def load_catalog_names(index: PrefixIndex, store=None, limit: int = SUGGEST_CATALOG_LIMIT) -> int:
+    """Index up to `limit` catalog tracks and their artists. Returns tracks indexed."""
+    try:
+        if store is None:
+            if not get_database_url():
+                return 0
+            store = CatalogStore()
+        loaded = 0
+        # Small batches keep each locked insert short while requests are being served
+        for batch in store.iter_track_names(batch_size=1000):
+            batch = batch[:limit - loaded]
+            items = []
+            for track_id, track_name, artist_id, artist_name, _ in batch:
+                # Catalog names are a baseline; anything users actually search for outranks them
+                items.append((track_name, 'track', track_id, artist_name, 0.1))
+                items.append((artist_name, 'artist', artist_id, None, 0.1))
+            index.add_many(items)
+            loaded += len(batch)
+            if loaded >= limit:
+                break
+        logger.info('Indexed %d catalog tracks for suggestions', loaded)
+        return loaded
+    except Exception:
+        logger.exception('Failed to load catalog names into the prefix index')
+        return 0
@@ -0,0 +1,69 @@
+from unittest.mock import patch
+from music_ml.indexes.prefix_index import HEAD_SIZE, PrefixIndex, load_catalog_names
+from music_ml.models.artist import Artist
+from music_ml.models.track import Track
+from music_ml.stores.catalog_store import CatalogStore
+
+def make_track(track_id, name, artist_id='a1', artist_name='The Beatles'):
+    return Track(spotify_track_id=track_id, track_name=name, artist=Artist(spotify_artist_id=artist_id, name=artist_name))
+
+def test_lookup_matches_normalized_word_prefixes():
+    index = PrefixIndex()
+    index.add_tracks([make_track('t1', 'Here Comes the Sun'), make_track('t2', 'Halo', 'a2', 'Beyoncé')])
+
+    assert [s.text for s in index.lookup('here com')] == ['Here Comes the Sun']
+    assert [s.text for s in index.lookup('comes')] == ['Here Comes the Sun']
+    assert [s.text for s in index.lookup('BEYONCE')] == ['Beyoncé']
+    assert [s.text for s in index.lookup('beatl')] == ['The Beatles']
+    assert index.lookup('xyz') == []
+    assert index.lookup('  ') == []
+
+def test_short_prefixes_rank_by_weight():
+    index = PrefixIndex()
+    index.add('Hello', 'query')
+    index.add('Help!', 'query')
+    index.add('Help!', 'query')
+    index.add('Hey Jude', 'query', weight=5)
+
+    assert [s.text for s in index.lookup('he')] == ['Hey Jude', 'Help!', 'Hello']
+    assert [s.text for s in index.lookup('hel', limit=1)] == ['Help!']
+    assert [s.text for s in index.lookup('hell')] == ['Hello']
+
+def test_short_prefix_heads_stay_exact_when_full():
+    index = PrefixIndex()
+    index.add_many([(f'song {i}', 'query', None, None, 1.0) for i in range(HEAD_SIZE * 2)])
+    index.add('song 50', 'query', weight=10)
+
+    assert index.lookup('s', limit=1)[0].text == 'song 50'
+    assert len(index.lookup('s', limit=100)) == HEAD_SIZE
+
+def test_entries_are_deduplicated_by_spotify_id():
+    index = PrefixIndex()
+    index.add_tracks([make_track('t1', 'Love Love Me Do')])
+    index.add_tracks([make_track('t1', 'Love Love Me Do')])
+
+    suggestions = index.lookup('love')
+    assert [(s.type, s.spotify_id, s.weight) for s in suggestions] == [('track', 't1', 2.0)]
+    assert suggestions[0].to_dict()['artist_name'] == 'The Beatles'
+
+def test_should_fetch_skips_short_and_covered_prefixes():
+    index = PrefixIndex()
+    assert not index.should_fetch('ab')
+    assert index.should_fetch('abc')
+
+    index.mark_fetched('abc')
+    assert not index.should_fetch('abc')
+    assert not index.should_fetch('abcd')
+    assert index.should_fetch('abd')
+
+    with patch('music_ml.indexes.prefix_index.SUGGEST_UPSTREAM_TTL', -1):
+        assert index.should_fetch('abcd')
+
+def test_load_catalog_names(tmp_path):
+    store = CatalogStore(f"sqlite:///{tmp_path / 'catalog.db'}")
+    store.upsert_tracks([make_track(f't{i}', f'Track {i}') for i in range(5)])
+
+    index = PrefixIndex()
+    assert load_catalog_names(index, store, limit=3) == 3
+    assert len([s for s in index.lookup('track', limit=10) if s.type == 'track']) == 3
+    assert index.lookup('beatles')[0].spotify_id == 'a1'
@@ -0,0 +1,81 @@
+import math
+from collections import Counter
+import numpy as np
+from music_ml.indexes.text_index import BM25_B, BM25_K1, TextIndex, load_catalog_tracks
+from music_ml.models.artist import Artist
+from music_ml.models.track import Track
+from music_ml.stores.catalog_store import CatalogStore
+from music_ml.utils.text import tokenize
+
+def make_track(track_id, name, artist_name='Artist', artist_id='a1'):
+    return Track(spotify_track_id=track_id, track_name=name, artist=Artist(spotify_artist_id=artist_id, name=artist_name))
+
+def brute_force_scores(rows, query):
+    docs = [Counter(tokenize(f'{name} {artist}')) for _, name, artist in rows]
+    average_length = sum(sum(doc.values()) for doc in docs) / len(docs)
+    scores = np.zeros(len(docs))
+    for term in set(tokenize(query)):
+        df = sum(term in doc for doc in docs)
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        for i, doc in enumerate(docs):
+            tf = doc[term]
+            if tf:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * sum(doc.values()) / average_length)
+                scores[i] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+    return scores
+
+def test_ranks_matches_by_bm25():
+    index = TextIndex()
+    index.add_tracks([
+        make_track('t1', 'Hey Jude', 'The Beatles'),
+        make_track('t2', 'Hey Ya!', 'OutKast'),
+        make_track('t3', 'Jude', 'Somebody'),
+        make_track('t4', 'Yesterday', 'The Beatles'),
+    ])
+
+    assert [track.spotify_track_id for track in index.search('hey jude')] == ['t1', 't3', 't2']
+    # Shorter documents win on equal term frequency
+    assert [track.spotify_track_id for track in index.search('BEATLES', limit=1)] == ['t4']
+    assert index.search('nothing here') == []
+    assert index.search('') == []
+
+def test_top_k_matches_brute_force():
+    rng = np.random.default_rng(0)
+    words = [f'w{i}' for i in range(40)]
+    rows = []
+    for i in range(2000):
+        # Skewed word frequencies so some terms are common and pruning kicks in
+        name = ' '.join(words[int(w)] for w in rng.zipf(1.3, size=rng.integers(1, 5)) % 40)
+        rows.append((f't{i}', name, words[i % 7]))
+    index = TextIndex()
+    index.add_tracks([make_track(track_id, name, artist) for track_id, name, artist in rows])
+
+    for query in ('w1 w2', 'w0 w1 w3', 'w5 w39', 'w1'):
+        expected = brute_force_scores(rows, query)
+        found = [int(track.spotify_track_id[1:]) for track in index.search(query, limit=10)]
+        assert np.allclose(expected[found], np.sort(expected)[::-1][:10], rtol=1e-4)
+
+def test_reindexing_a_renamed_track_replaces_it():
+    index = TextIndex()
+    index.add_tracks([make_track('t1', 'Old Name'), make_track('t2', 'Other')])
+    index.add_tracks([make_track('t1', 'New Name')])
+
+    assert len(index) == 2
+    assert index.search('old') == []
+    assert [track.track_name for track in index.search('name')] == ['New Name']
+
+def test_cached_results_are_invalidated_by_new_tracks():
+    index = TextIndex()
+    index.add_tracks([make_track('t1', 'Song')])
+    assert len(index.search('song')) == 1
+
+    index.add_tracks([make_track('t2', 'Song')])
+    assert len(index.search('song')) == 2
+
+def test_load_catalog_tracks(tmp_path):
+    store = CatalogStore(f"sqlite:///{tmp_path / 'catalog.db'}")
+    store.upsert_tracks([make_track(f't{i}', f'Track {i}') for i in range(3)])
+
+    index = TextIndex()
+    assert load_catalog_tracks(index, store) == 3
+    assert index.search('track 2')[0].spotify_track_id == 't2'
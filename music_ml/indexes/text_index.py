@@ -0,0 +1,268 @@
+import logging
+import math
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from music_ml.models.artist import Artist, intern_artist
+from music_ml.models.track import Track
+from music_ml.stores.catalog_store import CatalogStore, get_database_url
+from music_ml.utils.text import normalize_text, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Standard BM25 parameters: term-frequency saturation and document-length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+QUERY_CACHE_SIZE = 4096
+INITIAL_CAPACITY = 4
+
+
+class _Postings:
+    """Growable doc-ID and term-frequency arrays for one term; appends are amortized O(1)."""
+    __slots__ = ('doc_ids', 'tfs', 'size', 'scores')
+
+    def __init__(self):
+        self.doc_ids = np.empty(INITIAL_CAPACITY, dtype=np.uint32)
+        self.tfs = np.empty(INITIAL_CAPACITY, dtype=np.uint16)
+        self.size = 0
+        # (collection stats, BM25 scores, max score) from the last query that used this term
+        self.scores = None
+
+    def append(self, doc_id: int, tf: int):
+        if self.size == len(self.doc_ids):
+            # Grow into new arrays; readers holding the old ones still see a valid prefix
+            doc_ids = np.empty(self.size * 2, dtype=np.uint32)
+            tfs = np.empty(self.size * 2, dtype=np.uint16)
+            doc_ids[:self.size] = self.doc_ids[:self.size]
+            tfs[:self.size] = self.tfs[:self.size]
+            self.doc_ids, self.tfs = doc_ids, tfs
+        self.doc_ids[self.size] = doc_id
+        self.tfs[self.size] = min(tf, 0xffff)
+        self.size += 1
+
+    def view(self) -> Tuple[np.ndarray, np.ndarray]:
+        size = self.size
+        return self.doc_ids[:size], self.tfs[:size]
+
+
+class TextIndex:
+    """
+    In-memory inverted index over track and artist names, ranked with BM25.
+
+    Each track is one document (track name + artist name). Posting lists are
+    NumPy uint32 doc-ID / uint16 term-frequency arrays that grow by doubling,
+    so new tracks are appended without rebuilding anything. Re-adding a known
+    track with a different name tombstones its old document. Writers take a
+    lock; searches read array snapshots and never block.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, _Postings] = {}
+        self._doc_index: Dict[str, int] = {}
+        self._track_ids: List[str] = []
+        self._track_names: List[str] = []
+        self._artists: List[Artist] = []
+        self._album_image_urls: List[Optional[str]] = []
+        self._lengths = np.empty(INITIAL_CAPACITY, dtype=np.uint16)
+        self._alive = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        self._total_length = 0
+        self._live_count = 0
+        self._cache: 'OrderedDict[Tuple[str, int], List[int]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._live_count
+
+    def add_tracks(self, tracks: Iterable[Track]):
+        self.add_rows(
+            (track.spotify_track_id, track.track_name, track.artist.spotify_artist_id, track.artist.name,
+             track.album_image_url)
+            for track in tracks
+        )
+
+    def add_rows(self, rows: Iterable[Tuple[str, str, str, str, Optional[str]]]):
+        """Index (spotify_track_id, track_name, spotify_artist_id, artist_name, album_image_url) rows."""
+        changed = False
+        with self._lock:
+            for track_id, track_name, artist_id, artist_name, album_image_url in rows:
+                doc_id = self._doc_index.get(track_id)
+                if doc_id is not None:
+                    if (self._track_names[doc_id] == track_name
+                            and self._artists[doc_id].spotify_artist_id == artist_id):
+                        continue
+                    self._alive[doc_id] = False
+                    self._total_length -= int(self._lengths[doc_id])
+                    self._live_count -= 1
+
+                terms = Counter(tokenize(f'{track_name} {artist_name}'))
+                doc_id = len(self._track_ids)
+                self._ensure_capacity(doc_id + 1)
+                self._doc_index[track_id] = doc_id
+                self._track_ids.append(track_id)
+                self._track_names.append(track_name)
+                self._artists.append(intern_artist(artist_id, artist_name))
+                self._album_image_urls.append(album_image_url)
+                length = sum(terms.values())
+                self._lengths[doc_id] = min(length, 0xffff)
+                for term, tf in terms.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = _Postings()
+                    postings.append(doc_id, tf)
+                self._alive[doc_id] = True
+                self._total_length += length
+                self._live_count += 1
+                changed = True
+            if changed:
+                self._cache = OrderedDict()
+
+    def search(self, query: str, limit: int = 20) -> List[Track]:
+        """Return up to `limit` tracks ranked by BM25 against the query terms."""
+        key = (normalize_text(query), limit)
+        cache = self._cache
+        doc_ids = cache.get(key)
+        if doc_ids is None:
+            doc_ids = self._rank(key[0].split(), limit)
+            cache[key] = doc_ids
+            if len(cache) > QUERY_CACHE_SIZE:
+                cache.popitem(last=False)
+        return [self._track(doc_id) for doc_id in doc_ids]
+
+    def _rank(self, terms: List[str], limit: int) -> List[int]:
+        """
+        Exact BM25 top-k with MaxScore pruning: terms are visited in order of
+        their best possible score, each new document is scored against every
+        query term, and the walk stops once the terms left could not lift a
+        document they alone contain above the current k-th best score. Common,
+        low-idf terms ('the', 'love') are then only probed, not scanned.
+        """
+        live_count, total_length = self._live_count, self._total_length
+        if not terms or not live_count or limit <= 0:
+            return []
+        # Documents appended after this point are ignored; the arrays always cover doc_count
+        doc_count = len(self._track_ids)
+        lengths, alive = self._lengths, self._alive
+        average_length = total_length / live_count
+
+        term_postings = []
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            doc_ids, tfs = postings.view()
+            end = np.searchsorted(doc_ids, doc_count)
+            doc_ids, tfs = doc_ids[:end], tfs[:end]
+            # Per-term scores only change when a document is added, so reuse the last ones
+            stats = (len(doc_ids), live_count, total_length)
+            cached = postings.scores
+            if cached is not None and cached[0] == stats:
+                _, scores, bound = cached
+            else:
+                # Tombstoned documents still sit in the posting lists, so df is approximate
+                df = len(doc_ids)
+                idf = math.log(1 + (live_count - df + 0.5) / (df + 0.5))
+                tf = tfs.astype(np.float32)
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc_ids] / average_length)
+                scores = (idf * (BM25_K1 + 1)) * tf / (tf + norm)
+                bound = float(scores.max())
+                postings.scores = (stats, scores, bound)
+            term_postings.append((bound, doc_ids, scores))
+        term_postings.sort(key=lambda item: -item[0])
+
+        best_ids = np.empty(0, dtype=np.uint32)
+        best_scores = np.empty(0, dtype=np.float32)
+        remaining_bound = sum(item[0] for item in term_postings)
+        for j, (bound, doc_ids, scores) in enumerate(term_postings):
+            full = len(best_ids) >= limit
+            threshold = best_scores.min() if full else 0.0
+            if full and remaining_bound <= threshold:
+                break
+            remaining_bound -= bound
+
+            # A document first seen here scores at most its score here plus the later terms' bounds
+            keep = alive[doc_ids]
+            if full:
+                keep &= scores + remaining_bound > threshold
+            # Documents in an earlier term have already been scored in full
+            for _, seen_ids, _ in term_postings[:j]:
+                keep[keep] &= ~_contains(seen_ids, doc_ids[keep])[0]
+            doc_ids, scores = doc_ids[keep], scores[keep]
+            if not len(doc_ids):
+                continue
+
+            for _, other_ids, other_scores in term_postings[j + 1:]:
+                hit, positions = _contains(other_ids, doc_ids)
+                scores[hit] += other_scores[positions[hit]]
+
+            best_ids = np.concatenate((best_ids, doc_ids))
+            best_scores = np.concatenate((best_scores, scores))
+            if len(best_ids) > limit:
+                top = np.argpartition(-best_scores, limit)[:limit]
+                best_ids, best_scores = best_ids[top], best_scores[top]
+
+        # Highest score first; earlier-indexed documents win ties
+        order = np.lexsort((best_ids, -best_scores))
+        return best_ids[order].tolist()
+
+    def _track(self, doc_id: int) -> Track:
+        return Track(
+            spotify_track_id=self._track_ids[doc_id],
+            track_name=self._track_names[doc_id],
+            artist=self._artists[doc_id],
+            album_image_url=self._album_image_urls[doc_id],
+        )
+
+    def _ensure_capacity(self, size: int):
+        if size <= len(self._lengths):
+            return
+        capacity = max(size, len(self._lengths) * 2)
+        lengths = np.zeros(capacity, dtype=np.uint16)
+        alive = np.zeros(capacity, dtype=bool)
+        lengths[:len(self._lengths)] = self._lengths
+        alive[:len(self._alive)] = self._alive
+        self._lengths, self._alive = lengths, alive
+
+
+def _contains(sorted_ids: np.ndarray, doc_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Which of doc_ids occur in the sorted array, and at which positions."""
+    positions = np.searchsorted(sorted_ids, doc_ids)
+    positions[positions == len(sorted_ids)] = 0
+    hit = sorted_ids[positions] == doc_ids if len(sorted_ids) else np.zeros(len(doc_ids), dtype=bool)
+    return hit, positions
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_text_index() -> TextIndex:
+    """Return the process-wide text index, loading the catalog in the background on first use."""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = TextIndex()
+            threading.Thread(target=load_catalog_tracks, args=(_default_index,),
+                             name='text-index-loader', daemon=True).start()
+    return _default_index
+
+
+def load_catalog_tracks(index: TextIndex, store: CatalogStore = None) -> int:
+    """Index every catalog track. Returns tracks indexed."""
+    try:
+        if store is None:
+            if not get_database_url():
+                return 0
+            store = CatalogStore()
+        loaded = 0
+        for batch in store.iter_track_names(batch_size=5000):
+            index.add_rows(batch)
+            loaded += len(batch)
+        logger.info('Indexed %d catalog tracks for local search', loaded)
+        return loaded
+    except Exception:
+        logger.exception('Failed to load the catalog into the text index')
+        return 0
@@ -0,0 +1,18 @@
+from typing import List, Optional
+from music_ml.matchers.matcher import Matcher
+from music_ml.models.track import Track
+from music_ml.stores.cooccurrence_store import CooccurrenceStore, get_cooccurrence_store
+
+class CooccurrenceMatcher(Matcher):
+    """
+    Collaborative matcher: returns the tracks that most often appear in logged
+    playlists alongside the input track. Served entirely from memory, so it
+    makes no upstream calls.
+    """
+
+    def __init__(self, store: Optional[CooccurrenceStore] = None):
+        self.store = store if store is not None else get_cooccurrence_store()
+
+    def match(self, input_track: Track, n: int) -> List[Track]:
+        neighbors = self.store.top_k(input_track.spotify_track_id, n)
+        return [track for track, _ in neighbors]
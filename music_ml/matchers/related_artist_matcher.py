@@ -0,0 +1,140 @@
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from typing import Callable, Dict, List, Optional
+
+from music_ml.matchers.matcher import Matcher
+from music_ml.models.track import Track
+from music_ml.services.spotify_service import get_artist_top_tracks, get_related_artists
+from music_ml.stores.artist_graph_store import ArtistGraphStore, get_artist_graph_store
+
+logger = logging.getLogger(__name__)
+
+
+class RelatedArtistMatcher(Matcher):
+    """
+    Expands the related-artists graph breadth-first from the seed's artist and
+    samples top tracks across the expanded set.
+
+    Each frontier level is fetched concurrently (at most `max_workers` upstream
+    calls in flight) and adjacency lists are cached in an ArtistGraphStore.
+    The seed artist's top tracks are fetched while the graph expands. Work that
+    has not finished when `latency_budget` runs out is dropped and the
+    playlist is built from whatever was collected.
+    """
+
+    def __init__(self, depth: int = 2, fan_out: int = 5, tracks_per_artist: int = 3,
+                 max_workers: int = 8, latency_budget: float = 3.0,
+                 graph_store: Optional[ArtistGraphStore] = None):
+        self.depth = depth
+        self.fan_out = fan_out
+        self.tracks_per_artist = tracks_per_artist
+        self.max_workers = max_workers
+        self.latency_budget = latency_budget
+        self._graph_store = graph_store
+
+    @property
+    def graph_store(self) -> ArtistGraphStore:
+        if self._graph_store is None:
+            self._graph_store = get_artist_graph_store()
+        return self._graph_store
+
+    def match(self, input_track: Track, n: int) -> List[Track]:
+        deadline = time.monotonic() + self.latency_budget
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        # Only expand and fetch top tracks for as many artists as the playlist can use
+        needed = -(-n // self.tracks_per_artist) + 1
+        try:
+            # Started alongside the expansion, so a slow graph walk cannot cost the seed artist's own tracks
+            seed_futures = self._submit(executor, get_artist_top_tracks, [input_track.artist.spotify_artist_id])
+            artist_ids = self.expand(input_track.artist.spotify_artist_id, executor, deadline, needed)
+            futures = {**seed_futures, **self._submit(executor, get_artist_top_tracks, artist_ids[1:needed])}
+            top_tracks = self._collect(futures, deadline, 'get_artist_top_tracks')
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return self._sample(input_track, artist_ids, top_tracks, n)
+
+    def expand(self, seed_artist_id: str, executor: ThreadPoolExecutor, deadline: float,
+               limit: Optional[int] = None) -> List[str]:
+        """
+        Return artist IDs reachable from the seed in BFS order, seed first.
+        Expansion stops early once `limit` artists have been collected.
+        """
+        visited = [seed_artist_id]
+        seen = {seed_artist_id}
+        frontier = [seed_artist_id]
+
+        for _ in range(self.depth):
+            if not frontier or time.monotonic() >= deadline:
+                break
+            if limit is not None and len(visited) >= limit:
+                break
+
+            adjacency = self.graph_store.get_many(frontier)
+            misses = [artist_id for artist_id in frontier if artist_id not in adjacency]
+            fetched = self._run_bounded(executor, get_related_artists, misses, deadline)
+            for artist_id, neighbors in fetched.items():
+                self.graph_store.put(artist_id, neighbors)
+            adjacency.update(fetched)
+
+            next_frontier = []
+            for artist_id in frontier:
+                for neighbor in adjacency.get(artist_id, [])[:self.fan_out]:
+                    if neighbor.spotify_artist_id not in seen:
+                        seen.add(neighbor.spotify_artist_id)
+                        next_frontier.append(neighbor.spotify_artist_id)
+            visited.extend(next_frontier)
+            frontier = next_frontier
+
+        return visited if limit is None else visited[:limit]
+
+    def _run_bounded(self, executor: ThreadPoolExecutor, fetch: Callable, artist_ids: List[str],
+                     deadline: float) -> Dict[str, list]:
+        """Call `fetch` for each artist concurrently, keeping results that finish before the deadline."""
+        return self._collect(self._submit(executor, fetch, artist_ids), deadline, getattr(fetch, '__name__', 'fetch'))
+
+    @staticmethod
+    def _submit(executor: ThreadPoolExecutor, fetch: Callable, artist_ids: List[str]) -> Dict[Future, str]:
+        # Each call runs in a copy of this context, so per-request counts and profile spans include it
+        return {executor.submit(copy_context().run, fetch, artist_id): artist_id for artist_id in artist_ids}
+
+    @staticmethod
+    def _collect(futures: Dict[Future, str], deadline: float, name: str) -> Dict[str, list]:
+        """Results of the calls that finish before the deadline, by artist ID; the rest are cancelled."""
+        if not futures:
+            return {}
+        done, not_done = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        for future in not_done:
+            future.cancel()
+        if not_done:
+            logger.warning("Latency budget exhausted, dropped %d of %d %s calls",
+                           len(not_done), len(futures), name)
+
+        results = {}
+        for future in done:
+            try:
+                results[futures[future]] = future.result()
+            except Exception:
+                logger.exception("%s failed for artist %s", name, futures[future])
+        return results
+
+    def _sample(self, input_track: Track, artist_ids: List[str],
+                top_tracks: Dict[str, List[Track]], n: int) -> List[Track]:
+        """Round-robin over artists in BFS order so closer artists come first and no artist dominates."""
+        seen_ids = {input_track.spotify_track_id}
+        per_artist = [
+            [track for track in top_tracks.get(artist_id, []) if track.spotify_track_id not in seen_ids]
+            [:self.tracks_per_artist]
+            for artist_id in artist_ids
+        ]
+        matching_tracks = []
+        for rank in range(self.tracks_per_artist):
+            for tracks in per_artist:
+                if rank < len(tracks) and tracks[rank].spotify_track_id not in seen_ids:
+                    seen_ids.add(tracks[rank].spotify_track_id)
+                    matching_tracks.append(tracks[rank])
+                    if len(matching_tracks) == n:
+                        return matching_tracks
+        return matching_tracks
@@ -0,0 +1,20 @@
+from music_ml.models.track import Track, Artist
+from music_ml.matchers.cooccurrence_matcher import CooccurrenceMatcher
+from music_ml.stores.cooccurrence_store import CooccurrenceStore
+
+def make_track(track_id):
+    return Track(spotify_track_id=track_id, track_name=f'Track {track_id}',
+                 artist=Artist(name='Test Artist', spotify_artist_id='artist'))
+
+def test_cooccurrence_matcher_returns_top_neighbors():
+    store = CooccurrenceStore(path=':memory:')
+    seed, a, b, c = (make_track(track_id) for track_id in ['seed', 'a', 'b', 'c'])
+    store.apply([([seed, a, b], 1.0), ([seed, b], 1.0), ([a, c], 1.0)])
+
+    result = CooccurrenceMatcher(store=store).match(seed, n=5)
+    assert [track.spotify_track_id for track in result] == ['b', 'a']
+
+def test_cooccurrence_matcher_unknown_track_returns_empty_list():
+    store = CooccurrenceStore(path=':memory:')
+    result = CooccurrenceMatcher(store=store).match(make_track('seed'), n=5)
+    assert result == []
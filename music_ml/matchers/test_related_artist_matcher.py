@@ -0,0 +1,89 @@
+import time
+import pytest
+from unittest.mock import patch
+from music_ml.models.track import Track, Artist
+from music_ml.matchers.related_artist_matcher import RelatedArtistMatcher
+from music_ml.stores.artist_graph_store import ArtistGraphStore
+
+# Small related-artists graph: seed -> a, b; a -> c; b -> c, d
+GRAPH = {
+    'seed': ['a', 'b'],
+    'a': ['c'],
+    'b': ['c', 'd'],
+    'c': [],
+    'd': [],
+}
+
+def fake_related_artists(artist_id):
+    return [Artist(name=f'Artist {neighbor}', spotify_artist_id=neighbor) for neighbor in GRAPH[artist_id]]
+
+def fake_top_tracks(artist_id):
+    artist = Artist(name=f'Artist {artist_id}', spotify_artist_id=artist_id)
+    return [Track(spotify_track_id=f'{artist_id}-{i}', track_name=f'Track {i}', artist=artist) for i in range(5)]
+
+@pytest.fixture
+def graph_store():
+    return ArtistGraphStore(path=':memory:')
+
+@pytest.fixture
+def input_track():
+    return Track(spotify_track_id='seed-0', track_name='Seed',
+                 artist=Artist(name='Seed Artist', spotify_artist_id='seed'))
+
+@patch('music_ml.matchers.related_artist_matcher.get_artist_top_tracks', side_effect=fake_top_tracks)
+@patch('music_ml.matchers.related_artist_matcher.get_related_artists', side_effect=fake_related_artists)
+def test_expands_graph_and_samples_across_artists(mock_related, mock_top, graph_store, input_track):
+    matcher = RelatedArtistMatcher(depth=2, fan_out=5, tracks_per_artist=2, graph_store=graph_store)
+    result = matcher.match(input_track, n=8)
+
+    assert len(result) == 8
+    assert 'seed-0' not in [track.spotify_track_id for track in result]
+    # Round-robin in BFS order: every artist's first track before anyone's second
+    assert [track.spotify_track_id for track in result[:4]] == ['seed-1', 'a-0', 'b-0', 'c-0']
+    assert {track.artist.spotify_artist_id for track in result} == {'seed', 'a', 'b', 'c', 'd'}
+
+@patch('music_ml.matchers.related_artist_matcher.get_artist_top_tracks', side_effect=fake_top_tracks)
+@patch('music_ml.matchers.related_artist_matcher.get_related_artists', side_effect=fake_related_artists)
+def test_depth_and_fan_out_limit_expansion(mock_related, mock_top, graph_store, input_track):
+    matcher = RelatedArtistMatcher(depth=1, fan_out=1, tracks_per_artist=5, graph_store=graph_store)
+    result = matcher.match(input_track, n=19)
+
+    assert {track.artist.spotify_artist_id for track in result} == {'seed', 'a'}
+    mock_related.assert_called_once_with('seed')
+
+@patch('music_ml.matchers.related_artist_matcher.get_artist_top_tracks', side_effect=fake_top_tracks)
+@patch('music_ml.matchers.related_artist_matcher.get_related_artists', side_effect=fake_related_artists)
+def test_cached_adjacency_skips_network(mock_related, mock_top, graph_store, input_track):
+    matcher = RelatedArtistMatcher(depth=2, tracks_per_artist=1, graph_store=graph_store)
+    matcher.match(input_track, n=19)
+    calls = mock_related.call_count
+
+    matcher.match(input_track, n=19)
+    assert calls > 0
+    assert mock_related.call_count == calls
+
+@patch('music_ml.matchers.related_artist_matcher.get_artist_top_tracks', side_effect=fake_top_tracks)
+@patch('music_ml.matchers.related_artist_matcher.get_related_artists')
+def test_latency_budget_drops_slow_calls(mock_related, mock_top, graph_store, input_track):
+    def slow_related(artist_id):
+        time.sleep(1)
+        return fake_related_artists(artist_id)
+    mock_related.side_effect = slow_related
+
+    matcher = RelatedArtistMatcher(latency_budget=0.2, graph_store=graph_store)
+    start = time.monotonic()
+    result = matcher.match(input_track, n=5)
+
+    assert time.monotonic() - start < 0.9
+    # Only the seed artist was reachable inside the budget, and its tracks were fetched during the expansion
+    assert [track.spotify_track_id for track in result] == ['seed-1', 'seed-2', 'seed-3']
+
+@patch('music_ml.matchers.related_artist_matcher.get_artist_top_tracks', side_effect=fake_top_tracks)
+@patch('music_ml.matchers.related_artist_matcher.get_related_artists')
+def test_failed_related_artist_fetch_is_skipped(mock_related, mock_top, graph_store, input_track):
+    mock_related.side_effect = Exception('API Error')
+
+    matcher = RelatedArtistMatcher(graph_store=graph_store)
+    result = matcher.match(input_track, n=3)
+
+    assert [track.spotify_track_id for track in result] == ['seed-1', 'seed-2', 'seed-3']
@@ -1,7 +1,18 @@
 from dataclasses import dataclass
+from weakref import WeakValueDictionary
 
-@dataclass
+@dataclass(frozen=True, slots=True, weakref_slot=True)
 class Artist:
     name: str
     spotify_artist_id: str
-    
\ No newline at end of file
+
+# One Artist object per artist ID while anything still references it
+_interned_artists: "WeakValueDictionary[str, Artist]" = WeakValueDictionary()
+
+def intern_artist(spotify_artist_id: str, name: str) -> Artist:
+    """Return the shared Artist for an ID, creating (or renaming) it if needed."""
+    artist = _interned_artists.get(spotify_artist_id)
+    if artist is None or artist.name != name:
+        artist = Artist(name=name, spotify_artist_id=spotify_artist_id)
+        _interned_artists[spotify_artist_id] = artist
+    return artist
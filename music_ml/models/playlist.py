@@ -2,6 +2,6 @@ from dataclasses import dataclass
 from music_ml.models.track import Track
 from typing import List
 
-@dataclass
+@dataclass(slots=True)
 class Playlist:
     tracks: List[Track]
\ No newline at end of file
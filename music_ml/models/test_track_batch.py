@@ -0,0 +1,60 @@
+import dataclasses
+import numpy as np
+import pytest
+from music_ml.models.artist import Artist, intern_artist
+from music_ml.models.track import Track
+from music_ml.models.track_batch import TrackBatch
+
+def test_intern_artist_returns_shared_instances():
+    first = intern_artist('artist1', 'Artist One')
+    assert intern_artist('artist1', 'Artist One') is first
+    assert first == Artist(name='Artist One', spotify_artist_id='artist1')
+
+    renamed = intern_artist('artist1', 'Artist 1')
+    assert renamed.name == 'Artist 1'
+    assert intern_artist('artist1', 'Artist 1') is renamed
+
+def test_models_are_slotted_and_artist_is_frozen():
+    artist = Artist(name='Artist', spotify_artist_id='artist1')
+    track = Track(spotify_track_id='t1', track_name='Track', artist=artist)
+    assert not hasattr(track, '__dict__')
+    assert not hasattr(artist, '__dict__')
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        artist.name = 'Renamed'
+
+def test_track_batch_round_trip():
+    artist_a = Artist(name='A', spotify_artist_id='a')
+    artist_b = Artist(name='B', spotify_artist_id='b')
+    tracks = [
+        Track(spotify_track_id='t1', track_name='One', artist=artist_a, tempo=120.0, energy=0.5),
+        Track(spotify_track_id='t2', track_name='Two', artist=artist_b, album_image_url='two.jpg'),
+        Track(spotify_track_id='t3', track_name='Three', artist=artist_a, valence=None),
+    ]
+    batch = TrackBatch.from_tracks(tracks)
+
+    assert len(batch) == 3
+    assert batch.features.dtype == np.float32
+    assert list(batch.artist_codes) == [0, 1, 0]
+    assert batch.id_list() == ['t1', 't2', 't3']
+    assert batch.to_tracks() == [
+        tracks[0], tracks[1],
+        Track(spotify_track_id='t3', track_name='Three', artist=artist_a, valence=0.0)
+    ]
+
+    taken = batch.take([2, 0])
+    assert taken.id_list() == ['t3', 't1']
+    assert taken[1].tempo == 120.0
+
+def test_track_batch_from_columns_interns_artists():
+    batch = TrackBatch.from_columns(
+        track_ids=['t1', 't2', 't3'],
+        track_names=['One', 'Two', 'Three'],
+        artist_ids=['b', 'a', 'b'],
+        artist_names=['B', 'A', 'B'],
+        features=[[1, 2, 3, 4]] * 3
+    )
+    assert len(batch.artists) == 2
+    assert batch[0].artist is batch[2].artist
+    assert batch[0].artist is intern_artist('b', 'B')
+    assert batch[1].artist.name == 'A'
+    assert batch[2].danceability == 4.0
@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from music_ml.models.artist import Artist
 from typing import Optional
 
-@dataclass
+@dataclass(slots=True)
 class Track:
     spotify_track_id: str
     track_name: str
@@ -13,4 +13,3 @@ class Track:
     energy: Optional[float]= 0.0
     valence: Optional[float] = 0.0
     danceability: Optional[float] = 0.0
-    
\ No newline at end of file
@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from music_ml.models.artist import Artist, intern_artist
+from music_ml.models.track import Track
+
+FEATURE_FIELDS = ('tempo', 'energy', 'valence', 'danceability')
+
+
+@dataclass(slots=True)
+class TrackBatch:
+    """
+    Columnar collection of tracks for bulk paths (caching, matching, ingest).
+
+    Instead of one Track object per row, a batch keeps parallel arrays: IDs as
+    fixed-width bytes, names and image URLs as lists, one small int per row
+    pointing into a list of unique (interned) artists, and audio features as a
+    single float32 (n, 4) matrix in FEATURE_FIELDS order.
+    """
+    track_ids: np.ndarray
+    track_names: List[str]
+    artist_codes: np.ndarray
+    artists: List[Artist]
+    album_image_urls: List[Optional[str]]
+    features: np.ndarray
+
+    @classmethod
+    def from_tracks(cls, tracks: Sequence[Track]) -> 'TrackBatch':
+        artist_codes = np.empty(len(tracks), dtype=np.int32)
+        artists: List[Artist] = []
+        artist_index = {}
+        for i, track in enumerate(tracks):
+            artist_id = track.artist.spotify_artist_id
+            code = artist_index.get(artist_id)
+            if code is None:
+                code = artist_index[artist_id] = len(artists)
+                artists.append(track.artist)
+            artist_codes[i] = code
+
+        features = np.array(
+            [[track.tempo, track.energy, track.valence, track.danceability] for track in tracks], dtype=float
+        ).reshape(len(tracks), len(FEATURE_FIELDS))
+        return cls(
+            track_ids=_encode_ids(track.spotify_track_id for track in tracks),
+            track_names=[track.track_name for track in tracks],
+            artist_codes=artist_codes,
+            artists=artists,
+            album_image_urls=[track.album_image_url for track in tracks],
+            # Missing (None) audio features count as 0.0
+            features=np.nan_to_num(features).astype(np.float32),
+        )
+
+    @classmethod
+    def from_columns(cls, track_ids: Sequence[str], track_names: Sequence[str], artist_ids: Sequence[str],
+                     artist_names: Sequence[str], album_image_urls: Sequence[Optional[str]] = None,
+                     features: Optional[np.ndarray] = None) -> 'TrackBatch':
+        """Build a batch straight from column data (e.g. catalog rows) without creating Track objects."""
+        unique_ids, first, artist_codes = np.unique(np.asarray(artist_ids), return_index=True, return_inverse=True)
+        artists = [intern_artist(str(unique_ids[i]), artist_names[first[i]]) for i in range(len(unique_ids))]
+        n = len(track_ids)
+        return cls(
+            track_ids=_encode_ids(track_ids),
+            track_names=list(track_names),
+            artist_codes=artist_codes.astype(np.int32).reshape(n),
+            artists=artists,
+            album_image_urls=list(album_image_urls) if album_image_urls is not None else [None] * n,
+            features=(np.zeros((n, len(FEATURE_FIELDS)), dtype=np.float32) if features is None
+                      else np.asarray(features, dtype=np.float32).reshape(n, len(FEATURE_FIELDS))),
+        )
+
+    def __len__(self):
+        return len(self.track_names)
+
+    def __getitem__(self, i: int) -> Track:
+        tempo, energy, valence, danceability = (float(value) for value in self.features[i])
+        return Track(
+            spotify_track_id=self.track_ids[i].decode(),
+            track_name=self.track_names[i],
+            artist=self.artists[self.artist_codes[i]],
+            album_image_url=self.album_image_urls[i],
+            tempo=tempo,
+            energy=energy,
+            valence=valence,
+            danceability=danceability,
+        )
+
+    def to_tracks(self) -> List[Track]:
+        return [self[i] for i in range(len(self))]
+
+    def id_list(self) -> List[str]:
+        return [track_id.decode() for track_id in self.track_ids]
+
+    def take(self, indices: Sequence[int]) -> 'TrackBatch':
+        """Return a new batch holding the given rows, in the given order."""
+        indices = np.asarray(indices, dtype=np.intp)
+        return TrackBatch(
+            track_ids=self.track_ids[indices],
+            track_names=[self.track_names[i] for i in indices],
+            artist_codes=self.artist_codes[indices],
+            artists=self.artists,
+            album_image_urls=[self.album_image_urls[i] for i in indices],
+            features=self.features[indices],
+        )
+
+
+def _encode_ids(track_ids: Iterable[str]) -> np.ndarray:
+    encoded = [track_id.encode() for track_id in track_ids]
+    return np.array(encoded) if encoded else np.empty(0, dtype='S22')
@@ -0,0 +1,142 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from music_ml.models.track import Track
+from music_ml.models.track_batch import FEATURE_FIELDS, TrackBatch
+from music_ml.rerankers.reranker import Reranker
+from music_ml.stores.feature_matrix import FeatureMatrix
+
+TRANSITION_FIELDS = ('tempo', 'energy')
+
+
+def mmr_select(features: np.ndarray, artist_codes: np.ndarray, relevance: np.ndarray, k: int,
+               lambda_: float = 0.7, artist_weight: float = 0.5,
+               max_per_artist: Optional[int] = None,
+               transitions: Optional[np.ndarray] = None, transition_weight: float = 0.0,
+               start_transition: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Greedy maximal marginal relevance selection over a candidate pool.
+
+    `features` is an (n, d) matrix of standardized feature vectors, `artist_codes`
+    an (n,) integer array identifying each candidate's artist and `relevance` an
+    (n,) score array. Each step is a handful of vector operations over the whole
+    pool, so selection is O(n * k) in NumPy with no per-pair Python work.
+
+    Similarity between two candidates blends artist identity (weight
+    `artist_weight`) with an RBF kernel over their feature vectors. When
+    `transitions` is given, candidates are also penalised by their L1 distance
+    from the previously selected track (or `start_transition` for the first pick).
+
+    Returns the indices of the selected candidates in playlist order.
+    """
+    n = len(relevance)
+    k = min(k, n)
+    selected = np.empty(k, dtype=np.intp)
+    if k == 0:
+        return selected
+
+    gamma = 1.0 / max(features.shape[1], 1)
+    max_sim = np.zeros(n)
+    available = np.ones(n, dtype=bool)
+    artist_counts = np.zeros(int(artist_codes.max()) + 1, dtype=np.intp)
+    base_score = lambda_ * relevance
+    previous = start_transition
+
+    count = 0
+    while count < k:
+        score = base_score - (1.0 - lambda_) * max_sim
+        if transitions is not None and previous is not None and transition_weight:
+            score -= transition_weight * np.abs(transitions - previous).sum(axis=1)
+        score[~available] = -np.inf
+
+        i = int(np.argmax(score))
+        if not available[i]:
+            break
+        selected[count] = i
+        count += 1
+        available[i] = False
+
+        same_artist = artist_codes == artist_codes[i]
+        if max_per_artist is not None:
+            artist_counts[artist_codes[i]] += 1
+            if artist_counts[artist_codes[i]] >= max_per_artist:
+                available[same_artist] = False
+
+        feature_sim = np.exp(-gamma * np.square(features - features[i]).sum(axis=1))
+        np.maximum(max_sim, artist_weight * same_artist + (1.0 - artist_weight) * feature_sim, out=max_sim)
+        if transitions is not None:
+            previous = transitions[i]
+
+    return selected[:count]
+
+
+class MMRReranker(Reranker):
+    """
+    Diversity re-ranking of matcher output using maximal marginal relevance.
+
+    Relevance blends the matcher's own ordering with feature similarity to the
+    seed track; redundancy is measured over feature vectors and artist identity.
+    Optional per-artist caps and tempo/energy transition smoothing shape the
+    final playlist order. When a FeatureMatrix is given, tracks found in it
+    use its vectors instead of the (often unset) audio features on Track.
+    """
+
+    def __init__(self, lambda_: float = 0.7, artist_weight: float = 0.5,
+                 max_per_artist: Optional[int] = None, transition_weight: float = 0.0,
+                 feature_fields: Sequence[str] = FEATURE_FIELDS,
+                 transition_fields: Sequence[str] = TRANSITION_FIELDS,
+                 feature_matrix: Optional[FeatureMatrix] = None):
+        self.lambda_ = lambda_
+        self.artist_weight = artist_weight
+        self.max_per_artist = max_per_artist
+        self.transition_weight = transition_weight
+        self.feature_fields = tuple(feature_fields)
+        self.transition_fields = tuple(transition_fields)
+        self.feature_matrix = feature_matrix
+
+    def rerank(self, input_track: Track, candidates: List[Track], n: int) -> List[Track]:
+        if not candidates:
+            return []
+
+        fields = self.feature_fields + self.transition_fields
+        batch = TrackBatch.from_tracks([input_track] + candidates)
+        raw = batch.features[:, [FEATURE_FIELDS.index(field) for field in fields]].astype(float)
+        self._fill_from_matrix(raw, batch.id_list(), fields)
+
+        # Standardize over the pool so tempo (BPM) does not swamp the 0-1 features
+        std = raw.std(axis=0)
+        std[std == 0] = 1.0
+        scaled = (raw - raw.mean(axis=0)) / std
+        features = scaled[:, :len(self.feature_fields)]
+        transitions = scaled[:, len(self.feature_fields):]
+
+        artist_codes = batch.artist_codes[1:]
+
+        gamma = 1.0 / max(features.shape[1], 1)
+        seed_sim = np.exp(-gamma * np.square(features[1:] - features[0]).sum(axis=1))
+        rank_prior = 1.0 - np.arange(len(candidates)) / len(candidates)
+        relevance = 0.5 * rank_prior + 0.5 * seed_sim
+
+        indices = mmr_select(
+            features[1:], artist_codes, relevance, n,
+            lambda_=self.lambda_,
+            artist_weight=self.artist_weight,
+            max_per_artist=self.max_per_artist,
+            transitions=transitions[1:],
+            transition_weight=self.transition_weight,
+            start_transition=transitions[0]
+        )
+        return [candidates[i] for i in indices]
+
+    def _fill_from_matrix(self, raw: np.ndarray, track_ids: List[str], fields: Sequence[str]):
+        """Overwrite rows of `raw` with feature matrix vectors for tracks present in the matrix."""
+        if self.feature_matrix is None:
+            return
+        columns = self.feature_matrix.columns(fields)
+        if columns is None:
+            return
+        rows = self.feature_matrix.rows_for(track_ids)
+        found = rows >= 0
+        if found.any():
+            raw[found] = self.feature_matrix.vectors[rows[found]][:, columns]
@@ -0,0 +1,11 @@
+from abc import ABC, abstractmethod
+from typing import List
+from music_ml.models.track import Track
+
+class Reranker(ABC):
+    @abstractmethod
+    def rerank(self, input_track: Track, candidates: List[Track], n: int) -> List[Track]:
+        """
+        Abstract method to pick and order n tracks from the matcher's candidates.
+        """
+        pass
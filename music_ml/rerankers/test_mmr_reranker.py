@@ -0,0 +1,74 @@
+import time
+import numpy as np
+from music_ml.models.track import Track
+from music_ml.models.artist import Artist
+from music_ml.rerankers.mmr_reranker import MMRReranker, mmr_select
+from music_ml.stores.feature_matrix import FeatureMatrix, write_feature_matrix
+
+def make_track(track_id, artist_id, tempo=0.0, energy=0.0, valence=0.0, danceability=0.0):
+    return Track(
+        spotify_track_id=track_id,
+        track_name=f'Track {track_id}',
+        artist=Artist(name=f'Artist {artist_id}', spotify_artist_id=artist_id),
+        tempo=tempo, energy=energy, valence=valence, danceability=danceability
+    )
+
+SEED = make_track('seed', 'a', tempo=120, energy=0.5)
+
+def test_preserves_matcher_order_when_candidates_are_indistinguishable():
+    candidates = [make_track(f't{i}', 'a') for i in range(5)]
+    result = MMRReranker().rerank(SEED, candidates, n=3)
+    assert [track.spotify_track_id for track in result] == ['t0', 't1', 't2']
+
+def test_promotes_other_artists_over_repeats():
+    candidates = [make_track('a1', 'a'), make_track('a2', 'a'), make_track('a3', 'a'), make_track('b1', 'b')]
+    result = MMRReranker(lambda_=0.5).rerank(SEED, candidates, n=2)
+    assert [track.spotify_track_id for track in result] == ['a1', 'b1']
+
+def test_max_per_artist_caps_artist_repeats():
+    candidates = [make_track(f'a{i}', 'a') for i in range(5)] + [make_track('b1', 'b'), make_track('c1', 'c')]
+    result = MMRReranker(max_per_artist=2).rerank(SEED, candidates, n=5)
+
+    artists = [track.artist.spotify_artist_id for track in result]
+    assert artists.count('a') == 2
+    assert len(result) == 4  # Only four candidates remain under the cap
+
+def test_transition_smoothing_prefers_close_tempo_and_energy():
+    candidates = [
+        make_track('far', 'b', tempo=180, energy=0.95),
+        make_track('near', 'c', tempo=122, energy=0.55),
+    ]
+    result = MMRReranker(transition_weight=2.0).rerank(SEED, candidates, n=1)
+    assert result[0].spotify_track_id == 'near'
+
+def test_empty_candidates():
+    assert MMRReranker().rerank(SEED, [], n=5) == []
+
+def test_mmr_select_handles_large_pools_quickly():
+    rng = np.random.default_rng(0)
+    n = 5000
+    features = rng.standard_normal((n, 4))
+    artist_codes = rng.integers(0, 500, n)
+    relevance = rng.random(n)
+
+    start = time.perf_counter()
+    selected = mmr_select(features, artist_codes, relevance, 20, max_per_artist=1)
+    elapsed = time.perf_counter() - start
+
+    assert len(selected) == 20
+    assert len(set(artist_codes[selected])) == 20
+    assert elapsed < 0.5
+
+def test_feature_matrix_vectors_override_track_features(tmp_path):
+    fields = ('tempo', 'energy', 'valence', 'danceability')
+    path = write_feature_matrix(str(tmp_path), ['seed', 'far', 'near'], [
+        [120, 0.5, 0.5, 0.5],
+        [180, 0.95, 0.1, 0.9],
+        [122, 0.55, 0.5, 0.5],
+    ], fields)
+    # Track objects carry no audio features; only the matrix can tell the candidates apart
+    seed = make_track('seed', 'a')
+    candidates = [make_track('far', 'b'), make_track('near', 'c')]
+
+    result = MMRReranker(transition_weight=2.0, feature_matrix=FeatureMatrix(path)).rerank(seed, candidates, n=1)
+    assert result[0].spotify_track_id == 'near'
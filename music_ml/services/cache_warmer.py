@@ -0,0 +1,259 @@
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+import requests
+
+from music_ml.services.spotify_service import (
+    normalize_query,
+    search_cache_key,
+    search_spotify_tracks,
+)
+from music_ml.stores.tiered_cache import TieredCache, get_cache
+from music_ml.utils.heavy_hitters import SpaceSaving
+from music_ml.utils.metrics import start_request_counts, stop_request_counts
+
+logger = logging.getLogger(__name__)
+
+CACHE_WARMER_INTERVAL = float(os.getenv('CACHE_WARMER_INTERVAL', 300))  # seconds
+# Spotify API requests one warming round may spend
+CACHE_WARMER_BUDGET = int(os.getenv('CACHE_WARMER_BUDGET', 100))
+CACHE_WARMER_TOP_K = int(os.getenv('CACHE_WARMER_TOP_K', 50))
+# Requests (decayed) an item needs before it is worth warming
+CACHE_WARMER_MIN_COUNT = float(os.getenv('CACHE_WARMER_MIN_COUNT', 3))
+# File where workers share their request counts and elect the one that warms
+CACHE_WARMER_DB_PATH = os.getenv('CACHE_WARMER_DB_PATH', 'instance/cache_warmer.db')
+HEAVY_HITTERS_CAPACITY = 1000
+# Counts are scaled by this after every round, so popularity follows recent traffic
+DECAY_FACTOR = 0.5
+# The warming worker's lease, and how recently other workers' counts must have been published, in intervals
+LEASE_INTERVALS = 2
+
+Counts = List[Tuple[tuple, float]]
+
+
+class WarmerStore:
+    """
+    Shared SQLite file (WAL mode) through which worker processes pool their
+    heavy-hitter counts and elect a single warmer. Each worker publishes its
+    counts under its own ID; whichever worker holds the lease merges them and
+    warms for everyone. Connections are opened per process, after any fork.
+    """
+
+    def __init__(self, path: str = CACHE_WARMER_DB_PATH):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = None
+        self._pid = None
+        self._worker_id = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            # Autocommit, so the lease can be taken in an explicit BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS warmer_counts ('
+                'worker_id TEXT PRIMARY KEY, updated_at REAL NOT NULL, seeds TEXT NOT NULL, queries TEXT NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS warmer_lease ('
+                'id INTEGER PRIMARY KEY CHECK (id = 0), holder TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            self._conn, self._pid = conn, os.getpid()
+            # A new ID per process start, so a reused PID never inherits a dead worker's lease
+            self._worker_id = f'{os.getpid()}-{time.time_ns()}'
+        return self._conn
+
+    def publish(self, seeds: Counts, queries: Counts):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO warmer_counts (worker_id, updated_at, seeds, queries) VALUES (?, ?, ?, ?)',
+                (self._worker_id, time.time(), json.dumps(seeds, separators=(',', ':')),
+                 json.dumps(queries, separators=(',', ':')))
+            )
+
+    def acquire_lease(self, ttl: float) -> bool:
+        """Take or renew the warming lease for `ttl` seconds. False while another live worker holds it."""
+        with self._lock:
+            conn = self._connection()
+            now = time.time()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT holder, expires_at FROM warmer_lease').fetchone()
+                acquired = row is None or row[0] == self._worker_id or row[1] <= now
+                if acquired:
+                    conn.execute('INSERT OR REPLACE INTO warmer_lease (id, holder, expires_at) VALUES (0, ?, ?)',
+                                 (self._worker_id, now + ttl))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            return acquired
+
+    def collect(self, max_age: float) -> Tuple[List[Counts], List[Counts]]:
+        """Seed and query counts of workers that published in the last `max_age` seconds; older rows are deleted."""
+        with self._lock:
+            conn = self._connection()
+            cutoff = time.time() - max_age
+            conn.execute('DELETE FROM warmer_counts WHERE updated_at < ?', (cutoff,))
+            rows = conn.execute('SELECT seeds, queries FROM warmer_counts').fetchall()
+        return [json.loads(seeds) for seeds, _ in rows], [json.loads(queries) for _, queries in rows]
+
+
+def merge_counts(snapshots: Iterable[Counts], k: int) -> Counts:
+    """Sum published counts across workers and return the k highest as (item, count)."""
+    totals = {}
+    for snapshot in snapshots:
+        for item, count in snapshot:
+            # JSON turns the tuple items into lists
+            item = tuple(item)
+            totals[item] = totals.get(item, 0.0) + count
+    return heapq.nlargest(k, totals.items(), key=lambda entry: entry[1])
+
+
+class CacheWarmer:
+    """
+    Keeps popular playlists and searches in the shared cache.
+
+    Requests record their seed (track, matcher, max_per_artist) or first-page
+    search in bounded heavy-hitter sketches. Each round walks the hottest
+    items, most requested first, and loads any whose cache entry is missing
+    or would expire before the next round through the normal code path, so
+    the seed track, the matcher's upstream lookups and the finished playlist
+    are all cached. A round stops starting new items once it has made
+    `budget` Spotify requests; an item in progress is finished, so a round
+    may overshoot by one playlist's worth of calls.
+
+    With a `store`, every worker publishes its counts each round and only the
+    worker holding the store's lease warms, from the counts of all of them.
+    """
+
+    def __init__(self, cache: Optional[TieredCache] = None, capacity: int = HEAVY_HITTERS_CAPACITY,
+                 budget: int = CACHE_WARMER_BUDGET, top_k: int = CACHE_WARMER_TOP_K,
+                 min_count: float = CACHE_WARMER_MIN_COUNT, interval: float = CACHE_WARMER_INTERVAL,
+                 store: Optional[WarmerStore] = None):
+        self._cache = cache
+        self.seeds = SpaceSaving(capacity)
+        self.queries = SpaceSaving(capacity)
+        self.budget = budget
+        self.top_k = top_k
+        self.min_count = min_count
+        self.interval = interval
+        self.store = store
+
+    @property
+    def cache(self) -> TieredCache:
+        return self._cache or get_cache()
+
+    def record_seed(self, spotify_track_id: str, matcher_name: str, max_per_artist: Optional[int]):
+        self.seeds.add((spotify_track_id, matcher_name, max_per_artist))
+
+    def record_query(self, query: str, limit: int):
+        self.queries.add((normalize_query(query), limit))
+
+    def publish(self):
+        """Share this worker's counts through the store."""
+        self.store.publish([[list(item), count] for item, count, _ in self.seeds.top(self.seeds.capacity)],
+                           [[list(item), count] for item, count, _ in self.queries.top(self.queries.capacity)])
+
+    def _hottest(self) -> Optional[Tuple[Counts, Counts]]:
+        """The top seeds and queries as (item, count), or None when another worker does the warming."""
+        if self.store is None:
+            return ([(item, count) for item, count, _ in self.seeds.top(self.top_k)],
+                    [(item, count) for item, count, _ in self.queries.top(self.top_k)])
+        self.publish()
+        if not self.store.acquire_lease(LEASE_INTERVALS * self.interval):
+            return None
+        seeds, queries = self.store.collect(LEASE_INTERVALS * self.interval)
+        return merge_counts(seeds, self.top_k), merge_counts(queries, self.top_k)
+
+    def warm_once(self) -> dict:
+        """
+        Run one warming round. Returns whether this worker warmed, counts of
+        items warmed, already warm and failed, and calls spent.
+        """
+        # Imported here: the playlist API module imports this one to record seeds
+        from music_ml.api.generate_playlist import build_playlist, playlist_cache_key
+
+        hottest = self._hottest()
+        seeds, queries = hottest or ([], [])
+        candidates = [('playlist', item, count) for item, count in seeds]
+        candidates += [('search', item, count) for item, count in queries]
+        candidates.sort(key=lambda candidate: -candidate[2])
+
+        spent = 0
+        result = {'leader': hottest is not None, 'warmed': 0, 'already_warm': 0, 'failed': 0}
+        for kind, item, count in candidates:
+            if count < self.min_count or spent >= self.budget:
+                break
+            if kind == 'playlist':
+                namespace, key = 'playlist', playlist_cache_key(*item)
+                load = lambda: build_playlist(*item, refresh=True)
+            else:
+                namespace, key = 'search', search_cache_key(*item)
+                load = lambda: search_spotify_tracks(*item, refresh=True)
+            # Entries that would expire before the next round are reloaded now
+            expires_at = self.cache.expires_at(namespace, key)
+            if expires_at is not None and expires_at - time.time() > self.interval:
+                result['already_warm'] += 1
+                continue
+            # Counted per load rather than per thread: matchers make some of their requests on their own threads
+            counts = start_request_counts()
+            try:
+                load()
+                result['warmed'] += 1
+            except requests.exceptions.RequestException as e:
+                result['failed'] += 1
+                logger.info('Warming %s %s failed: %s', kind, item, e)
+            finally:
+                stop_request_counts()
+                spent += counts.get('upstream_requests', 0)
+
+        self.seeds.decay(DECAY_FACTOR)
+        self.queries.decay(DECAY_FACTOR)
+        result['upstream_calls'] = spent
+        return result
+
+
+_default_warmer = None
+_default_warmer_lock = threading.Lock()
+_warmer_thread = None
+
+
+def get_cache_warmer() -> CacheWarmer:
+    global _default_warmer
+    with _default_warmer_lock:
+        if _default_warmer is None:
+            _default_warmer = CacheWarmer(store=WarmerStore())
+    return _default_warmer
+
+
+def start_cache_warmer(interval: float = CACHE_WARMER_INTERVAL):
+    """Start the background thread that warms popular items. Safe to call more than once."""
+    global _warmer_thread
+    if _warmer_thread is not None and _warmer_thread.is_alive():
+        return _warmer_thread
+    warmer = get_cache_warmer()
+    warmer.interval = interval
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                result = warmer.warm_once()
+                logger.info('Cache warming round: %s', result)
+            except Exception:
+                logger.exception('Cache warming failed')
+
+    _warmer_thread = threading.Thread(target=run, name='cache-warmer', daemon=True)
+    _warmer_thread.start()
+    return _warmer_thread
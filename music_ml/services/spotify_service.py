@@ -1,16 +1,55 @@
-from flask import session
+from flask import has_request_context, session
 import requests
-from typing import List, Optional
+from typing import Callable, List, Optional
 from music_ml.models.track import Track
+from music_ml.models.artist import Artist
 from music_ml.models.playlist import Playlist
-from music_ml.utils.spotify_utils import get_spotify_access_token, load_spotify_tracks
+from music_ml.stores.http_cache import get_http_cache
+from music_ml.stores.tiered_cache import get_cache
+from music_ml.utils.metrics import count_retry, track_upstream
+from music_ml.utils.profiling import traced
+from music_ml.utils.spotify_utils import (
+    SPOTIFY_API_URL,
+    get_spotify_access_token,
+    load_spotify_artist,
+    load_spotify_tracks,
+    slim_spotify_tracks,
+)
 
 # Configure request timeouts
 TIMEOUT = 10  # seconds
 
+# Called before every request that reaches Spotify, to pace callers sharing a rate budget
+_upstream_throttle: Optional[Callable[[], None]] = None
+
+def set_upstream_throttle(throttle: Optional[Callable[[], None]]):
+    """Install (or with None, remove) the process-wide pacing hook for Spotify requests."""
+    global _upstream_throttle
+    _upstream_throttle = throttle
+
+def spotify_get(url: str, user_token: bool = False, **kwargs) -> requests.Response:
+    """
+    GET a Spotify API URL, through the on-disk response cache when one is
+    configured. Requests sent with a user's token bypass it: Spotify filters
+    their results by the user's market, so they must not be served to others.
+    """
+    def fetch():
+        if _upstream_throttle is not None:
+            _upstream_throttle()
+        return track_upstream(url, lambda: requests.get(url, **kwargs))
+
+    http_cache = get_http_cache()
+    if http_cache is None or user_token:
+        return fetch()
+    return http_cache.cached_get(url, fetch)
+
+def has_user_token() -> bool:
+    """Whether the current request's session holds a signed-in user's token."""
+    return has_request_context() and 'access_token' in session
+
 def get_auth_headers() -> dict:
     """Get headers with user token if available, otherwise use client credentials"""
-    if 'access_token' in session:
+    if has_user_token():
         return {"Authorization": f"Bearer {session['access_token']}"}
     else:
         access_token = get_spotify_access_token()
@@ -18,71 +57,137 @@ def get_auth_headers() -> dict:
 
 def refresh_token_if_needed(response: requests.Response) -> Optional[dict]:
     """Refresh token if expired and return new headers"""
-    if response.status_code == 401 and 'access_token' in session:
+    if response.status_code == 401 and has_request_context() and 'access_token' in session:
         # TODO: Implement token refresh logic
         # For now, we'll fall back to client credentials
-        access_token = get_spotify_access_token()
+        access_token = get_spotify_access_token(force_refresh=True)
         return {"Authorization": f"Bearer {access_token}"}
     return None
 
-def search_spotify_tracks(query, limit=20) -> List[Track]:
-    """Function to search tracks from Spotify API."""
-    url = f"https://api.spotify.com/v1/search?q={query}&type=track&limit={limit}"
-    
-    headers = get_auth_headers()
-    response = requests.get(url, headers=headers)
+def not_found_error(url: str) -> requests.HTTPError:
+    """The error raised for a cached 404, matching what raise_for_status() reports."""
+    return requests.HTTPError(f"404 Client Error: Not Found for url: {url}")
 
-    # Handle token refresh if needed
-    new_headers = refresh_token_if_needed(response)
-    if new_headers:
-        response = requests.get(url, headers=new_headers)
+def normalize_query(query: str) -> str:
+    """Spotify search is case- and whitespace-insensitive, so share cache entries across spellings."""
+    return ' '.join(query.lower().split())
 
-    if response.status_code == 200:
-        return load_spotify_tracks(response.json())
-    
-    response.raise_for_status()
+def search_cache_key(query: str, limit: int = 20, offset: int = 0) -> str:
+    return f"{normalize_query(query)}|{limit}|{offset}"
 
+@traced('search_spotify_tracks')
+def search_spotify_tracks(query, limit=20, offset=0, refresh=False) -> List[Track]:
+    """
+    Function to search tracks from Spotify API. `refresh` bypasses the cached
+    result. Searches made with a signed-in user's token are never cached:
+    Spotify filters them by the user's market, so they must not reach others.
+    """
+    url = f"{SPOTIFY_API_URL}/search?q={query}&type=track&limit={limit}&offset={offset}"
+    user_token = has_user_token()
+
+    def fetch():
+        headers = get_auth_headers()
+        response = spotify_get(url, user_token=user_token, headers=headers)
+
+        # Handle token refresh if needed
+        new_headers = refresh_token_if_needed(response)
+        if new_headers:
+            count_retry(url, 'token_refresh')
+            response = spotify_get(url, headers=new_headers)
+
+        if response.status_code == 200:
+            return slim_spotify_tracks(response.json()['tracks']['items'])
+
+        response.raise_for_status()
+
+    if user_token:
+        return load_spotify_tracks(fetch())
+    return load_spotify_tracks(get_cache().get_or_load('search', search_cache_key(query, limit, offset), fetch,
+                                                       refresh=refresh))
+
+@traced('get_artist_top_tracks')
 def get_artist_top_tracks(artist_id) -> List[Track]:
     """Get top tracks of an artist from Spotify API."""
-    url = f"https://api.spotify.com/v1/artists/{artist_id}/top-tracks?market=US"
+    url = f"{SPOTIFY_API_URL}/artists/{artist_id}/top-tracks?market=US"
+
+    def fetch():
+        access_token = get_spotify_access_token()
+        headers = {"Authorization": f"Bearer {access_token}"}
+        response = spotify_get(url, headers=headers)
+
+        # Refresh token if expired
+        if response.status_code == 401:
+            count_retry(url, 'token_refresh')
+            access_token = get_spotify_access_token(force_refresh=True)
+            headers = {"Authorization": f"Bearer {access_token}"}
+            response = spotify_get(url, headers=headers)
+
+        # Handle response
+        if response.status_code == 200:
+            return slim_spotify_tracks(response.json()['tracks'])
+        elif response.status_code in (400, 404):
+            # Unknown artist; remember it so repeated lookups stay local
+            return None
+        else:
+            response.raise_for_status()
+
+    data = get_cache().get_or_load('top_tracks', artist_id, fetch)
+    if data is None:
+        raise not_found_error(url)
+    return load_spotify_tracks(data)
+
+@traced('get_related_artists')
+def get_related_artists(artist_id) -> List[Artist]:
+    """Get artists related to an artist from Spotify API."""
+    url = f"{SPOTIFY_API_URL}/artists/{artist_id}/related-artists"
 
     access_token = get_spotify_access_token()
     headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(url, headers=headers)
+    response = spotify_get(url, headers=headers, timeout=TIMEOUT)
 
     # Refresh token if expired
     if response.status_code == 401:
-        access_token = get_spotify_access_token()
+        count_retry(url, 'token_refresh')
+        access_token = get_spotify_access_token(force_refresh=True)
         headers = {"Authorization": f"Bearer {access_token}"}
-        response = requests.get(url, headers=headers)
+        response = spotify_get(url, headers=headers, timeout=TIMEOUT)
 
     # Handle response
     if response.status_code == 200:
-        tracks = load_spotify_tracks({'tracks':{'items':response.json()['tracks']}})
-        return tracks
+        return [load_spotify_artist(artist) for artist in response.json()['artists']]
     else:
         response.raise_for_status()
 
+@traced('get_track_by_id')
 def get_track_by_id(spotify_track_id) -> Track:
     """Retrieve a single track from Spotify API by its ID."""
-    url = f"https://api.spotify.com/v1/tracks/{spotify_track_id}"
-
-    access_token = get_spotify_access_token()
-    headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(url, headers=headers)
+    url = f"{SPOTIFY_API_URL}/tracks/{spotify_track_id}"
 
-    # Refresh token if expired
-    if response.status_code == 401:
+    def fetch():
         access_token = get_spotify_access_token()
         headers = {"Authorization": f"Bearer {access_token}"}
-        response = requests.get(url, headers=headers)
+        response = spotify_get(url, headers=headers)
 
-    # Handle response
-    if response.status_code == 200:
-        track_data = {'tracks':{'items':[response.json()]}}
-        return load_spotify_tracks(track_data)[0]
-    else:
-        response.raise_for_status()
+        # Refresh token if expired
+        if response.status_code == 401:
+            count_retry(url, 'token_refresh')
+            access_token = get_spotify_access_token(force_refresh=True)
+            headers = {"Authorization": f"Bearer {access_token}"}
+            response = spotify_get(url, headers=headers)
+
+        # Handle response
+        if response.status_code == 200:
+            return slim_spotify_tracks([response.json()])
+        elif response.status_code in (400, 404):
+            # Unknown or malformed ID; remember it so repeated lookups stay local
+            return None
+        else:
+            response.raise_for_status()
+
+    track_data = get_cache().get_or_load('track', spotify_track_id, fetch)
+    if track_data is None:
+        raise not_found_error(url)
+    return load_spotify_tracks(track_data)[0]
 
 def create_spotify_playlist(name: str, tracks: List[Track], description: str = None) -> dict:
     """Create a new playlist in user's Spotify account and add tracks to it."""
@@ -96,46 +201,47 @@ def create_spotify_playlist(name: str, tracks: List[Track], description: str = N
     
     try:
         # Get user ID first
-        user_response = requests.get(
-            'https://api.spotify.com/v1/me',
+        me_url = f'{SPOTIFY_API_URL}/me'
+        user_response = track_upstream(me_url, lambda: requests.get(
+            me_url,
             headers=headers,
             timeout=TIMEOUT
-        )
+        ))
         user_response.raise_for_status()
         user_id = user_response.json()['id']
         
         # Create playlist
-        create_url = f'https://api.spotify.com/v1/users/{user_id}/playlists'
+        create_url = f'{SPOTIFY_API_URL}/users/{user_id}/playlists'
         playlist_data = {
             'name': name,
             'description': description or 'Created by Musaic',
             'public': True
         }
         
-        playlist_response = requests.post(
+        playlist_response = track_upstream(create_url, lambda: requests.post(
             create_url,
             json=playlist_data,
             headers=headers,
             timeout=TIMEOUT
-        )
+        ))
         playlist_response.raise_for_status()
         playlist_info = playlist_response.json()
         playlist_id = playlist_info['id']
         
         # Add tracks in batches of 50 (Spotify's limit)
-        tracks_url = f'https://api.spotify.com/v1/playlists/{playlist_id}/tracks'
+        tracks_url = f'{SPOTIFY_API_URL}/playlists/{playlist_id}/tracks'
         track_uris = [f"spotify:track:{track.spotify_track_id}" for track in tracks]
         
         # Split tracks into batches
         batch_size = 50
         for i in range(0, len(track_uris), batch_size):
             batch = track_uris[i:i + batch_size]
-            add_tracks_response = requests.post(
+            add_tracks_response = track_upstream(tracks_url, lambda: requests.post(
                 tracks_url,
                 json={'uris': batch},
                 headers=headers,
                 timeout=TIMEOUT
-            )
+            ))
             add_tracks_response.raise_for_status()
         
         # Create a Playlist object
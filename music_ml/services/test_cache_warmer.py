@@ -0,0 +1,147 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from music_ml.models.artist import Artist
+from music_ml.models.playlist import Playlist
+from music_ml.models.track import Track
+from music_ml.services.cache_warmer import CacheWarmer, WarmerStore
+from music_ml.stores.tiered_cache import TieredCache
+from music_ml.utils.metrics import track_upstream
+
+
+def make_playlist():
+    return Playlist(tracks=[Track(spotify_track_id='track1', track_name='Seed', artist=Artist('Artist', 'a1'))])
+
+
+def record(warmer, times, *seed):
+    for _ in range(times):
+        warmer.record_seed(*seed)
+
+
+@patch('music_ml.api.generate_playlist.build_playlist')
+def test_warms_hot_seeds_only(mock_build_playlist):
+    mock_build_playlist.return_value = make_playlist()
+    warmer = CacheWarmer(cache=TieredCache(), min_count=3)
+    record(warmer, 5, 'hot', 'artist', None)
+    record(warmer, 1, 'cold', 'artist', None)
+
+    result = warmer.warm_once()
+
+    mock_build_playlist.assert_called_once_with('hot', 'artist', None, refresh=True)
+    assert result['warmed'] == 1
+
+
+@patch('music_ml.api.generate_playlist.build_playlist')
+def test_skips_items_already_cached(mock_build_playlist):
+    cache = TieredCache()
+    cache.set('playlist', 'hot|artist|None', [])
+    warmer = CacheWarmer(cache=cache, min_count=1)
+    record(warmer, 3, 'hot', 'artist', None)
+
+    result = warmer.warm_once()
+
+    mock_build_playlist.assert_not_called()
+    assert result['already_warm'] == 1
+    # Checking for the entry does not count as a cache hit
+    assert cache.stats()['playlist']['l1_hits'] == 0
+
+
+@patch('music_ml.api.generate_playlist.build_playlist')
+def test_refreshes_items_expiring_before_the_next_round(mock_build_playlist):
+    cache = TieredCache()
+    cache.set('playlist', 'stale|artist|None', [], ttl=60)
+    cache.set('playlist', 'fresh|artist|None', [], ttl=600)
+    warmer = CacheWarmer(cache=cache, min_count=1, interval=300)
+    record(warmer, 3, 'stale', 'artist', None)
+    record(warmer, 3, 'fresh', 'artist', None)
+
+    result = warmer.warm_once()
+
+    mock_build_playlist.assert_called_once_with('stale', 'artist', None, refresh=True)
+    assert (result['warmed'], result['already_warm']) == (1, 1)
+
+
+def spend(calls):
+    """A build_playlist stand-in that makes `calls` Spotify requests, one of them on another thread."""
+    def build(*seed, refresh=False):
+        send = lambda: MagicMock(status_code=200)
+        for _ in range(calls - 1):
+            track_upstream('https://api.spotify.com/v1/artists/a1/top-tracks', send)
+        # Like RelatedArtistMatcher's fetches, run in a copy of the caller's context
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(copy_context().run, track_upstream,
+                            'https://api.spotify.com/v1/artists/a1/related-artists', send).result()
+        return make_playlist()
+    return build
+
+
+@patch('music_ml.api.generate_playlist.build_playlist')
+def test_stops_when_budget_is_spent(mock_build_playlist):
+    mock_build_playlist.side_effect = spend(3)
+    warmer = CacheWarmer(cache=TieredCache(), budget=5, min_count=1)
+    record(warmer, 9, 'first', 'artist', None)
+    record(warmer, 6, 'second', 'artist', None)
+    record(warmer, 3, 'third', 'artist', None)
+
+    result = warmer.warm_once()
+
+    # Each playlist costs 3 calls, so the second one exhausts the budget of 5
+    assert [call.args[0] for call in mock_build_playlist.call_args_list] == ['first', 'second']
+    assert result['upstream_calls'] == 6
+
+
+@patch('music_ml.services.cache_warmer.search_spotify_tracks')
+def test_warms_hot_queries(mock_search_spotify_tracks):
+    warmer = CacheWarmer(cache=TieredCache(), min_count=2)
+    warmer.record_query('Daft Punk', 20)
+    warmer.record_query('daft  punk ', 20)
+
+    warmer.warm_once()
+
+    mock_search_spotify_tracks.assert_called_once_with('daft punk', 20, refresh=True)
+
+
+@patch('music_ml.api.generate_playlist.build_playlist')
+def test_failures_are_counted_and_counts_decay(mock_build_playlist):
+    mock_build_playlist.side_effect = requests.exceptions.HTTPError('404')
+    warmer = CacheWarmer(cache=TieredCache(), min_count=3)
+    record(warmer, 4, 'missing', 'artist', None)
+
+    assert warmer.warm_once()['failed'] == 1
+    # Decayed to 2, below the threshold for the next round
+    assert warmer.warm_once()['failed'] == 0
+
+
+@patch('music_ml.api.generate_playlist.build_playlist')
+def test_one_worker_warms_from_the_counts_of_all(mock_build_playlist, tmp_path):
+    mock_build_playlist.return_value = make_playlist()
+    path = str(tmp_path / 'warmer.db')
+    first = CacheWarmer(cache=TieredCache(), min_count=3, store=WarmerStore(path))
+    second = CacheWarmer(cache=TieredCache(), min_count=3, store=WarmerStore(path))
+    # Below the threshold in each worker, above it together
+    record(first, 2, 'hot', 'artist', None)
+    record(second, 2, 'hot', 'artist', None)
+    second.publish()
+
+    first_result = first.warm_once()
+    second_result = second.warm_once()
+
+    mock_build_playlist.assert_called_once_with('hot', 'artist', None, refresh=True)
+    assert (first_result['leader'], first_result['warmed']) == (True, 1)
+    assert (second_result['leader'], second_result['warmed']) == (False, 0)
+
+
+def test_lease_passes_on_once_the_holder_stops_renewing(tmp_path):
+    path = str(tmp_path / 'warmer.db')
+    holder, other = WarmerStore(path), WarmerStore(path)
+
+    assert holder.acquire_lease(0.05)
+    assert not other.acquire_lease(0.05)
+    assert holder.acquire_lease(0.05)
+    time.sleep(0.1)
+    assert other.acquire_lease(0.05)
+    assert not holder.acquire_lease(0.05)
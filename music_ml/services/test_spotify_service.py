@@ -1,16 +1,21 @@
 import pytest
+import requests
 from unittest.mock import patch, MagicMock
 from flask import Flask, session
 from music_ml.services.spotify_service import (
     get_auth_headers,
     refresh_token_if_needed,
     search_spotify_tracks,
+    get_related_artists,
     get_track_by_id,
-    create_spotify_playlist
+    create_spotify_playlist,
+    set_upstream_throttle,
+    spotify_get
 )
 from music_ml.models.track import Track
 from music_ml.models.artist import Artist
 from music_ml.models.playlist import Playlist
+from music_ml.stores.http_cache import HTTPResponseCache
 
 @pytest.fixture
 def app():
@@ -92,6 +97,28 @@ def test_search_spotify_tracks_success(mock_get_headers, mock_get, app):
         assert tracks[0].artist.spotify_artist_id == 'artist_id'
         assert tracks[0].album_image_url == 'medium.jpg'  # Verify album image URL
 
+@patch('music_ml.services.spotify_service.requests.get')
+@patch('music_ml.services.spotify_service.get_spotify_access_token')
+def test_get_related_artists_success(mock_get_token, mock_get):
+    """Test related artists are loaded as Artist objects"""
+    mock_get_token.return_value = 'test_token'
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {
+        'artists': [
+            {'id': 'related1', 'name': 'Related One'},
+            {'id': 'related2', 'name': 'Related Two'}
+        ]
+    }
+    mock_get.return_value = mock_response
+
+    artists = get_related_artists('artist_id')
+    assert artists == [
+        Artist(name='Related One', spotify_artist_id='related1'),
+        Artist(name='Related Two', spotify_artist_id='related2')
+    ]
+    assert mock_get.call_args[0][0].endswith('/artists/artist_id/related-artists')
+
 @patch('music_ml.services.spotify_service.requests.post')
 @patch('music_ml.services.spotify_service.requests.get')
 def test_create_spotify_playlist_success(mock_get, mock_post, app):
@@ -132,4 +159,108 @@ def test_create_spotify_playlist_not_authenticated(app):
     with app.test_request_context():
         with pytest.raises(Exception) as exc_info:
             create_spotify_playlist('Test Playlist', [])
-        assert 'User not authenticated' in str(exc_info.value)
\ No newline at end of file
+        assert 'User not authenticated' in str(exc_info.value)
+
+@patch('music_ml.services.spotify_service.requests.get')
+@patch('music_ml.services.spotify_service.get_auth_headers')
+def test_search_spotify_tracks_is_cached(mock_get_headers, mock_get, app):
+    """Test repeated searches (in any spelling) are answered from the cache"""
+    mock_get_headers.return_value = {'Authorization': 'Bearer test_token'}
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {'tracks': {'items': [{
+        'id': 'test_id', 'name': 'Test Track',
+        'artists': [{'id': 'artist_id', 'name': 'Test Artist'}],
+        'album': {'images': []}
+    }]}}
+    mock_get.return_value = mock_response
+
+    with app.test_request_context():
+        search_spotify_tracks('Test Query')
+        tracks = search_spotify_tracks(' test  query ')
+
+    assert tracks[0].spotify_track_id == 'test_id'
+    mock_get.assert_called_once()
+
+@patch('music_ml.services.spotify_service.requests.get')
+@patch('music_ml.services.spotify_service.get_spotify_access_token')
+def test_signed_in_search_is_not_shared_through_the_cache(mock_get_token, mock_get, app):
+    """Test a search made with a user's token is not served to a later anonymous search"""
+    mock_get_token.return_value = 'client_token'
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {'tracks': {'items': []}}
+    mock_get.return_value = mock_response
+
+    with app.test_request_context():
+        session['access_token'] = 'user_token'
+        search_spotify_tracks('test query')
+    with app.test_request_context():
+        search_spotify_tracks('test query')
+
+    assert [call.kwargs['headers']['Authorization'] for call in mock_get.call_args_list] == \
+        ['Bearer user_token', 'Bearer client_token']
+
+@patch('music_ml.services.spotify_service.requests.get')
+@patch('music_ml.services.spotify_service.get_spotify_access_token')
+def test_get_track_by_id_caches_not_found(mock_get_token, mock_get):
+    """Test unknown track IDs are remembered and raise without another request"""
+    mock_get_token.return_value = 'test_token'
+    mock_response = MagicMock()
+    mock_response.status_code = 404
+    mock_get.return_value = mock_response
+
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            get_track_by_id('missing')
+
+    mock_get.assert_called_once()
+
+@patch('music_ml.services.spotify_service.requests.get')
+@patch('music_ml.services.spotify_service.get_spotify_access_token')
+def test_get_related_artists_uses_http_cache(mock_get_token, mock_get, tmp_path):
+    """Test catalog GETs are served from the on-disk response cache when configured"""
+    mock_get_token.return_value = 'test_token'
+    mock_response = requests.Response()
+    mock_response.status_code = 200
+    mock_response._content = b'{"artists": [{"id": "a2", "name": "Related"}]}'
+    mock_get.return_value = mock_response
+
+    http_cache = HTTPResponseCache(str(tmp_path / 'http_cache.db'))
+    with patch('music_ml.services.spotify_service.get_http_cache', return_value=http_cache):
+        get_related_artists('a1')
+        artists = get_related_artists('a1')
+
+    assert artists[0].spotify_artist_id == 'a2'
+    mock_get.assert_called_once()
+
+@patch('music_ml.services.spotify_service.requests.get')
+def test_search_with_user_token_bypasses_http_cache(mock_get, app, tmp_path):
+    """Test searches made with a user's token are neither served from nor stored in the shared response cache"""
+    mock_response = requests.Response()
+    mock_response.status_code = 200
+    mock_response._content = b'{"tracks": {"items": []}}'
+    mock_get.return_value = mock_response
+
+    http_cache = HTTPResponseCache(str(tmp_path / 'http_cache.db'))
+    with patch('music_ml.services.spotify_service.get_http_cache', return_value=http_cache):
+        with app.test_request_context():
+            session['access_token'] = 'user_token'
+            search_spotify_tracks('daft punk')
+
+    assert http_cache.get('GET', mock_get.call_args.args[0]) is None
+
+@patch('music_ml.services.spotify_service.requests.get')
+def test_spotify_get_calls_upstream_throttle(mock_get):
+    """Test every request that reaches Spotify waits on the installed throttle first"""
+    throttle = MagicMock()
+    set_upstream_throttle(throttle)
+    try:
+        with patch('music_ml.services.spotify_service.get_http_cache', return_value=None):
+            spotify_get('https://api.spotify.com/v1/tracks/t1')
+            spotify_get('https://api.spotify.com/v1/tracks/t2')
+    finally:
+        set_upstream_throttle(None)
+
+    assert throttle.call_count == 2
+    assert mock_get.call_count == 2
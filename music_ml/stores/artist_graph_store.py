@@ -0,0 +1,93 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from music_ml.models.artist import Artist
+
+# Related-artist lists change slowly, so adjacency rows are kept for a week
+DEFAULT_TTL = 7 * 24 * 60 * 60  # seconds
+ARTIST_GRAPH_DB_PATH = os.getenv('ARTIST_GRAPH_DB_PATH', 'instance/artist_graph.db')
+
+
+class ArtistGraphStore:
+    """
+    Persistent cache of related-artist adjacency lists.
+
+    Rows live in a SQLite file (WAL mode, so every gunicorn worker can read it
+    concurrently) and are fronted by an in-process dict so hot neighbourhoods
+    are served without touching disk or the network.
+    """
+
+    def __init__(self, path: str = ARTIST_GRAPH_DB_PATH, ttl: int = DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._memory: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS related_artists ('
+            'artist_id TEXT PRIMARY KEY, neighbors TEXT NOT NULL, fetched_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+
+    def get_many(self, artist_ids: Iterable[str]) -> Dict[str, List[Artist]]:
+        """Return cached, unexpired neighbour lists for the given artist IDs."""
+        now = time.time()
+        found = {}
+        misses = []
+        for artist_id in artist_ids:
+            entry = self._memory.get(artist_id)
+            if entry and now - entry[1] < self.ttl:
+                found[artist_id] = entry[0]
+            else:
+                misses.append(artist_id)
+
+        if misses:
+            placeholders = ','.join('?' * len(misses))
+            with self._lock:
+                rows = self._conn.execute(
+                    f'SELECT artist_id, neighbors, fetched_at FROM related_artists '
+                    f'WHERE artist_id IN ({placeholders})',
+                    misses
+                ).fetchall()
+            for artist_id, neighbors, fetched_at in rows:
+                if now - fetched_at >= self.ttl:
+                    continue
+                artists = [Artist(name=name, spotify_artist_id=neighbor_id)
+                           for neighbor_id, name in json.loads(neighbors)]
+                self._memory[artist_id] = (artists, fetched_at)
+                found[artist_id] = artists
+        return found
+
+    def get(self, artist_id: str) -> Optional[List[Artist]]:
+        return self.get_many([artist_id]).get(artist_id)
+
+    def put(self, artist_id: str, neighbors: List[Artist]):
+        """Store the neighbour list for an artist, replacing any previous entry."""
+        fetched_at = time.time()
+        encoded = json.dumps([[artist.spotify_artist_id, artist.name] for artist in neighbors])
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO related_artists (artist_id, neighbors, fetched_at) '
+                'VALUES (?, ?, ?)',
+                (artist_id, encoded, fetched_at)
+            )
+            self._conn.commit()
+        self._memory[artist_id] = (list(neighbors), fetched_at)
+
+
+_default_store = None
+
+
+def get_artist_graph_store() -> ArtistGraphStore:
+    """Return the process-wide graph store, opening it on first use."""
+    global _default_store
+    if _default_store is None:
+        _default_store = ArtistGraphStore()
+    return _default_store
@@ -0,0 +1,190 @@
+import csv
+import io
+import os
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from sqlalchemy import Column, Float, MetaData, String, Table, Text, create_engine, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from music_ml.models.artist import Artist, intern_artist
+from music_ml.models.track import Track
+
+# Repository-level instance folder, where get_database_url puts the development SQLite database
+INSTANCE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'instance')
+
+AUDIO_FEATURE_FIELDS = ('tempo', 'energy', 'valence', 'danceability')
+
+metadata = MetaData()
+
+catalog_artists = Table(
+    'catalog_artists', metadata,
+    Column('spotify_artist_id', String(64), primary_key=True),
+    Column('name', Text, nullable=False),
+)
+
+catalog_tracks = Table(
+    'catalog_tracks', metadata,
+    Column('spotify_track_id', String(64), primary_key=True),
+    Column('track_name', Text, nullable=False),
+    Column('spotify_artist_id', String(64), nullable=False, index=True),
+    Column('album_image_url', Text),
+    Column('genre', Text),
+)
+
+catalog_audio_features = Table(
+    'catalog_audio_features', metadata,
+    Column('spotify_track_id', String(64), primary_key=True),
+    *(Column(field, Float) for field in AUDIO_FEATURE_FIELDS),
+)
+
+
+def get_database_url() -> str:
+    """
+    Database URL for the app and the CLI tools: an absolute SQLite path under
+    INSTANCE_PATH in development (so it does not depend on the working
+    directory), otherwise DATABASE_URL with Heroku's postgres:// scheme fixed.
+    """
+    if os.getenv('FLASK_ENV') == 'development':
+        return f"sqlite:///{os.path.join(INSTANCE_PATH, 'dev.db')}"
+    return os.getenv('DATABASE_URL', '').replace('postgres://', 'postgresql://')
+
+
+class CatalogStore:
+    """
+    Local catalog of tracks, artists and audio features.
+
+    Writes are batched upserts keyed on Spotify ID. On PostgreSQL each batch
+    is streamed into a temporary table with COPY and merged with a single
+    INSERT ... ON CONFLICT; SQLite (development and tests) uses a multi-row upsert.
+    """
+
+    def __init__(self, database_url: str = None):
+        self.engine = create_engine(database_url or get_database_url())
+        metadata.create_all(self.engine)
+
+    @property
+    def uses_copy(self) -> bool:
+        return self.engine.dialect.name == 'postgresql'
+
+    def upsert_tracks(self, tracks: Iterable[Track]):
+        """Upsert tracks together with their artists."""
+        tracks = list(tracks)
+        self.upsert_artists(track.artist for track in tracks)
+        self._upsert(catalog_tracks, 'spotify_track_id', [
+            {
+                'spotify_track_id': track.spotify_track_id,
+                'track_name': track.track_name,
+                'spotify_artist_id': track.artist.spotify_artist_id,
+                'album_image_url': track.album_image_url,
+                'genre': track.genre,
+            }
+            for track in tracks
+        ])
+
+    def upsert_artists(self, artists: Iterable[Artist]):
+        self._upsert(catalog_artists, 'spotify_artist_id', [
+            {'spotify_artist_id': artist.spotify_artist_id, 'name': artist.name} for artist in artists
+        ])
+
+    def upsert_audio_features(self, rows: Iterable[dict]):
+        self._upsert(catalog_audio_features, 'spotify_track_id', list(rows))
+
+    def get_tracks(self, spotify_track_ids: List[str]) -> List[Track]:
+        """Load tracks by ID (with audio features where known), in the order requested."""
+        query = (
+            select(catalog_tracks, catalog_artists.c.name.label('artist_name'),
+                   *(catalog_audio_features.c[field] for field in AUDIO_FEATURE_FIELDS))
+            .join(catalog_artists, catalog_artists.c.spotify_artist_id == catalog_tracks.c.spotify_artist_id)
+            .outerjoin(catalog_audio_features,
+                       catalog_audio_features.c.spotify_track_id == catalog_tracks.c.spotify_track_id)
+            .where(catalog_tracks.c.spotify_track_id.in_(spotify_track_ids))
+        )
+        with self.engine.connect() as conn:
+            rows = {row.spotify_track_id: row for row in conn.execute(query)}
+
+        tracks = []
+        for track_id in spotify_track_ids:
+            row = rows.get(track_id)
+            if row is None:
+                continue
+            tracks.append(Track(
+                spotify_track_id=row.spotify_track_id,
+                track_name=row.track_name,
+                artist=intern_artist(row.spotify_artist_id, row.artist_name),
+                album_image_url=row.album_image_url,
+                genre=row.genre,
+                **{field: getattr(row, field) or 0.0 for field in AUDIO_FEATURE_FIELDS}
+            ))
+        return tracks
+
+    def iter_audio_features(self, batch_size: int = 10000) -> Iterator[List[Tuple]]:
+        """Stream (spotify_track_id, *features) rows in batches, without loading the table."""
+        query = select(catalog_audio_features).order_by(catalog_audio_features.c.spotify_track_id)
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+            for partition in result.partitions():
+                yield [tuple(row) for row in partition]
+
+    def iter_track_names(self, batch_size: int = 10000) -> Iterator[List[Tuple[str, str, str, str, str]]]:
+        """
+        Stream (spotify_track_id, track_name, spotify_artist_id, artist_name,
+        album_image_url) rows in batches.
+        """
+        query = (
+            select(catalog_tracks.c.spotify_track_id, catalog_tracks.c.track_name,
+                   catalog_artists.c.spotify_artist_id, catalog_artists.c.name, catalog_tracks.c.album_image_url)
+            .join(catalog_artists, catalog_artists.c.spotify_artist_id == catalog_tracks.c.spotify_artist_id)
+        )
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+            for partition in result.partitions():
+                yield [tuple(row) for row in partition]
+
+    def count(self, table: Table) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(table)).scalar()
+
+    def _upsert(self, table: Table, key: str, rows: List[dict]):
+        # A single statement may not touch the same row twice, so keep the last version of each key
+        deduped: Dict[str, dict] = {row[key]: row for row in rows}
+        if not deduped:
+            return
+        if self.uses_copy:
+            self._copy_upsert(table, key, list(deduped.values()))
+            return
+
+        statement = sqlite_insert(table)
+        columns = [column.name for column in table.columns if column.name != key]
+        statement = statement.on_conflict_do_update(
+            index_elements=[key],
+            set_={column: statement.excluded[column] for column in columns}
+        )
+        with self.engine.begin() as conn:
+            conn.execute(statement, list(deduped.values()))
+
+    def _copy_upsert(self, table: Table, key: str, rows: List[dict]):
+        columns = [column.name for column in table.columns]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(['\\N' if row.get(column) is None else row[column] for column in columns])
+        buffer.seek(0)
+
+        column_list = ', '.join(columns)
+        updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in columns if column != key)
+        raw = self.engine.raw_connection()
+        try:
+            with raw.cursor() as cursor:
+                cursor.execute(
+                    f'CREATE TEMP TABLE staging_{table.name} (LIKE {table.name} INCLUDING DEFAULTS) ON COMMIT DROP'
+                )
+                cursor.copy_expert(
+                    f"COPY staging_{table.name} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer
+                )
+                cursor.execute(
+                    f'INSERT INTO {table.name} ({column_list}) SELECT {column_list} FROM staging_{table.name} '
+                    f'ON CONFLICT ({key}) DO UPDATE SET {updates}'
+                )
+            raw.commit()
+        finally:
+            raw.close()
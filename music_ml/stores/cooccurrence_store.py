@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from music_ml.models.artist import intern_artist
+from music_ml.models.track import Track
+
+logger = logging.getLogger(__name__)
+
+COOCCURRENCE_DB_PATH = os.getenv('COOCCURRENCE_DB_PATH', 'instance/cooccurrence.db')
+
+# Exported playlists are ones a user chose to keep, so they count for more
+SOURCE_WEIGHTS = {
+    'generated': 1.0,
+    'exported': 3.0,
+}
+
+_EMPTY_ROW = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32))
+
+
+class CooccurrenceStore:
+    """
+    Sparse track co-occurrence counts learned from logged playlists.
+
+    Playlists are appended to a shared SQLite log so every worker (and every
+    restart) sees the same history. Each process folds new log rows into an
+    in-memory dict of arrays: one row per track holding its neighbours' row
+    numbers and weights, kept sorted by weight so a top-k lookup is a slice.
+    Rows are replaced wholesale on update, so readers never see a partial row.
+    """
+
+    def __init__(self, path: str = COOCCURRENCE_DB_PATH):
+        self.path = path
+        self._index: Dict[str, int] = {}
+        self._tracks: List[Track] = []
+        self._rows: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._last_log_id = 0
+        self._lock = threading.Lock()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS playlist_log ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT NOT NULL, weight REAL NOT NULL, '
+            'tracks TEXT NOT NULL, created_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+
+    def log_playlists(self, playlists: List[Tuple[List[Track], str]]):
+        """Append a batch of (tracks, source) playlists to the shared log."""
+        now = time.time()
+        rows = [
+            (source, SOURCE_WEIGHTS.get(source, 1.0), json.dumps([_encode_track(track) for track in tracks]), now)
+            for tracks, source in playlists
+        ]
+        with self._lock:
+            self._conn.executemany(
+                'INSERT INTO playlist_log (source, weight, tracks, created_at) VALUES (?, ?, ?, ?)', rows
+            )
+            self._conn.commit()
+
+    def sync(self, batch_size: int = 1000) -> int:
+        """Fold log rows written since the last sync into the in-memory rows. Returns rows applied."""
+        applied = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    'SELECT id, weight, tracks FROM playlist_log WHERE id > ? ORDER BY id LIMIT ?',
+                    (self._last_log_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return applied
+            self.apply([([_decode_track(item) for item in json.loads(tracks)], weight)
+                        for _, weight, tracks in rows])
+            self._last_log_id = rows[-1][0]
+            applied += len(rows)
+
+    def iter_log(self, batch_size: int = 1000) -> Iterator[Tuple[int, str, List[Track]]]:
+        """Yield every logged playlist as (log id, source, tracks), oldest first."""
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    'SELECT id, source, tracks FROM playlist_log WHERE id > ? ORDER BY id LIMIT ?',
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for log_id, source, tracks in rows:
+                yield log_id, source, [_decode_track(item) for item in json.loads(tracks)]
+            last_id = rows[-1][0]
+
+    def apply(self, playlists: List[Tuple[List[Track], float]]):
+        """Add pairwise co-occurrence weights for a batch of (tracks, weight) playlists."""
+        deltas: Dict[int, Dict[int, float]] = defaultdict(lambda: defaultdict(float))
+        for tracks, weight in playlists:
+            rows = list(dict.fromkeys(self._intern(track) for track in tracks))
+            for row in rows:
+                row_deltas = deltas[row]
+                for other in rows:
+                    if other != row:
+                        row_deltas[other] += weight
+
+        for row, row_deltas in deltas.items():
+            old_neighbors, old_weights = self._rows.get(row, _EMPTY_ROW)
+            neighbors = np.concatenate([old_neighbors, np.fromiter(row_deltas.keys(), np.int32, len(row_deltas))])
+            weights = np.concatenate([old_weights, np.fromiter(row_deltas.values(), np.float32, len(row_deltas))])
+            unique, inverse = np.unique(neighbors, return_inverse=True)
+            summed = np.bincount(inverse, weights=weights).astype(np.float32)
+            order = np.argsort(-summed, kind='stable')
+            self._rows[row] = (unique[order].astype(np.int32), summed[order])
+
+    def top_k(self, track_id: str, k: int) -> List[Tuple[Track, float]]:
+        """Return up to k (track, weight) pairs that co-occur most with the given track."""
+        row = self._index.get(track_id)
+        if row is None:
+            return []
+        neighbors, weights = self._rows.get(row, _EMPTY_ROW)
+        return [(self._tracks[neighbor], float(weight)) for neighbor, weight in zip(neighbors[:k], weights[:k])]
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _intern(self, track: Track) -> int:
+        row = self._index.get(track.spotify_track_id)
+        if row is None:
+            row = len(self._tracks)
+            self._tracks.append(track)
+            self._index[track.spotify_track_id] = row
+        return row
+
+
+def _encode_track(track: Track) -> list:
+    return [track.spotify_track_id, track.track_name, track.artist.spotify_artist_id,
+            track.artist.name, track.album_image_url]
+
+
+def _decode_track(item: list) -> Track:
+    track_id, track_name, artist_id, artist_name, album_image_url = item
+    return Track(
+        spotify_track_id=track_id,
+        track_name=track_name,
+        artist=intern_artist(artist_id, artist_name),
+        album_image_url=album_image_url
+    )
+
+
+# Playlists are queued on the request path and written by a background thread
+_pending: queue.Queue = queue.Queue(maxsize=10000)
+_default_store = None
+_updater = None
+
+
+def record_playlist(tracks: List[Track], source: str = 'generated'):
+    """Queue a playlist for the co-occurrence log without blocking the request."""
+    if len(tracks) < 2:
+        return
+    try:
+        _pending.put_nowait((list(tracks), source))
+    except queue.Full:
+        logger.warning("Co-occurrence queue full, dropping %s playlist", source)
+
+
+def get_cooccurrence_store() -> CooccurrenceStore:
+    """Return the process-wide co-occurrence store, opening it on first use."""
+    global _default_store
+    if _default_store is None:
+        _default_store = CooccurrenceStore()
+    return _default_store
+
+
+def flush_pending(store: CooccurrenceStore, max_batch: int = 500) -> int:
+    """Write queued playlists to the log in one batch and fold in new log rows."""
+    batch = []
+    while len(batch) < max_batch:
+        try:
+            batch.append(_pending.get_nowait())
+        except queue.Empty:
+            break
+    if batch:
+        store.log_playlists(batch)
+    store.sync()
+    return len(batch)
+
+
+def start_cooccurrence_updater(store: Optional[CooccurrenceStore] = None, interval: float = 5.0):
+    """Start the background thread that batches playlist updates. Safe to call more than once."""
+    global _updater
+    if _updater is not None and _updater.is_alive():
+        return _updater
+    if store is None:
+        store = get_cooccurrence_store()
+
+    def run():
+        while True:
+            try:
+                flush_pending(store)
+            except Exception:
+                logger.exception("Co-occurrence update failed")
+            time.sleep(interval)
+
+    _updater = threading.Thread(target=run, name='cooccurrence-updater', daemon=True)
+    _updater.start()
+    return _updater
@@ -0,0 +1,174 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FEATURE_MATRIX_PATH = os.getenv('FEATURE_MATRIX_PATH', 'instance/feature_matrix')
+CURRENT_LINK = 'current'
+FORMAT_VERSION = 1
+
+# On-disk layout, one directory per build under FEATURE_MATRIX_PATH:
+#
+#     v<build>/meta.json        {"format": 1, "count": n, "dim": d, "id_width": w, "fields": [...]}
+#     v<build>/vectors.f32      float32 (n, d), row-major
+#     v<build>/track_ids.bin    fixed-width ASCII IDs (n,), row order
+#     v<build>/sorted_ids.bin   the same IDs sorted, for binary search
+#     v<build>/sorted_rows.i32  int32 (n,), row number of each sorted ID
+#     current -> v<build>       symlink swapped atomically by the writer
+#
+# Every array is opened with numpy.memmap, so the matrix lives in the page cache
+# and is shared by all processes that map it instead of being copied per worker.
+
+
+class FeatureMatrix:
+    """Read-only, memory-mapped view of one feature matrix build."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['format'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported feature matrix format {meta['format']} in {path}")
+        self.fields = tuple(meta['fields'])
+        count, dim, id_dtype = meta['count'], meta['dim'], f"S{meta['id_width']}"
+        self.vectors = _open_array(path, 'vectors.f32', np.float32, (count, dim))
+        self.track_ids = _open_array(path, 'track_ids.bin', id_dtype, (count,))
+        self._sorted_ids = _open_array(path, 'sorted_ids.bin', id_dtype, (count,))
+        self._sorted_rows = _open_array(path, 'sorted_rows.i32', np.int32, (count,))
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    def rows_for(self, track_ids: Sequence[str]) -> np.ndarray:
+        """Return the row of each track ID, or -1 for IDs not in the matrix."""
+        rows = np.full(len(track_ids), -1, dtype=np.int64)
+        if not len(self) or not len(track_ids):
+            return rows
+        keys = np.array([track_id.encode() for track_id in track_ids])
+        # Keys longer than the stored width can never match, and must not be truncated into a false hit
+        fits = np.char.str_len(keys) <= self._sorted_ids.dtype.itemsize
+        keys = keys.astype(self._sorted_ids.dtype)
+        positions = np.minimum(np.searchsorted(self._sorted_ids, keys), len(self) - 1)
+        found = fits & (self._sorted_ids[positions] == keys)
+        rows[found] = self._sorted_rows[positions[found]]
+        return rows
+
+    def get(self, track_id: str) -> Optional[np.ndarray]:
+        row = self.rows_for([track_id])[0]
+        return None if row < 0 else self.vectors[row]
+
+    def columns(self, fields: Sequence[str]) -> Optional[list]:
+        """Return the column index of each field, or None if any is missing."""
+        if not set(fields) <= set(self.fields):
+            return None
+        return [self.fields.index(field) for field in fields]
+
+
+def _open_array(path: str, name: str, dtype, shape) -> np.ndarray:
+    if shape[0] == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(os.path.join(path, name), dtype=dtype, mode='r', shape=shape)
+
+
+def write_feature_matrix(root: str, track_ids: Sequence[str], vectors: np.ndarray,
+                         fields: Sequence[str], keep: int = 3) -> str:
+    """
+    Write a new feature matrix build under `root` and atomically make it current.
+
+    Readers that already mapped the previous build keep using it until they
+    notice the swap; old builds beyond `keep` are removed. Returns the path of
+    the new build.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(track_ids), len(fields))
+    ids = np.array([track_id.encode() for track_id in track_ids]) if len(track_ids) else np.empty(0, dtype='S1')
+    if len(np.unique(ids)) != len(ids):
+        raise ValueError("Track IDs in a feature matrix must be unique")
+    order = np.argsort(ids, kind='stable').astype(np.int32)
+
+    os.makedirs(root, exist_ok=True)
+    build = f'v{time.time_ns()}'
+    staging = os.path.join(root, f'.{build}.tmp')
+    os.makedirs(staging)
+    vectors.tofile(os.path.join(staging, 'vectors.f32'))
+    ids.tofile(os.path.join(staging, 'track_ids.bin'))
+    ids[order].tofile(os.path.join(staging, 'sorted_ids.bin'))
+    order.tofile(os.path.join(staging, 'sorted_rows.i32'))
+    with open(os.path.join(staging, 'meta.json'), 'w') as f:
+        json.dump({
+            'format': FORMAT_VERSION,
+            'count': len(ids),
+            'dim': len(fields),
+            'id_width': ids.dtype.itemsize,
+            'fields': list(fields),
+        }, f)
+    os.rename(staging, os.path.join(root, build))
+
+    # Swap the `current` link in one rename so readers never see a half-written build
+    link = os.path.join(root, f'.{CURRENT_LINK}.{os.getpid()}.tmp')
+    os.symlink(build, link)
+    os.replace(link, os.path.join(root, CURRENT_LINK))
+
+    builds = sorted(name for name in os.listdir(root) if name.startswith('v'))
+    for old in builds[:-keep]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return os.path.join(root, build)
+
+
+class SwappableFeatureMatrix:
+    """
+    Follows the `current` build under a root directory, re-mapping when a
+    rebuilt matrix is swapped in. The link is checked at most once every
+    `check_interval` seconds, so lookups stay cheap.
+    """
+
+    def __init__(self, root: str = FEATURE_MATRIX_PATH, check_interval: float = 5.0):
+        self.root = root
+        self.check_interval = check_interval
+        self._target = None
+        self._matrix = None
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[FeatureMatrix]:
+        """Return the current build, or None if no matrix has been written."""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            with self._lock:
+                self._refresh()
+        return self._matrix
+
+    def _refresh(self):
+        self._checked_at = time.monotonic()
+        try:
+            target = os.readlink(os.path.join(self.root, CURRENT_LINK))
+        except OSError:
+            return
+        if target == self._target:
+            return
+        try:
+            self._matrix = FeatureMatrix(os.path.join(self.root, target))
+            self._target = target
+            logger.info("Mapped feature matrix %s (%d tracks)", target, len(self._matrix))
+        except (OSError, ValueError):
+            logger.exception("Failed to map feature matrix %s", target)
+
+
+_default_matrix = None
+
+
+def get_feature_matrix() -> SwappableFeatureMatrix:
+    """
+    Return the process-wide feature matrix handle. Call this before gunicorn
+    forks (see gunicorn.conf.py) so workers inherit the same mappings.
+    """
+    global _default_matrix
+    if _default_matrix is None:
+        _default_matrix = SwappableFeatureMatrix()
+        _default_matrix.current()
+    return _default_matrix
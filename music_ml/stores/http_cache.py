@@ -0,0 +1,168 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+# On-disk cache of Spotify API responses; unset disables it
+SPOTIFY_HTTP_CACHE_PATH = os.getenv('SPOTIFY_HTTP_CACHE_PATH')
+HTTP_CACHE_COMPRESSION_LEVEL = 6
+# Expired rows are swept after this many writes
+SWEEP_INTERVAL = 1000
+
+# Lifetime of cached responses per API path prefix. Only catalog data is cached;
+# user-scoped endpoints (/me, /users, /playlists) never are. Spotify's own
+# Cache-Control headers mostly say max-age=0, so they are not used.
+CACHEABLE_PATHS = (
+    ('/v1/search', 600),
+    ('/v1/tracks', 86400),
+    ('/v1/audio-features', 7 * 86400),
+    ('/v1/artists', 86400),
+    ('/v1/albums', 86400),
+)
+
+# Response headers worth keeping with a cached body
+KEPT_HEADERS = ('Content-Type',)
+
+
+def normalize_request(method: str, url: str) -> str:
+    """
+    Cache key for a request: method plus URL with the host lowercased and query
+    parameters sorted. Search text is case- and whitespace-folded the way
+    Spotify treats it. Headers are not part of the key, so only responses
+    fetched with the app's client-credentials token may be cached; spotify_get
+    sends requests made with a user's token around the cache.
+    """
+    parts = urlsplit(url)
+    params = sorted(
+        (name, ' '.join(value.casefold().split()) if name == 'q' else value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+    )
+    return f"{method.upper()} {urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(params), ''))}"
+
+
+def ttl_for(url: str) -> Optional[int]:
+    """How long a response for `url` may be cached, or None if it must not be."""
+    path = urlsplit(url).path
+    for prefix, ttl in CACHEABLE_PATHS:
+        if path.startswith(prefix):
+            return ttl
+    return None
+
+
+class HTTPResponseCache:
+    """
+    Persistent cache of successful Spotify GET responses in a SQLite file, so a
+    restarted or newly forked worker starts warm.
+
+    Bodies are zlib-compressed and stored with an absolute expiry. The file is
+    in WAL mode: any number of worker processes read it concurrently while one
+    writes. Each process opens its own connection on first use (connections
+    must not cross a fork), and a busy timeout absorbs writer contention.
+    """
+
+    def __init__(self, path: str = SPOTIFY_HTTP_CACHE_PATH):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS http_responses ('
+                'key TEXT PRIMARY KEY, status INTEGER NOT NULL, headers TEXT NOT NULL, '
+                'body BLOB NOT NULL, stored_at REAL NOT NULL, expires_at REAL NOT NULL)'
+            )
+            conn.commit()
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, method: str, url: str) -> Optional[requests.Response]:
+        """Return the cached response as a requests.Response, or None."""
+        key = normalize_request(method, url)
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT status, headers, body FROM http_responses WHERE key = ? AND expires_at > ?',
+                (key, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        status, headers, body = row
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response.headers['X-Cache'] = 'HIT'
+        response._content = zlib.decompress(body)
+        response.encoding = 'utf-8'
+        response.url = url
+        return response
+
+    def put(self, method: str, url: str, response: requests.Response, ttl: float):
+        headers = {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers}
+        body = zlib.compress(response.content, HTTP_CACHE_COMPRESSION_LEVEL)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO http_responses (key, status, headers, body, stored_at, expires_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (normalize_request(method, url), response.status_code, json.dumps(headers), body, now, now + ttl)
+            )
+            self._writes += 1
+            if self._writes % SWEEP_INTERVAL == 0:
+                conn.execute('DELETE FROM http_responses WHERE expires_at <= ?', (now,))
+            conn.commit()
+
+    def cached_get(self, url: str, fetch) -> requests.Response:
+        """
+        Serve a GET from the cache, or call `fetch()` (which performs the request)
+        and store its response if it succeeded and the endpoint is cacheable.
+        Cache errors are logged and fall through to the upstream call.
+        """
+        ttl = ttl_for(url)
+        if ttl is None:
+            return fetch()
+        try:
+            response = self.get('GET', url)
+            if response is not None:
+                return response
+        except sqlite3.Error:
+            logger.warning('Reading the HTTP response cache failed', exc_info=True)
+        response = fetch()
+        if response.status_code == 200:
+            try:
+                self.put('GET', url, response, ttl)
+            except sqlite3.Error:
+                logger.warning('Writing the HTTP response cache failed', exc_info=True)
+        return response
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_http_cache() -> Optional[HTTPResponseCache]:
+    """Return the process-wide response cache, or None when SPOTIFY_HTTP_CACHE_PATH is unset."""
+    global _default_cache
+    if not SPOTIFY_HTTP_CACHE_PATH:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = HTTPResponseCache(SPOTIFY_HTTP_CACHE_PATH)
+    return _default_cache
@@ -0,0 +1,312 @@
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+import redis
+from flask import Flask
+from flask.sessions import SecureCookieSessionInterface, SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from sqlalchemy import (
+    Column, DateTime, Integer, LargeBinary, MetaData, String, Table, create_engine, delete, select, update,
+)
+from sqlalchemy.engine import Engine
+
+from music_ml.stores.catalog_store import get_database_url
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv('REDIS_URL')
+# 'sqlalchemy' (app database), 'redis' or 'cookie' (signed cookie, no server-side storage);
+# defaults to redis when REDIS_URL is set
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'redis' if REDIS_URL else 'sqlalchemy')
+SESSION_REDIS_MAX_CONNECTIONS = int(os.getenv('SESSION_REDIS_MAX_CONNECTIONS', 20))
+SESSION_PURGE_INTERVAL = float(os.getenv('SESSION_PURGE_INTERVAL', 3600))  # seconds
+# Expired rows deleted per transaction, so purging never holds long locks
+SESSION_PURGE_BATCH = int(os.getenv('SESSION_PURGE_BATCH', 500))
+PURGE_BATCH_PAUSE = 0.1  # seconds between batches
+KEY_PREFIX = 'session:'
+
+_metadata = MetaData()
+# Same table and columns Flask-Session used, so the purger also clears rows it left behind
+sessions_table = Table(
+    'sessions', _metadata,
+    Column('id', Integer, primary_key=True),
+    Column('session_id', String(255), unique=True),
+    Column('data', LargeBinary),
+    Column('expiry', DateTime, index=True),
+)
+
+
+class LazySession(SessionMixin):
+    """
+    Session whose data is fetched from the store on first access, so requests
+    that never look at the session never touch storage.
+    """
+
+    def __init__(self, sid: str, loader=None, new: bool = False):
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        self.expiry: Optional[float] = None
+        self._loader = loader
+        self._data: Optional[dict] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._data is not None
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            self._data = {}
+            loaded = self._loader() if self._loader is not None else None
+            if loaded is not None:
+                self._data, self.expiry = loaded
+        self.accessed = True
+        return self._data
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self.modified = True
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def clear(self):
+        self.data.clear()
+        self.modified = True
+
+
+def create_schema(database_url: Optional[str] = None):
+    """Create the sessions table if it is missing."""
+    engine = create_engine(database_url or get_database_url())
+    try:
+        _metadata.create_all(engine)
+    finally:
+        engine.dispose()
+
+
+class SQLSessionBackend:
+    """
+    Sessions as rows in the app database, through the engine's connection
+    pool. The engine is created, and the table checked, on first use, and the
+    pool is replaced in a forked child so workers never share connections.
+    """
+
+    def __init__(self, database_url: Optional[str] = None, engine: Optional[Engine] = None):
+        self.database_url = database_url
+        self._engine = engine
+        self._pid = os.getpid()
+        self._schema_ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self) -> Engine:
+        with self._lock:
+            if self._engine is None:
+                self._engine = create_engine(self.database_url or get_database_url(), pool_pre_ping=True)
+                self._pid = os.getpid()
+            elif self._pid != os.getpid():
+                # Leave the parent's connections open for the parent
+                self._engine.dispose(close=False)
+                self._pid = os.getpid()
+            if not self._schema_ready:
+                _metadata.create_all(self._engine)
+                self._schema_ready = True
+            return self._engine
+
+    def load(self, sid: str) -> Optional[Tuple[dict, float]]:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(sessions_table.c.data, sessions_table.c.expiry)
+                .where(sessions_table.c.session_id == KEY_PREFIX + sid)
+            ).first()
+        if row is None or row.expiry is None or _timestamp(row.expiry) <= time.time():
+            return None
+        try:
+            return json.loads(row.data), _timestamp(row.expiry)
+        except ValueError:
+            # Rows written by Flask-Session are pickled; their users simply sign in again
+            return None
+
+    def save(self, sid: str, data: dict, expiry: float):
+        values = {'data': json.dumps(data).encode(), 'expiry': _datetime(expiry)}
+        with self.engine.begin() as conn:
+            updated = conn.execute(
+                update(sessions_table).where(sessions_table.c.session_id == KEY_PREFIX + sid).values(**values)
+            ).rowcount
+            if not updated:
+                conn.execute(sessions_table.insert().values(session_id=KEY_PREFIX + sid, **values))
+
+    def delete(self, sid: str):
+        with self.engine.begin() as conn:
+            conn.execute(delete(sessions_table).where(sessions_table.c.session_id == KEY_PREFIX + sid))
+
+    def purge_expired(self, batch_size: int = SESSION_PURGE_BATCH) -> int:
+        """Delete up to `batch_size` expired sessions. Returns how many were deleted."""
+        expired = (select(sessions_table.c.id)
+                   .where(sessions_table.c.expiry < _datetime(time.time()))
+                   .limit(batch_size))
+        with self.engine.begin() as conn:
+            return conn.execute(
+                delete(sessions_table).where(sessions_table.c.id.in_(expired.scalar_subquery()))
+            ).rowcount
+
+
+class RedisSessionBackend:
+    """Sessions in Redis with native expiry, over a bounded, shared connection pool."""
+
+    def __init__(self, url: str = REDIS_URL, client=None):
+        if client is None:
+            pool = redis.BlockingConnectionPool.from_url(
+                url, max_connections=SESSION_REDIS_MAX_CONNECTIONS, timeout=2,
+                socket_timeout=0.5, socket_connect_timeout=0.5)
+            client = redis.Redis(connection_pool=pool)
+        self._redis = client
+
+    def load(self, sid: str) -> Optional[Tuple[dict, float]]:
+        with self._redis.pipeline() as pipe:
+            value, ttl_ms = pipe.get(KEY_PREFIX + sid).pttl(KEY_PREFIX + sid).execute()
+        if value is None:
+            return None
+        try:
+            return json.loads(value), time.time() + max(ttl_ms, 0) / 1000
+        except ValueError:
+            return None
+
+    def save(self, sid: str, data: dict, expiry: float):
+        self._redis.set(KEY_PREFIX + sid, json.dumps(data), px=max(int((expiry - time.time()) * 1000), 1))
+
+    def delete(self, sid: str):
+        self._redis.delete(KEY_PREFIX + sid)
+
+    def purge_expired(self, batch_size: int = SESSION_PURGE_BATCH) -> int:
+        return 0  # Redis expires keys itself
+
+
+class StoredSessionInterface(SessionInterface):
+    """
+    Server-side sessions keyed by a signed random ID in the session cookie.
+
+    Nothing is read until a view uses the session, requests without a
+    (validly signed) cookie never touch storage, and a session is written
+    back only when it changed or has used up half its lifetime.
+    """
+
+    salt = 'music_ml-session'
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def _signer(self, app: Flask) -> Signer:
+        return Signer(app.secret_key, salt=self.salt, key_derivation='hmac')
+
+    def open_session(self, app: Flask, request) -> LazySession:
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode()
+                return LazySession(sid, loader=lambda: self.backend.load(sid))
+            except BadSignature:
+                pass
+        return LazySession(secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app: Flask, session: LazySession, response):
+        if not session.loaded:
+            return
+        if session.accessed:
+            response.vary.add('Cookie')
+        name, domain, path = self.get_cookie_name(app), self.get_cookie_domain(app), self.get_cookie_path(app)
+        if not session:
+            if session.modified and not session.new:
+                self.backend.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        now = time.time()
+        stale = session.expiry is not None and session.expiry - now < lifetime / 2
+        if not (session.modified or stale):
+            return
+        self.backend.save(session.sid, dict(session), now + lifetime)
+        response.set_cookie(
+            name, self._signer(app).sign(session.sid).decode(),
+            expires=self.get_expiration_time(app, session), domain=domain, path=path,
+            httponly=self.get_cookie_httponly(app), secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+# The expiry column holds naive UTC datetimes, as Flask-Session wrote them
+def _datetime(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+def _timestamp(value: datetime) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+def init_sessions(app: Flask, backend: str = SESSION_BACKEND, database_url: Optional[str] = None):
+    """
+    Install the session interface for `backend`. Returns the store backing it
+    (None for cookies). Connections are only made once a session is used.
+    """
+    if backend == 'cookie':
+        app.session_interface = SecureCookieSessionInterface()
+        return None
+    store = RedisSessionBackend() if backend == 'redis' else SQLSessionBackend(database_url)
+    app.session_interface = StoredSessionInterface(store)
+    return store
+
+
+def purge_expired_sessions(store, batch_size: int = SESSION_PURGE_BATCH, pause: float = PURGE_BATCH_PAUSE) -> int:
+    """Delete every expired session, one short batch at a time. Returns the number deleted."""
+    total = 0
+    while True:
+        deleted = store.purge_expired(batch_size)
+        total += deleted
+        if deleted < batch_size:
+            return total
+        time.sleep(pause)
+
+
+_purger_thread = None
+
+
+def start_session_purger(store, interval: float = SESSION_PURGE_INTERVAL):
+    """Start the background thread that purges expired sessions. A no-op for stores that expire on their own."""
+    global _purger_thread
+    if store is None or isinstance(store, RedisSessionBackend):
+        return None
+    if _purger_thread is not None and _purger_thread.is_alive():
+        return _purger_thread
+
+    def run():
+        while True:
+            try:
+                deleted = purge_expired_sessions(store)
+                if deleted:
+                    logger.info('Purged %d expired sessions', deleted)
+            except Exception:
+                logger.exception('Purging expired sessions failed')
+            time.sleep(interval)
+
+    _purger_thread = threading.Thread(target=run, name='session-purger', daemon=True)
+    _purger_thread.start()
+    return _purger_thread
@@ -0,0 +1,23 @@
+from music_ml.models.artist import Artist
+from music_ml.stores.artist_graph_store import ArtistGraphStore
+
+def test_put_and_get_round_trip():
+    store = ArtistGraphStore(path=':memory:')
+    neighbors = [Artist(name='A', spotify_artist_id='a'), Artist(name='B', spotify_artist_id='b')]
+    store.put('seed', neighbors)
+
+    assert store.get('seed') == neighbors
+    assert store.get('unknown') is None
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / 'graph.db')
+    ArtistGraphStore(path=path).put('seed', [Artist(name='A', spotify_artist_id='a')])
+
+    reopened = ArtistGraphStore(path=path)
+    assert reopened.get_many(['seed', 'other']) == {'seed': [Artist(name='A', spotify_artist_id='a')]}
+
+def test_expired_entries_are_ignored(tmp_path):
+    path = str(tmp_path / 'graph.db')
+    ArtistGraphStore(path=path).put('seed', [Artist(name='A', spotify_artist_id='a')])
+
+    assert ArtistGraphStore(path=path, ttl=0).get('seed') is None
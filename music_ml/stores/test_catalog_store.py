@@ -0,0 +1,24 @@
+from music_ml.models.artist import Artist
+from music_ml.models.track import Track
+from music_ml.stores.catalog_store import CatalogStore, catalog_tracks
+
+def test_upserts_replace_existing_rows():
+    store = CatalogStore('sqlite://')
+    artist = Artist(name='Artist', spotify_artist_id='a1')
+    store.upsert_tracks([Track(spotify_track_id='t1', track_name='Old Name', artist=artist)])
+    store.upsert_tracks([Track(spotify_track_id='t1', track_name='New Name', artist=artist),
+                         Track(spotify_track_id='t1', track_name='Newest Name', artist=artist)])
+
+    assert store.count(catalog_tracks) == 1
+    assert store.get_tracks(['t1'])[0].track_name == 'Newest Name'
+
+def test_iter_audio_features_streams_batches():
+    store = CatalogStore('sqlite://')
+    store.upsert_audio_features([
+        {'spotify_track_id': f't{i}', 'tempo': float(i), 'energy': 0.1, 'valence': 0.2, 'danceability': 0.3}
+        for i in range(5)
+    ])
+
+    batches = list(store.iter_audio_features(batch_size=2))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert batches[0][0] == ('t0', 0.0, 0.1, 0.2, 0.3)
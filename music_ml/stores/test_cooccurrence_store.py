@@ -0,0 +1,66 @@
+from music_ml.models.artist import Artist
+from music_ml.models.track import Track
+from music_ml.stores import cooccurrence_store
+from music_ml.stores.cooccurrence_store import CooccurrenceStore, flush_pending, record_playlist
+
+def make_track(track_id):
+    return Track(spotify_track_id=track_id, track_name=f'Track {track_id}',
+                 artist=Artist(name='Test Artist', spotify_artist_id='artist'))
+
+A, B, C, D = (make_track(track_id) for track_id in 'abcd')
+
+def neighbor_ids(store, track_id, k=10):
+    return [(track.spotify_track_id, weight) for track, weight in store.top_k(track_id, k)]
+
+def test_apply_counts_pairs_and_sorts_by_weight():
+    store = CooccurrenceStore(path=':memory:')
+    store.apply([([A, B, C], 1.0), ([A, C], 1.0), ([A, C, D], 2.0)])
+
+    assert neighbor_ids(store, 'a') == [('c', 4.0), ('d', 2.0), ('b', 1.0)]
+    assert neighbor_ids(store, 'a', k=1) == [('c', 4.0)]
+    assert neighbor_ids(store, 'b') == [('a', 1.0), ('c', 1.0)]
+    assert store.top_k('unknown', 5) == []
+
+def test_incremental_updates_merge_into_existing_rows():
+    store = CooccurrenceStore(path=':memory:')
+    store.apply([([A, B], 1.0)])
+    store.apply([([A, C], 1.0), ([A, C], 1.0)])
+
+    assert neighbor_ids(store, 'a') == [('c', 2.0), ('b', 1.0)]
+
+def test_duplicate_tracks_in_a_playlist_count_once():
+    store = CooccurrenceStore(path=':memory:')
+    store.apply([([A, B, A], 1.0)])
+
+    assert neighbor_ids(store, 'a') == [('b', 1.0)]
+
+def test_log_is_shared_between_stores(tmp_path):
+    path = str(tmp_path / 'cooccurrence.db')
+    writer = CooccurrenceStore(path=path)
+    reader = CooccurrenceStore(path=path)
+
+    writer.log_playlists([([A, B], 'generated'), ([A, B], 'exported')])
+    assert reader.sync() == 2
+    assert neighbor_ids(reader, 'b') == [('a', 4.0)]
+    assert reader.sync() == 0
+
+def test_iter_log_returns_logged_playlists_in_order():
+    store = CooccurrenceStore(path=':memory:')
+    store.log_playlists([([A, B], 'generated'), ([C, D, A], 'exported'), ([B, C], 'generated')])
+
+    entries = list(store.iter_log(batch_size=2))
+
+    assert [(log_id, source) for log_id, source, _ in entries] == [(1, 'generated'), (2, 'exported'), (3, 'generated')]
+    assert [track.spotify_track_id for track in entries[1][2]] == ['c', 'd', 'a']
+    assert entries[1][2][0].artist.name == 'Test Artist'
+
+def test_recorded_playlists_are_applied_on_flush(monkeypatch):
+    monkeypatch.setattr(cooccurrence_store, '_pending', cooccurrence_store.queue.Queue())
+    store = CooccurrenceStore(path=':memory:')
+
+    record_playlist([A, B, C], source='generated')
+    record_playlist([A], source='generated')  # Single tracks carry no signal
+    assert store.top_k('a', 5) == []
+
+    assert flush_pending(store) == 1
+    assert neighbor_ids(store, 'a') == [('b', 1.0), ('c', 1.0)]
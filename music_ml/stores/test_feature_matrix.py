@@ -0,0 +1,57 @@
+import os
+import numpy as np
+import pytest
+from music_ml.stores.feature_matrix import FeatureMatrix, SwappableFeatureMatrix, write_feature_matrix
+
+FIELDS = ('tempo', 'energy')
+
+def test_write_and_lookup(tmp_path):
+    root = str(tmp_path)
+    path = write_feature_matrix(root, ['b', 'a', 'c'], [[120, 0.5], [90, 0.2], [150, 0.9]], FIELDS)
+    matrix = FeatureMatrix(path)
+
+    assert len(matrix) == 3
+    assert matrix.fields == FIELDS
+    assert isinstance(matrix.vectors, np.memmap)
+    assert list(matrix.rows_for(['a', 'missing', 'c', 'b'])) == [1, -1, 2, 0]
+    np.testing.assert_allclose(matrix.get('c'), [150, 0.9], rtol=1e-6)
+    assert matrix.get('missing') is None
+    assert matrix.columns(['energy']) == [1]
+    assert matrix.columns(['valence']) is None
+
+def test_longer_ids_do_not_match_truncated_prefix(tmp_path):
+    matrix = FeatureMatrix(write_feature_matrix(str(tmp_path), ['abc'], [[1, 2]], FIELDS))
+    assert list(matrix.rows_for(['abcd', 'abc'])) == [-1, 0]
+
+def test_duplicate_ids_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        write_feature_matrix(str(tmp_path), ['a', 'a'], [[1, 2], [3, 4]], FIELDS)
+
+def test_empty_matrix(tmp_path):
+    matrix = FeatureMatrix(write_feature_matrix(str(tmp_path), [], np.empty((0, 2)), FIELDS))
+    assert len(matrix) == 0
+    assert list(matrix.rows_for(['a'])) == [-1]
+
+def test_swappable_matrix_follows_rebuilds(tmp_path):
+    root = str(tmp_path)
+    handle = SwappableFeatureMatrix(root, check_interval=0)
+    assert handle.current() is None
+
+    write_feature_matrix(root, ['a'], [[1, 2]], FIELDS)
+    first = handle.current()
+    assert list(first.rows_for(['a', 'b'])) == [0, -1]
+
+    write_feature_matrix(root, ['a', 'b'], [[1, 2], [3, 4]], FIELDS)
+    second = handle.current()
+    assert second is not first
+    assert list(second.rows_for(['a', 'b'])) == [0, 1]
+    # The previous mapping stays readable for requests still holding it
+    np.testing.assert_allclose(first.vectors[0], [1, 2])
+
+def test_old_builds_are_pruned(tmp_path):
+    root = str(tmp_path)
+    for i in range(5):
+        write_feature_matrix(root, ['a'], [[i, i]], FIELDS, keep=2)
+    builds = [name for name in os.listdir(root) if name.startswith('v')]
+    assert len(builds) == 2
+    assert os.readlink(os.path.join(root, 'current')) == max(builds)
@@ -0,0 +1,96 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from music_ml.stores.http_cache import HTTPResponseCache, normalize_request, ttl_for
+
+SEARCH_URL = 'https://api.spotify.com/v1/search?q=Daft%20Punk&type=track&limit=20&offset=0'
+
+
+def make_response(status=200, body=b'{"tracks": {"items": []}}'):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    response.headers['Content-Type'] = 'application/json; charset=utf-8'
+    return response
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return HTTPResponseCache(str(tmp_path / 'http_cache.db'))
+
+
+def test_normalize_request_sorts_params_and_folds_search_text():
+    assert normalize_request('get', SEARCH_URL) == normalize_request(
+        'GET', 'https://API.spotify.com/v1/search?limit=20&offset=0&type=track&q=daft++PUNK'
+    )
+    assert normalize_request('GET', SEARCH_URL) != normalize_request('GET', SEARCH_URL.replace('offset=0', 'offset=20'))
+
+
+def test_ttl_for_skips_user_endpoints():
+    assert ttl_for(SEARCH_URL) == 600
+    assert ttl_for('https://api.spotify.com/v1/artists/a1/top-tracks?market=US') == 86400
+    assert ttl_for('https://api.spotify.com/v1/me') is None
+    assert ttl_for('https://api.spotify.com/v1/playlists/p1/tracks') is None
+
+
+def test_cached_get_stores_and_replays_response(cache):
+    fetch = MagicMock(return_value=make_response())
+
+    first = cache.cached_get(SEARCH_URL, fetch)
+    second = cache.cached_get(SEARCH_URL, fetch)
+
+    fetch.assert_called_once()
+    assert first.json() == second.json() == {'tracks': {'items': []}}
+    assert second.status_code == 200
+    assert second.headers['Content-Type'] == 'application/json; charset=utf-8'
+    assert second.headers['X-Cache'] == 'HIT'
+
+
+def test_cache_survives_restart(tmp_path):
+    path = str(tmp_path / 'http_cache.db')
+    HTTPResponseCache(path).cached_get(SEARCH_URL, lambda: make_response())
+
+    fetch = MagicMock()
+    response = HTTPResponseCache(path).cached_get(SEARCH_URL, fetch)
+
+    fetch.assert_not_called()
+    assert response.json() == {'tracks': {'items': []}}
+
+
+def test_errors_are_not_cached(cache):
+    fetch = MagicMock(return_value=make_response(status=429, body=b''))
+
+    cache.cached_get(SEARCH_URL, fetch)
+    cache.cached_get(SEARCH_URL, fetch)
+
+    assert fetch.call_count == 2
+
+
+def test_uncacheable_urls_always_fetch(cache):
+    fetch = MagicMock(return_value=make_response())
+
+    cache.cached_get('https://api.spotify.com/v1/me', fetch)
+    cache.cached_get('https://api.spotify.com/v1/me', fetch)
+
+    assert fetch.call_count == 2
+
+
+def test_expired_entries_are_refetched(cache):
+    fetch = MagicMock(return_value=make_response())
+    with patch('music_ml.stores.http_cache.time.time', return_value=1000.0):
+        cache.cached_get(SEARCH_URL, fetch)
+    with patch('music_ml.stores.http_cache.time.time', return_value=1601.0):
+        cache.cached_get(SEARCH_URL, fetch)
+
+    assert fetch.call_count == 2
+
+
+def test_bodies_are_compressed(cache):
+    body = b'{"tracks": {"items": [' + b','.join([b'{"name": "Around the World"}'] * 100) + b']}}'
+    cache.cached_get(SEARCH_URL, lambda: make_response(body=body))
+
+    stored = cache._connection().execute('SELECT length(body) FROM http_responses').fetchone()[0]
+    assert stored < len(body) / 10
+    assert cache.get('GET', SEARCH_URL).content == body
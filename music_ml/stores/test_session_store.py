@@ -0,0 +1,137 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from flask import Flask, jsonify, session
+from sqlalchemy import create_engine, func, select
+
+from music_ml.stores.session_store import (
+    SQLSessionBackend,
+    StoredSessionInterface,
+    init_sessions,
+    purge_expired_sessions,
+    sessions_table,
+)
+
+
+def make_app(backend):
+    app = Flask(__name__)
+    app.secret_key = 'test-secret'
+    app.session_interface = StoredSessionInterface(backend)
+
+    @app.route('/anonymous')
+    def anonymous():
+        return 'ok'
+
+    @app.route('/login')
+    def login():
+        session.permanent = True
+        session['access_token'] = 'token'
+        return 'ok'
+
+    @app.route('/status')
+    def status():
+        return jsonify(authenticated='access_token' in session)
+
+    @app.route('/logout')
+    def logout():
+        session.clear()
+        return 'ok'
+
+    return app
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLSessionBackend(engine=create_engine(f'sqlite:///{tmp_path / "sessions.db"}'))
+
+
+def row_count(store):
+    with store.engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(sessions_table)).scalar()
+
+
+def test_anonymous_requests_never_touch_storage():
+    backend = MagicMock()
+    client = make_app(backend).test_client()
+
+    assert client.get('/status').get_json() == {'authenticated': False}
+    response = client.get('/anonymous')
+
+    assert 'Set-Cookie' not in response.headers
+    assert backend.mock_calls == []
+
+
+def test_session_is_only_loaded_by_views_that_use_it(store):
+    client = make_app(store).test_client()
+    client.get('/login')
+
+    with patch.object(store, 'load', wraps=store.load) as load:
+        client.get('/anonymous')
+        assert load.call_count == 0
+        assert client.get('/status').get_json() == {'authenticated': True}
+        assert load.call_count == 1
+
+
+def test_forged_cookie_is_not_looked_up():
+    backend = MagicMock()
+    client = make_app(backend).test_client()
+    client.set_cookie('session', 'made-up-session-id.bad-signature')
+
+    assert client.get('/status').get_json() == {'authenticated': False}
+    backend.load.assert_not_called()
+
+
+def test_unchanged_session_is_not_rewritten_until_half_its_lifetime_is_used(store):
+    app = make_app(store)
+    client = app.test_client()
+    client.get('/login')
+
+    with patch.object(store, 'save', wraps=store.save) as save:
+        client.get('/status')
+        save.assert_not_called()
+
+        later = time.time() + app.permanent_session_lifetime.total_seconds() * 0.6
+        with patch('music_ml.stores.session_store.time.time', return_value=later):
+            response = client.get('/status')
+        save.assert_called_once()
+        assert 'Set-Cookie' in response.headers
+
+
+def test_logout_deletes_the_stored_session(store):
+    client = make_app(store).test_client()
+    client.get('/login')
+    assert row_count(store) == 1
+
+    response = client.get('/logout')
+
+    assert row_count(store) == 0
+    assert 'Max-Age=0' in response.headers['Set-Cookie']
+    assert client.get('/status').get_json() == {'authenticated': False}
+
+
+def test_expired_sessions_are_not_loaded(store):
+    store.save('sid', {'access_token': 'token'}, time.time() - 1)
+
+    assert store.load('sid') is None
+
+
+def test_purge_deletes_expired_sessions_in_batches(store):
+    now = time.time()
+    for i in range(5):
+        store.save(f'expired{i}', {}, now - 60)
+    store.save('live', {'access_token': 'token'}, now + 60)
+
+    with patch.object(store, 'purge_expired', wraps=store.purge_expired) as purge:
+        assert purge_expired_sessions(store, batch_size=2, pause=0) == 5
+        assert purge.call_count == 3
+
+    assert row_count(store) == 1
+    assert store.load('live')[0] == {'access_token': 'token'}
+
+
+def test_cookie_backend_needs_no_store():
+    app = Flask(__name__)
+
+    assert init_sessions(app, backend='cookie') is None
+    assert not isinstance(app.session_interface, StoredSessionInterface)
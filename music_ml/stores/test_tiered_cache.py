@@ -0,0 +1,154 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from music_ml.stores.tiered_cache import MISS, Namespace, SQLiteBackend, TieredCache
+from music_ml.utils.metrics import start_request_counts, stop_request_counts
+
+NAMESPACES = {'search': Namespace(ttl=60, negative_ttl=10, l1_size=2)}
+
+
+@pytest.fixture
+def cache():
+    return TieredCache(SQLiteBackend(':memory:'), NAMESPACES)
+
+
+def test_get_returns_miss_for_unknown_key(cache):
+    assert cache.get('search', 'missing') is MISS
+
+
+def test_set_then_get_hits_l1(cache):
+    cache.set('search', 'q', {'items': [1, 2]})
+
+    assert cache.get('search', 'q') == {'items': [1, 2]}
+    assert cache.stats()['search']['l1_hits'] == 1
+
+
+def test_l1_eviction_falls_back_to_l2(cache):
+    for key in ('a', 'b', 'c'):
+        cache.set('search', key, key.upper())
+
+    # 'a' was evicted from the two-entry L1 but is still in L2
+    assert cache.get('search', 'a') == 'A'
+    stats = cache.stats()['search']
+    assert stats['l2_hits'] == 1
+    assert stats['l1_hit_rate'] == 0.0
+    assert stats['l2_hit_rate'] == 1.0
+
+
+def test_lookups_are_counted_for_the_current_request(cache):
+    cache.set('search', 'q', 'Q')
+    cache.get('search', 'q')
+
+    counts = start_request_counts()
+    try:
+        cache.get('search', 'q')
+        cache.get('search', 'missing')
+        cache.contains('search', 'q')
+    finally:
+        stop_request_counts()
+    cache.get('search', 'q')
+
+    assert counts == {'cache_hits': 1, 'cache_misses': 1}
+
+
+def test_l2_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    first = TieredCache(SQLiteBackend(path), NAMESPACES)
+    second = TieredCache(SQLiteBackend(path), NAMESPACES)
+
+    first.set('search', 'q', ['track1'])
+
+    assert second.get('search', 'q') == ['track1']
+
+
+def test_none_is_cached_as_negative_result(cache):
+    loader = MagicMock(return_value=None)
+
+    assert cache.get_or_load('search', 'q', loader) is None
+    assert cache.get_or_load('search', 'q', loader) is None
+    loader.assert_called_once()
+
+
+def test_entries_expire(cache):
+    with patch('music_ml.stores.tiered_cache.time.time', return_value=1000.0):
+        cache.set('search', 'q', 'value')
+    with patch('music_ml.stores.tiered_cache.time.time', return_value=1061.0):
+        assert cache.get('search', 'q') is MISS
+
+
+def test_ttl_is_capped_by_namespace(cache):
+    with patch('music_ml.stores.tiered_cache.time.time', return_value=1000.0):
+        cache.set('search', 'q', 'value', ttl=3600)
+    with patch('music_ml.stores.tiered_cache.time.time', return_value=1061.0):
+        assert cache.get('search', 'q') is MISS
+
+
+def test_get_or_load_uses_ttl_from_value(cache):
+    with patch('music_ml.stores.tiered_cache.time.time', return_value=1000.0):
+        cache.get_or_load('search', 'q', lambda: {'expires_in': 5}, ttl=lambda value: value['expires_in'])
+    with patch('music_ml.stores.tiered_cache.time.time', return_value=1006.0):
+        assert cache.get('search', 'q') is MISS
+
+
+def test_expires_at_reads_either_layer_and_refresh_reloads(cache):
+    with patch('music_ml.stores.tiered_cache.time.time', return_value=1000.0):
+        for key in ('a', 'b', 'c'):
+            cache.set('search', key, key.upper(), ttl=30)
+
+        # 'a' is only in L2 now
+        assert cache.expires_at('search', 'a') == cache.expires_at('search', 'c') == 1030.0
+        assert cache.expires_at('search', 'missing') is None
+        assert cache.get_or_load('search', 'c', lambda: 'new', refresh=True) == 'new'
+        assert cache.get('search', 'c') == 'new'
+
+
+@patch('music_ml.stores.tiered_cache.INVALIDATION_POLL_INTERVAL', 0)
+def test_invalidate_namespace_reaches_other_processes(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    first = TieredCache(SQLiteBackend(path), NAMESPACES)
+    second = TieredCache(SQLiteBackend(path), NAMESPACES)
+    first.set('search', 'q', 'old')
+    assert second.get('search', 'q') == 'old'
+
+    first.invalidate('search')
+
+    assert first.get('search', 'q') is MISS
+    assert second.get('search', 'q') is MISS
+
+
+@patch('music_ml.stores.tiered_cache.INVALIDATION_POLL_INTERVAL', 0)
+def test_invalidate_key_reaches_other_processes(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    first = TieredCache(SQLiteBackend(path), NAMESPACES)
+    second = TieredCache(SQLiteBackend(path), NAMESPACES)
+    first.set('search', 'q', 'old')
+    first.set('search', 'other', 'kept')
+    assert second.get('search', 'q') == 'old'
+
+    first.invalidate('search', 'q')
+
+    assert second.get('search', 'q') is MISS
+    assert second.get('search', 'other') == 'kept'
+
+
+def test_l2_errors_are_treated_as_misses():
+    l2 = MagicMock()
+    l2.version.return_value = 0
+    l2.poll_invalidations.return_value = (0, [])
+    l2.get.side_effect = ConnectionError('down')
+    l2.set.side_effect = ConnectionError('down')
+    cache = TieredCache(l2, NAMESPACES)
+
+    assert cache.get_or_load('search', 'q', lambda: 'loaded') == 'loaded'
+    assert cache.get('search', 'q') == 'loaded'
+    assert cache.stats()['search']['l2_errors'] == 2
+
+
+def test_memory_only_cache():
+    cache = TieredCache(namespaces=NAMESPACES)
+    cache.set('search', 'q', 'value')
+
+    assert cache.get('search', 'q') == 'value'
+    cache.invalidate('search')
+    assert cache.get('search', 'q') is MISS
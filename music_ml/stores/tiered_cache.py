@@ -0,0 +1,413 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import redis
+
+from music_ml.utils.metrics import count_for_request
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv('REDIS_URL')
+CACHE_DB_PATH = os.getenv('CACHE_DB_PATH', 'instance/cache.db')
+# 'redis', 'sqlite' or 'memory' (L1 only); defaults to redis when REDIS_URL is set
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'redis' if REDIS_URL else 'sqlite')
+
+# How often each process checks the shared invalidation log
+INVALIDATION_POLL_INTERVAL = 1.0  # seconds
+MAX_INVALIDATION_LOG = 10000
+# The SQLite store sweeps expired entries after this many writes
+SWEEP_INTERVAL = 1000
+
+MISS = object()
+# Stored in place of a value to remember that the upstream had nothing
+_NEGATIVE = {'__negative__': True}
+
+
+@dataclass(frozen=True)
+class Namespace:
+    ttl: float  # seconds
+    negative_ttl: float = 60.0
+    l1_size: int = 1024
+
+
+DEFAULT_NAMESPACES = {
+    'search': Namespace(ttl=600, l1_size=2048),
+    'track': Namespace(ttl=86400, negative_ttl=600, l1_size=10000),
+    'top_tracks': Namespace(ttl=6 * 3600, negative_ttl=600, l1_size=2048),
+    # Generated playlists; short-lived because co-occurrence data keeps changing
+    'playlist': Namespace(ttl=1800, l1_size=512),
+    # Upper bound only; token entries are stored with the lifetime Spotify grants
+    'token': Namespace(ttl=3600, l1_size=4),
+}
+
+
+class _LRU:
+    """Size-bounded in-process LRU with per-entry expiry."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return MISS
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def expires_at(self, key: str) -> Optional[float]:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None and entry[0] > time.time() else None
+
+    def set(self, key: str, value, expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend:
+    """
+    Shared L2 in a local SQLite file (WAL mode), for a single host or tests;
+    ':memory:' gives a private in-process store.
+    """
+
+    def __init__(self, path: str = CACHE_DB_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(
+            'CREATE TABLE IF NOT EXISTS cache_entries ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL);'
+            'CREATE TABLE IF NOT EXISTS cache_versions (namespace TEXT PRIMARY KEY, version INTEGER NOT NULL);'
+            'CREATE TABLE IF NOT EXISTS cache_invalidations ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, namespace TEXT NOT NULL, key TEXT);'
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value FROM cache_entries WHERE key = ? AND expires_at > ?', (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, value, time.time() + ttl)
+            )
+            self._writes += 1
+            if self._writes % SWEEP_INTERVAL == 0:
+                self._conn.execute('DELETE FROM cache_entries WHERE expires_at <= ?', (time.time(),))
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+            self._conn.commit()
+
+    def version(self, namespace: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT version FROM cache_versions WHERE namespace = ?', (namespace,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def bump_version(self, namespace: str) -> int:
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO cache_versions (namespace, version) VALUES (?, 1) '
+                'ON CONFLICT(namespace) DO UPDATE SET version = version + 1', (namespace,)
+            )
+            self._conn.commit()
+            return self._conn.execute(
+                'SELECT version FROM cache_versions WHERE namespace = ?', (namespace,)
+            ).fetchone()[0]
+
+    def publish_invalidation(self, namespace: str, key: Optional[str]):
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO cache_invalidations (namespace, key) VALUES (?, ?)', (namespace, key)
+            )
+            self._conn.execute('DELETE FROM cache_invalidations WHERE id <= ?',
+                               (cursor.lastrowid - MAX_INVALIDATION_LOG,))
+            self._conn.commit()
+
+    def poll_invalidations(self, since) -> Tuple[Any, List[Tuple[str, Optional[str]]]]:
+        with self._lock:
+            if since is None:
+                row = self._conn.execute('SELECT MAX(id) FROM cache_invalidations').fetchone()
+                return row[0] or 0, []
+            rows = self._conn.execute(
+                'SELECT id, namespace, key FROM cache_invalidations WHERE id > ? ORDER BY id', (since,)
+            ).fetchall()
+        if not rows:
+            return since, []
+        return rows[-1][0], [(namespace, key) for _, namespace, key in rows]
+
+
+class RedisBackend:
+    """Shared L2 in Redis, visible to every worker and dyno."""
+
+    INVALIDATION_STREAM = 'music_ml:cache:invalidations'
+
+    def __init__(self, url: str = REDIS_URL, client=None):
+        if client is None:
+            client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._redis = client
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._redis.get(key)
+        return value.decode() if value is not None else None
+
+    def set(self, key: str, value: str, ttl: float):
+        self._redis.set(key, value, px=max(int(ttl * 1000), 1))
+
+    def delete(self, key: str):
+        self._redis.delete(key)
+
+    def version(self, namespace: str) -> int:
+        return int(self._redis.get(f'music_ml:cache:version:{namespace}') or 0)
+
+    def bump_version(self, namespace: str) -> int:
+        return self._redis.incr(f'music_ml:cache:version:{namespace}')
+
+    def publish_invalidation(self, namespace: str, key: Optional[str]):
+        self._redis.xadd(self.INVALIDATION_STREAM, {'namespace': namespace, 'key': key or ''},
+                         maxlen=MAX_INVALIDATION_LOG, approximate=True)
+
+    def poll_invalidations(self, since) -> Tuple[Any, List[Tuple[str, Optional[str]]]]:
+        if since is None:
+            last = self._redis.xrevrange(self.INVALIDATION_STREAM, count=1)
+            return (last[0][0] if last else b'0-0'), []
+        events = [event for event in self._redis.xrange(self.INVALIDATION_STREAM, min=since) if event[0] != since]
+        if not events:
+            return since, []
+        return events[-1][0], [
+            (fields[b'namespace'].decode(), fields[b'key'].decode() or None) for _, fields in events
+        ]
+
+
+class TieredCache:
+    """
+    Two-level cache: a per-process LRU (L1) in front of a store shared by all
+    workers (L2, Redis or SQLite). Values must be JSON-serializable.
+
+    Each namespace has its own TTL, negative-result TTL and L1 size. Flushing
+    a namespace bumps its version in L2, which is part of every L2 key, so the
+    old entries become unreachable at once. Flushes and single-key
+    invalidations are also appended to a shared log that every process polls
+    (at most once per INVALIDATION_POLL_INTERVAL) to drop its own L1 copies.
+    L2 failures are logged and treated as misses, never surfaced to callers.
+    """
+
+    def __init__(self, l2=None, namespaces: Dict[str, Namespace] = None):
+        self.l2 = l2
+        self.namespaces = dict(namespaces or DEFAULT_NAMESPACES)
+        self._l1: Dict[str, _LRU] = {name: _LRU(config.l1_size) for name, config in self.namespaces.items()}
+        self._versions: Dict[str, int] = {}
+        self._stats: Dict[str, Dict[str, int]] = {
+            name: dict.fromkeys(('l1_hits', 'l1_misses', 'l2_hits', 'l2_misses', 'l2_errors', 'loads'), 0)
+            for name in self.namespaces
+        }
+        self._invalidation_cursor = None
+        self._next_poll = 0.0
+        self._poll_lock = threading.Lock()
+
+    def get(self, namespace: str, key: str):
+        """Return the cached value, None for a cached negative result, or MISS."""
+        self._poll_invalidations()
+        stats = self._stats[namespace]
+        value = self._l1[namespace].get(key)
+        if value is not MISS:
+            stats['l1_hits'] += 1
+            count_for_request('cache_hits')
+            return None if value is _NEGATIVE else value
+        stats['l1_misses'] += 1
+
+        if self.l2 is None:
+            count_for_request('cache_misses')
+            return MISS
+        try:
+            raw = self.l2.get(self._l2_key(namespace, key))
+        except Exception:
+            stats['l2_errors'] += 1
+            count_for_request('cache_misses')
+            logger.warning('Cache L2 read failed for %s', namespace, exc_info=True)
+            return MISS
+        if raw is None:
+            stats['l2_misses'] += 1
+            count_for_request('cache_misses')
+            return MISS
+        stats['l2_hits'] += 1
+        count_for_request('cache_hits')
+        # The L1 copy expires together with the shared entry
+        expires_at, value = json.loads(raw)
+        if value == _NEGATIVE:
+            value = _NEGATIVE
+        self._l1[namespace].set(key, value, expires_at)
+        return None if value is _NEGATIVE else value
+
+    def set(self, namespace: str, key: str, value, ttl: Optional[float] = None):
+        """Cache a value; None records a negative result (kept for the namespace's negative TTL)."""
+        config = self.namespaces[namespace]
+        if value is None:
+            value, ttl = _NEGATIVE, config.negative_ttl
+        else:
+            ttl = min(ttl, config.ttl) if ttl is not None else config.ttl
+        expires_at = time.time() + ttl
+        self._l1[namespace].set(key, value, expires_at)
+        if self.l2 is None:
+            return
+        try:
+            self.l2.set(self._l2_key(namespace, key), json.dumps([expires_at, value], separators=(',', ':')), ttl)
+        except Exception:
+            self._stats[namespace]['l2_errors'] += 1
+            logger.warning('Cache L2 write failed for %s', namespace, exc_info=True)
+
+    def contains(self, namespace: str, key: str) -> bool:
+        """Whether a live entry exists in either layer; does not count towards hit rates."""
+        return self.expires_at(namespace, key) is not None
+
+    def expires_at(self, namespace: str, key: str) -> Optional[float]:
+        """When the live entry for key expires, or None if there is none; does not count towards hit rates."""
+        self._poll_invalidations()
+        expires_at = self._l1[namespace].expires_at(key)
+        if expires_at is not None or self.l2 is None:
+            return expires_at
+        try:
+            raw = self.l2.get(self._l2_key(namespace, key))
+        except Exception:
+            logger.warning('Cache L2 read failed for %s', namespace, exc_info=True)
+            return None
+        return json.loads(raw)[0] if raw is not None else None
+
+    def get_or_load(self, namespace: str, key: str, loader: Callable[[], Any],
+                    ttl: Optional[Callable[[Any], float]] = None, refresh: bool = False):
+        """
+        Return the cached value, or call `loader` and cache what it returns
+        (None is cached as a negative result). `ttl` may derive an entry's
+        lifetime from the loaded value. `refresh` reloads even when a value is
+        cached, replacing it.
+        """
+        value = MISS if refresh else self.get(namespace, key)
+        if value is not MISS:
+            return value
+        self._stats[namespace]['loads'] += 1
+        value = loader()
+        self.set(namespace, key, value, ttl(value) if ttl and value is not None else None)
+        return value
+
+    def invalidate(self, namespace: str, key: Optional[str] = None):
+        """Drop one key, or the whole namespace when key is None, in every process."""
+        if key is None:
+            self._l1[namespace].clear()
+        else:
+            self._l1[namespace].delete(key)
+        if self.l2 is None:
+            return
+        try:
+            if key is None:
+                self._versions[namespace] = self.l2.bump_version(namespace)
+            else:
+                self.l2.delete(self._l2_key(namespace, key))
+            self.l2.publish_invalidation(namespace, key)
+        except Exception:
+            self._stats[namespace]['l2_errors'] += 1
+            logger.warning('Cache invalidation failed for %s', namespace, exc_info=True)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-namespace counters plus hit rates for each layer."""
+        result = {}
+        for namespace, counters in self._stats.items():
+            l1_total = counters['l1_hits'] + counters['l1_misses']
+            l2_total = counters['l2_hits'] + counters['l2_misses']
+            result[namespace] = {
+                **counters,
+                'l1_hit_rate': counters['l1_hits'] / l1_total if l1_total else 0.0,
+                'l2_hit_rate': counters['l2_hits'] / l2_total if l2_total else 0.0,
+            }
+        return result
+
+    def _l2_key(self, namespace: str, key: str) -> str:
+        version = self._versions.get(namespace)
+        if version is None:
+            version = self._versions[namespace] = self.l2.version(namespace)
+        return f'music_ml:cache:{namespace}:v{version}:{key}'
+
+    def _poll_invalidations(self):
+        if self.l2 is None or time.monotonic() < self._next_poll:
+            return
+        if not self._poll_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_poll = time.monotonic() + INVALIDATION_POLL_INTERVAL
+            self._invalidation_cursor, events = self.l2.poll_invalidations(self._invalidation_cursor)
+            for namespace, key in events:
+                if namespace not in self._l1:
+                    continue
+                if key is None:
+                    self._l1[namespace].clear()
+                    self._versions.pop(namespace, None)
+                else:
+                    self._l1[namespace].delete(key)
+        except Exception:
+            logger.warning('Polling cache invalidations failed', exc_info=True)
+        finally:
+            self._poll_lock.release()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def create_cache(backend: str = CACHE_BACKEND) -> TieredCache:
+    if backend == 'redis':
+        return TieredCache(RedisBackend())
+    if backend == 'sqlite':
+        return TieredCache(SQLiteBackend())
+    return TieredCache()
+
+
+def get_cache() -> TieredCache:
+    """Return the process-wide cache, connecting to its shared store on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = create_cache()
+    return _default_cache
+
+
+def set_cache(cache: Optional[TieredCache]):
+    """Replace the process-wide cache (tests, or a custom backend)."""
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = cache
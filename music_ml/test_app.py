@@ -0,0 +1,49 @@
+import threading
+from unittest.mock import patch
+
+import music_ml.app as app_module
+from music_ml.app import create_app, start_background_tasks
+
+
+def test_create_app_applies_config_overrides():
+    app = create_app({'SESSION_BACKEND': 'cookie', 'TESTING': True})
+
+    assert app.testing
+    assert app.extensions['session_store'] is None
+    assert set(app.config['BOOT_TIMINGS']) == {'import', 'create_app'}
+    assert app.test_client().get('/api/auth/check-auth').get_json() == {'authenticated': False}
+
+
+def test_create_app_does_not_touch_the_database_or_start_threads(tmp_path):
+    database = tmp_path / 'app.db'
+    threads_before = {thread.name for thread in threading.enumerate()}
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}', 'SESSION_BACKEND': 'sqlalchemy'})
+    app.test_client().get('/api/auth/check-auth')
+
+    assert not database.exists()
+    assert {thread.name for thread in threading.enumerate()} <= threads_before
+
+
+def test_sessions_table_is_created_on_first_use(tmp_path):
+    database = tmp_path / 'app.db'
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}', 'SESSION_BACKEND': 'sqlalchemy'})
+
+    app.extensions['session_store'].save('sid', {'access_token': 'token'}, expiry=2e9)
+
+    assert database.exists()
+    assert app.extensions['session_store'].load('sid')[0] == {'access_token': 'token'}
+
+
+def test_start_background_tasks_starts_each_worker_thread():
+    app = create_app({'SESSION_BACKEND': 'cookie'})
+    with patch.object(app_module, 'start_metrics_flusher') as flusher, \
+            patch.object(app_module, 'start_cooccurrence_updater') as updater, \
+            patch.object(app_module, 'start_cache_warmer') as warmer, \
+            patch.object(app_module, 'start_session_purger') as purger:
+        start_background_tasks(app)
+
+    flusher.assert_called_once()
+    updater.assert_called_once()
+    warmer.assert_called_once()
+    purger.assert_called_once_with(None)
@@ -0,0 +1,65 @@
+import heapq
+import itertools
+import threading
+from typing import Dict, Hashable, List, Tuple
+
+
+class SpaceSaving:
+    """
+    Bounded heavy-hitters counter (the Space-Saving algorithm). At most
+    `capacity` items are tracked; an unseen item evicts the current minimum
+    and inherits its count, recorded as the item's error. Any item seen more
+    than total / capacity times is guaranteed to be tracked, and a tracked
+    count overestimates the true one by at most its error.
+
+    The minimum is found through a heap with lazily discarded stale entries,
+    so recording is O(log capacity).
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._counts: Dict[Hashable, List[float]] = {}  # item -> [count, error]
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._counts)
+
+    def add(self, item: Hashable, weight: float = 1.0):
+        with self._lock:
+            entry = self._counts.get(item)
+            if entry is None:
+                floor = self._evict_min() if len(self._counts) >= self.capacity else 0.0
+                entry = self._counts[item] = [floor, floor]
+            entry[0] += weight
+            heapq.heappush(self._heap, (entry[0], next(self._sequence), item))
+            if len(self._heap) > 4 * self.capacity:
+                self._rebuild_heap()
+
+    def top(self, k: int) -> List[Tuple[Hashable, float, float]]:
+        """The k highest-counted items as (item, count, error), highest first."""
+        with self._lock:
+            items = [(item, count, error) for item, (count, error) in self._counts.items()]
+        return heapq.nlargest(k, items, key=lambda entry: entry[1])
+
+    def decay(self, factor: float):
+        """Scale every count so that past popularity fades."""
+        with self._lock:
+            for entry in self._counts.values():
+                entry[0] *= factor
+                entry[1] *= factor
+            self._rebuild_heap()
+
+    def _evict_min(self) -> float:
+        while True:
+            count, _, item = heapq.heappop(self._heap)
+            entry = self._counts.get(item)
+            # Skip entries left behind by later increments of the same item
+            if entry is not None and entry[0] == count:
+                del self._counts[item]
+                return count
+
+    def _rebuild_heap(self):
+        self._heap = [(count, next(self._sequence), item) for item, (count, _) in self._counts.items()]
+        heapq.heapify(self._heap)
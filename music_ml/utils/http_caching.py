@@ -0,0 +1,66 @@
+from hashlib import blake2b
+from typing import Iterable, Optional
+
+from flask import Response, current_app, request
+
+# Cache-Control per endpoint; override entries with app.config['CACHE_CONTROL']
+DEFAULT_CACHE_CONTROL = {
+    'search.search_tracks': 'public, max-age=60, stale-while-revalidate=300',
+    'playlist.generate_playlist': 'public, max-age=300, stale-while-revalidate=600',
+}
+
+# Suffix of the ETag for the gzip-encoded representation of the same result
+GZIP_ETAG_SUFFIX = '-gz'
+
+
+def compute_etag(track_ids: Iterable[str], *variant) -> str:
+    """
+    Strong ETag for a result: a digest of its track-ID list plus anything else
+    that changes the representation (projected fields, format, ...).
+    """
+    digest = blake2b(digest_size=16)
+    for part in (*variant, '|', *track_ids):
+        digest.update(str(part).encode())
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+
+def cache_control_for(endpoint: Optional[str]) -> Optional[str]:
+    policies = {**DEFAULT_CACHE_CONTROL, **current_app.config.get('CACHE_CONTROL', {})}
+    return policies.get(endpoint)
+
+
+def not_modified(etag: str) -> Optional[Response]:
+    """
+    Return a 304 response if the request's If-None-Match matches the result,
+    so the caller can skip serializing the body. The 304 is returned from the
+    view like any other response, so after_request hooks (CORS) still run.
+    """
+    candidates = [etag]
+    if 'gzip' in request.accept_encodings:
+        candidates.append(etag + GZIP_ETAG_SUFFIX)
+    matched = next((candidate for candidate in candidates if request.if_none_match.contains(candidate)), None)
+    if matched is None and request.if_none_match.star_tag:
+        matched = etag
+    if matched is None:
+        return None
+    response = Response(status=304)
+    response.set_etag(matched)
+    response.vary.add('Accept-Encoding')
+    _set_cache_control(response)
+    return response
+
+
+def apply_caching(response: Response, etag: str) -> Response:
+    """Attach the ETag (specific to the body's content coding) and the endpoint's Cache-Control."""
+    if response.headers.get('Content-Encoding') == 'gzip':
+        etag += GZIP_ETAG_SUFFIX
+    response.set_etag(etag)
+    _set_cache_control(response)
+    return response
+
+
+def _set_cache_control(response: Response):
+    policy = cache_control_for(request.endpoint)
+    if policy:
+        response.headers['Cache-Control'] = policy
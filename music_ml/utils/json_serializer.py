@@ -0,0 +1,169 @@
+import gzip
+import json
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+from flask import Response, has_request_context, request
+
+from music_ml.models.artist import intern_artist
+from music_ml.models.playlist import Playlist
+from music_ml.models.track import Track
+
+# Encoded track fragments kept per process; one entry is a few hundred bytes
+TRACK_CACHE_SIZE = 65536
+
+# Bodies smaller than this fit in a packet or two; compressing them costs more than it saves
+GZIP_MIN_SIZE = 1400  # bytes
+GZIP_LEVEL = 5
+
+_encoder = json.JSONEncoder(separators=(',', ':'), sort_keys=True, ensure_ascii=False)
+
+# Projectable field paths and their position in track_version()
+TRACK_FIELDS = {
+    'spotify_track_id': 0,
+    'track_name': 1,
+    'artist.name': 2,
+    'artist.spotify_artist_id': 3,
+    'album_image_url': 4,
+    'genre': 5,
+    'tempo': 6,
+    'energy': 7,
+    'valence': 8,
+    'danceability': 9,
+}
+ALL_FIELDS = tuple(TRACK_FIELDS)
+RESPONSE_FORMATS = ('objects', 'compact')
+
+
+def parse_fields(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Parse a comma-separated `fields=` parameter into field paths. 'artist'
+    expands to both artist fields. Returns None when no projection was asked
+    for; raises ValueError on unknown fields.
+    """
+    if not value:
+        return None
+    fields = []
+    for name in (part.strip() for part in value.split(',')):
+        expanded = ('artist.name', 'artist.spotify_artist_id') if name == 'artist' else (name,)
+        for field in expanded:
+            if field not in TRACK_FIELDS:
+                raise ValueError(f"Unknown field '{name}'. Valid fields: artist, {', '.join(ALL_FIELDS)}")
+            if field not in fields:
+                fields.append(field)
+    return tuple(fields)
+
+
+def parse_projection(args) -> Tuple[Optional[Tuple[str, ...]], bool]:
+    """Read `fields=` and `format=` from request args; raises ValueError on bad values."""
+    response_format = args.get('format', 'objects')
+    if response_format not in RESPONSE_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(RESPONSE_FORMATS)}")
+    return parse_fields(args.get('fields')), response_format == 'compact'
+
+
+def track_version(track: Track) -> tuple:
+    """Everything a track's JSON depends on; used as its cache key."""
+    return (track.spotify_track_id, track.track_name, track.artist.name, track.artist.spotify_artist_id,
+            track.album_image_url, track.genre, track.tempo, track.energy, track.valence, track.danceability)
+
+
+def track_from_version(version) -> Track:
+    """Rebuild a track from its track_version() (or a JSON round-trip of it)."""
+    (spotify_track_id, track_name, artist_name, spotify_artist_id,
+     album_image_url, genre, tempo, energy, valence, danceability) = version
+    return Track(spotify_track_id=spotify_track_id, track_name=track_name,
+                 artist=intern_artist(spotify_artist_id, artist_name), album_image_url=album_image_url,
+                 genre=genre, tempo=tempo, energy=energy, valence=valence, danceability=danceability)
+
+
+@lru_cache(maxsize=TRACK_CACHE_SIZE)
+def _encode_track_version(version: tuple) -> bytes:
+    (spotify_track_id, track_name, artist_name, spotify_artist_id,
+     album_image_url, genre, tempo, energy, valence, danceability) = version
+    # Same keys (and order) as jsonify produces for the Track dataclass
+    return _encoder.encode({
+        'album_image_url': album_image_url,
+        'artist': {'name': artist_name, 'spotify_artist_id': spotify_artist_id},
+        'danceability': danceability,
+        'energy': energy,
+        'genre': genre,
+        'spotify_track_id': spotify_track_id,
+        'tempo': tempo,
+        'track_name': track_name,
+        'valence': valence,
+    }).encode()
+
+
+@lru_cache(maxsize=TRACK_CACHE_SIZE)
+def _encode_projected_version(fields: Tuple[str, ...], compact: bool, version: tuple) -> bytes:
+    if compact:
+        return _encoder.encode([version[TRACK_FIELDS[field]] for field in fields]).encode()
+    projected = {}
+    for field in fields:
+        value = version[TRACK_FIELDS[field]]
+        if field.startswith('artist.'):
+            projected.setdefault('artist', {})[field[len('artist.'):]] = value
+        else:
+            projected[field] = value
+    return _encoder.encode(projected).encode()
+
+
+def encode_track(track: Track, fields: Optional[Tuple[str, ...]] = None, compact: bool = False) -> bytes:
+    """
+    Return the JSON encoding of a track, reusing the cached fragment when the
+    track is unchanged. `fields` projects the output to the given field paths;
+    `compact` encodes the track as an array of values in `fields` order.
+    """
+    if fields is None and not compact:
+        return _encode_track_version(track_version(track))
+    return _encode_projected_version(fields or ALL_FIELDS, compact, track_version(track))
+
+
+def encode_tracks(tracks: Iterable[Track], fields: Optional[Tuple[str, ...]] = None,
+                  compact: bool = False) -> bytes:
+    return b'[' + b','.join([encode_track(track, fields, compact) for track in tracks]) + b']'
+
+
+def encode_playlist(playlist: Playlist, fields: Optional[Tuple[str, ...]] = None, compact: bool = False) -> bytes:
+    return b'{"tracks":' + encode_tracks(playlist.tracks, fields, compact) + b'}'
+
+
+def encode_value(value) -> bytes:
+    return _encoder.encode(value).encode()
+
+
+def json_bytes_response(*parts: bytes, status: int = 200) -> Response:
+    """
+    Wrap pre-encoded JSON parts in a response without re-serializing them,
+    gzip-compressing large bodies for clients that accept it.
+    """
+    body = b''.join(parts)
+    response = Response(body, status=status, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if len(body) >= GZIP_MIN_SIZE and has_request_context() and 'gzip' in request.accept_encodings:
+        response.set_data(gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def _fields_header(fields: Optional[Tuple[str, ...]], compact: bool) -> bytes:
+    # Compact rows are positional, so tell the client what each column holds
+    return b'"fields":' + encode_value(list(fields or ALL_FIELDS)) + b',' if compact else b''
+
+
+def search_response(tracks: List[Track], fields: Optional[Tuple[str, ...]] = None,
+                    compact: bool = False, next_cursor: Optional[str] = None) -> Response:
+    return json_bytes_response(
+        b'{', _fields_header(fields, compact),
+        b'"next_cursor":' + encode_value(next_cursor) + b',' if next_cursor else b'',
+        b'"total_results":', encode_value(len(tracks)),
+        b',"tracks":', encode_tracks(tracks, fields, compact), b'}'
+    )
+
+
+def playlist_response(playlist: Playlist, fields: Optional[Tuple[str, ...]] = None,
+                      compact: bool = False) -> Response:
+    return json_bytes_response(
+        b'{', _fields_header(fields, compact), b'"playlist":', encode_playlist(playlist, fields, compact), b'}'
+    )
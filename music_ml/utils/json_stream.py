@@ -0,0 +1,66 @@
+import gzip
+import json
+import sys
+from typing import IO, Iterator
+
+CHUNK_SIZE = 1 << 16  # characters read per refill
+
+_WHITESPACE = ' \t\r\n'
+
+
+def open_text(path: str) -> IO[str]:
+    """Open a (possibly gzipped) text file, or stdin for '-'."""
+    if path == '-':
+        return sys.stdin
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def iter_json_records(stream: IO[str], chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """
+    Yield JSON values one at a time from a stream holding either a top-level
+    JSON array or a sequence of values (JSON Lines or concatenated JSON).
+
+    Only the current chunk and any partially read value are held in memory,
+    so arbitrarily large dumps can be processed in constant space.
+    """
+    decoder = json.JSONDecoder()
+    buffer = stream.read(chunk_size)
+    position = _skip(buffer, 0, _WHITESPACE)
+    in_array = position < len(buffer) and buffer[position] == '['
+    if in_array:
+        position += 1
+    separators = _WHITESPACE + ',' if in_array else _WHITESPACE
+
+    while True:
+        position = _skip(buffer, position, separators)
+        if position == len(buffer):
+            more = stream.read(chunk_size)
+            if not more:
+                return
+            buffer, position = buffer[position:] + more, 0
+            continue
+        if in_array and buffer[position] == ']':
+            return
+
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # The value runs past the end of the buffer: read more and retry
+            more = stream.read(chunk_size)
+            if not more:
+                raise
+            buffer, position = buffer[position:] + more, 0
+            continue
+
+        yield value
+        position = end
+        if position >= chunk_size:
+            buffer, position = buffer[position:], 0
+
+
+def _skip(buffer: str, position: int, characters: str) -> int:
+    while position < len(buffer) and buffer[position] in characters:
+        position += 1
+    return position
@@ -0,0 +1,474 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from flask import Flask, g, request
+
+from music_ml.utils.profiling import span
+
+logger = logging.getLogger(__name__)
+
+# Each worker process publishes its metrics here; /metrics merges all of them
+METRICS_DB_PATH = os.getenv('METRICS_DB_PATH', 'instance/metrics.db')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))  # seconds
+# Gauges (in-flight requests) only count workers that published this recently
+LIVE_WORKER_WINDOW = 3 * METRICS_FLUSH_INTERVAL
+# Workers silent this long are gone; their counters are folded into one retired row so the table stays small
+RETIRE_WORKER_AFTER = 600  # seconds
+RETIRED_WORKER_ID = 'retired'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Spotify requests and cache lookups made for the current request, while something is counting them
+_request_counts: ContextVar[Optional[Dict[str, int]]] = ContextVar('request_counts', default=None)
+_request_counts_lock = threading.Lock()
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _add(self, amount: float, labels: dict):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            values = [[list(key), list(value) if isinstance(value, list) else value]
+                      for key, value in self._values.items()]
+        return {'kind': self.kind, 'help': self.documentation, 'labelnames': list(self.labelnames),
+                'values': values}
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels):
+        self._add(amount, labels)
+
+    def set_total(self, value: float, **labels):
+        """Mirror a count kept elsewhere (e.g. cache statistics)."""
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, amount: float = 1.0, **labels):
+        self._add(amount, labels)
+
+    def dec(self, amount: float = 1.0, **labels):
+        self._add(-amount, labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        # Per-bucket (not yet cumulative) counts, then an overflow count and the sum
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> dict:
+        snapshot = super().snapshot()
+        snapshot['buckets'] = list(self.buckets)
+        return snapshot
+
+
+class Registry:
+    """The metrics of one process. Callbacks run before each snapshot to mirror outside counters."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, *args, **kwargs)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def add_callback(self, callback: Callable[[], None]):
+        self._callbacks.append(callback)
+
+    def snapshot(self) -> dict:
+        for callback in self._callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception('Metrics callback failed')
+        return {name: metric.snapshot() for name, metric in list(self._metrics.items())}
+
+
+def merge_snapshots(snapshots: List[Tuple[dict, bool]]) -> dict:
+    """
+    Merge (snapshot, live) pairs from several processes: counters and
+    histograms are summed over every process that ever published (a restarted
+    worker's counts are not lost), gauges over live processes only.
+    """
+    merged: Dict[str, dict] = {}
+    for snapshot, live in snapshots:
+        for name, metric in snapshot.items():
+            if metric['kind'] == 'gauge' and not live:
+                continue
+            target = merged.setdefault(name, {**metric, 'values': {}})
+            for labels, value in metric['values']:
+                key = tuple(labels)
+                current = target['values'].get(key)
+                if current is None:
+                    target['values'][key] = value
+                elif isinstance(value, list):
+                    target['values'][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target['values'][key] = current + value
+    for metric in merged.values():
+        metric['values'] = [[list(key), value] for key, value in metric['values'].items()]
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(labelnames, labels))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value))
+
+
+def render(snapshot: dict) -> str:
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for name in sorted(snapshot):
+        metric = snapshot[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        labelnames = metric['labelnames']
+        for labels, value in sorted(metric['values']):
+            if metric['kind'] != 'histogram':
+                lines.append(f'{name}{_format_labels(labelnames, labels)} {_format_value(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(metric['buckets'], value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labelnames, labels, ('le', repr(float(bound))))} {cumulative}")
+            cumulative += value[len(metric['buckets'])]
+            lines.append(f"{name}_bucket{_format_labels(labelnames, labels, ('le', '+Inf'))} {cumulative}")
+            lines.append(f'{name}_sum{_format_labels(labelnames, labels)} {_format_value(value[-1])}')
+            lines.append(f'{name}_count{_format_labels(labelnames, labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsStore:
+    """
+    Shared SQLite file (WAL mode) where every worker process publishes its
+    latest snapshot under its own ID, so whichever worker answers a scrape can
+    report totals for all of them. Rows of workers that stopped publishing are
+    merged into a single retired row, keeping their counters in the totals.
+    Connections are opened per process, after any fork.
+    """
+
+    def __init__(self, path: str = METRICS_DB_PATH):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = None
+        self._pid = None
+        self._worker_id = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS worker_metrics ('
+                'worker_id TEXT PRIMARY KEY, updated_at REAL NOT NULL, snapshot TEXT NOT NULL)'
+            )
+            conn.commit()
+            self._conn, self._pid = conn, os.getpid()
+            # A new ID per process start, so a reused PID never overwrites an earlier worker's counts
+            self._worker_id = f'{os.getpid()}-{time.time_ns()}'
+        return self._conn
+
+    @property
+    def worker_id(self) -> str:
+        with self._lock:
+            self._connection()
+            return self._worker_id
+
+    def publish(self, snapshot: dict):
+        with self._lock:
+            conn = self._connection()
+            # Immediate, so two workers never retire the same rows
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                conn.execute(
+                    'INSERT OR REPLACE INTO worker_metrics (worker_id, updated_at, snapshot) VALUES (?, ?, ?)',
+                    (self._worker_id, now, json.dumps(snapshot, separators=(',', ':')))
+                )
+                self._retire_workers(conn, now - RETIRE_WORKER_AFTER)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    @staticmethod
+    def _retire_workers(conn: sqlite3.Connection, cutoff: float):
+        stale = conn.execute(
+            'SELECT snapshot FROM worker_metrics WHERE updated_at < ? AND worker_id != ?', (cutoff, RETIRED_WORKER_ID)
+        ).fetchall()
+        if not stale:
+            return
+        retired = conn.execute('SELECT snapshot FROM worker_metrics WHERE worker_id = ?',
+                               (RETIRED_WORKER_ID,)).fetchall()
+        # Not live, so gauges are dropped and only counters and histograms carry over
+        merged = merge_snapshots([(json.loads(snapshot), False) for snapshot, in stale + retired])
+        conn.execute('DELETE FROM worker_metrics WHERE updated_at < ? AND worker_id != ?', (cutoff, RETIRED_WORKER_ID))
+        conn.execute(
+            'INSERT OR REPLACE INTO worker_metrics (worker_id, updated_at, snapshot) VALUES (?, 0, ?)',
+            (RETIRED_WORKER_ID, json.dumps(merged, separators=(',', ':')))
+        )
+
+    def collect(self, own_snapshot: dict) -> dict:
+        """Merge this process's current snapshot with every other worker's last published one."""
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute('SELECT worker_id, updated_at, snapshot FROM worker_metrics').fetchall()
+            worker_id = self._worker_id
+        cutoff = time.time() - LIVE_WORKER_WINDOW
+        snapshots = [(own_snapshot, True)]
+        snapshots += [(json.loads(snapshot), updated_at > cutoff)
+                      for other_id, updated_at, snapshot in rows if other_id != worker_id]
+        return merge_snapshots(snapshots)
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'music_ml_http_requests_total', 'HTTP requests served, by route, method and status code.',
+    ('route', 'method', 'status'))
+HTTP_LATENCY = REGISTRY.histogram(
+    'music_ml_http_request_duration_seconds', 'Time to serve HTTP requests, by route.', ('route', 'method'))
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    'music_ml_http_requests_in_flight', 'HTTP requests currently being served, by route.', ('route',))
+UPSTREAM_REQUESTS = REGISTRY.counter(
+    'music_ml_spotify_requests_total', 'Spotify API requests, by endpoint family and status code.',
+    ('endpoint', 'status'))
+UPSTREAM_LATENCY = REGISTRY.histogram(
+    'music_ml_spotify_request_duration_seconds', 'Spotify API request latency, by endpoint family.', ('endpoint',))
+UPSTREAM_IN_FLIGHT = REGISTRY.gauge(
+    'music_ml_spotify_requests_in_flight', 'Spotify API requests currently waiting on a response.', ('endpoint',))
+UPSTREAM_RETRIES = REGISTRY.counter(
+    'music_ml_spotify_retries_total', 'Spotify API requests repeated after a failure, by endpoint family and reason.',
+    ('endpoint', 'reason'))
+UPSTREAM_RATE_LIMITED = REGISTRY.counter(
+    'music_ml_spotify_rate_limited_total', 'Spotify API responses with status 429, by endpoint family.',
+    ('endpoint',))
+CACHE_REQUESTS = REGISTRY.counter(
+    'music_ml_cache_requests_total', 'Cache lookups, by namespace, layer and result.', ('namespace', 'layer', 'result'))
+
+
+def endpoint_family(url: str) -> str:
+    """Low-cardinality name for a Spotify API URL, e.g. 'artist_top_tracks'."""
+    parts = urlsplit(url)
+    if parts.path.startswith('/api/token'):
+        return 'token'
+    segments = [segment for segment in parts.path.split('/') if segment][1:]  # drop 'v1'
+    if not segments:
+        return 'other'
+    if segments[0] == 'artists' and len(segments) > 2:
+        return f"artist_{segments[2].replace('-', '_')}"
+    if segments[0] in ('users', 'playlists') and segments[-1] in ('playlists', 'tracks'):
+        return f"{segments[0][:-1]}_{segments[-1]}"
+    return segments[0].replace('-', '_')
+
+
+def start_request_counts() -> Dict[str, int]:
+    """
+    Start counting Spotify requests and cache lookups for the current context;
+    the returned dict fills in as they happen. Threads only contribute if
+    they run in a copy of this context (contextvars.copy_context()).
+    """
+    counts: Dict[str, int] = {}
+    _request_counts.set(counts)
+    return counts
+
+
+def stop_request_counts():
+    _request_counts.set(None)
+
+
+def count_for_request(name: str, amount: int = 1):
+    counts = _request_counts.get()
+    if counts is not None:
+        with _request_counts_lock:
+            counts[name] = counts.get(name, 0) + amount
+
+
+def track_upstream(url: str, send: Callable):
+    """Call `send()` (one Spotify request) and record its latency and status."""
+    endpoint = endpoint_family(url)
+    count_for_request('upstream_requests')
+    UPSTREAM_IN_FLIGHT.inc(endpoint=endpoint)
+    started = time.perf_counter()
+    try:
+        with span(f'spotify.{endpoint}'):
+            response = send()
+    except Exception:
+        UPSTREAM_REQUESTS.inc(endpoint=endpoint, status='error')
+        raise
+    finally:
+        UPSTREAM_IN_FLIGHT.dec(endpoint=endpoint)
+        UPSTREAM_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint)
+    UPSTREAM_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    if response.status_code == 429:
+        UPSTREAM_RATE_LIMITED.inc(endpoint=endpoint)
+    return response
+
+
+def count_retry(url: str, reason: str):
+    UPSTREAM_RETRIES.inc(endpoint=endpoint_family(url), reason=reason)
+
+
+def _mirror_cache_stats():
+    # Imported here: the cache module is optional for anything else that records metrics
+    from music_ml.stores.tiered_cache import get_cache
+    for namespace, stats in get_cache().stats().items():
+        for layer in ('l1', 'l2'):
+            CACHE_REQUESTS.set_total(stats[f'{layer}_hits'], namespace=namespace, layer=layer, result='hit')
+            CACHE_REQUESTS.set_total(stats[f'{layer}_misses'], namespace=namespace, layer=layer, result='miss')
+        CACHE_REQUESTS.set_total(stats['l2_errors'], namespace=namespace, layer='l2', result='error')
+
+
+REGISTRY.add_callback(_mirror_cache_stats)
+
+_default_store = None
+_default_store_lock = threading.Lock()
+_flusher = None
+
+
+def get_metrics_store() -> MetricsStore:
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = MetricsStore()
+    return _default_store
+
+
+def collect_metrics() -> str:
+    """Text-format metrics for all worker processes."""
+    snapshot = REGISTRY.snapshot()
+    store = get_metrics_store()
+    try:
+        store.publish(snapshot)
+        return render(store.collect(snapshot))
+    except sqlite3.Error:
+        logger.warning('Reading shared metrics failed; reporting this worker only', exc_info=True)
+        return render(snapshot)
+
+
+def start_metrics_flusher(interval: float = METRICS_FLUSH_INTERVAL):
+    """Start the thread that publishes this worker's metrics. Safe to call more than once."""
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return _flusher
+
+    def run():
+        while True:
+            try:
+                get_metrics_store().publish(REGISTRY.snapshot())
+            except Exception:
+                logger.exception('Publishing metrics failed')
+            time.sleep(interval)
+
+    _flusher = threading.Thread(target=run, name='metrics-flusher', daemon=True)
+    _flusher.start()
+    return _flusher
+
+
+def init_metrics(app: Flask):
+    """Record latency, status and in-flight counts for every request the app serves."""
+
+    def route() -> str:
+        return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+        g.metrics_route = route()
+        HTTP_IN_FLIGHT.inc(route=g.metrics_route)
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            HTTP_LATENCY.observe(time.perf_counter() - started, route=g.metrics_route, method=request.method)
+            HTTP_REQUESTS.inc(route=g.metrics_route, method=request.method, status=response.status_code)
+        return response
+
+    @app.teardown_request
+    def finish_request(exc):
+        route_name = g.pop('metrics_route', None)
+        if route_name is not None:
+            HTTP_IN_FLIGHT.dec(route=route_name)
@@ -0,0 +1,45 @@
+import base64
+import json
+from typing import Optional, Tuple
+
+# Requested limits are rounded up to one of these, so pages line up and can be shared in caches
+PAGE_SIZES = (10, 20, 50)
+DEFAULT_PAGE_SIZE = 20
+# Spotify rejects search offsets beyond this
+MAX_OFFSET = 1000
+
+
+def normalize_page_size(value: Optional[str]) -> int:
+    """Round a requested `limit` up to the nearest page size (capped at the largest); raises ValueError."""
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    limit = int(value)
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return next((size for size in PAGE_SIZES if size >= limit), PAGE_SIZES[-1])
+
+
+def encode_cursor(query: str, offset: int, limit: int) -> str:
+    """Opaque cursor for the page of `query` starting at `offset`."""
+    raw = json.dumps([query, offset, limit], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int, int]:
+    """Return (query, offset, limit) from a cursor; raises ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        query, offset, limit = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if (not isinstance(query, str) or not isinstance(offset, int) or not isinstance(limit, int)
+            or not 0 <= offset < MAX_OFFSET or limit not in PAGE_SIZES):
+        raise ValueError('Invalid cursor')
+    return query, offset, limit
+
+
+def next_cursor(query: str, offset: int, limit: int, returned: int) -> Optional[str]:
+    """Cursor for the following page, or None if this page was the last one."""
+    if returned < limit or offset + limit >= MAX_OFFSET:
+        return None
+    return encode_cursor(query, offset + limit, limit)
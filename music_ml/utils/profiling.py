@@ -0,0 +1,239 @@
+import cProfile
+import functools
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from flask import Flask, request
+
+logger = logging.getLogger(__name__)
+
+# Fraction of requests to profile in full (0 disables sampling)
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+# Requests slower than this many seconds get their span breakdown written (0 disables)
+PROFILE_SLOW_THRESHOLD = float(os.getenv('PROFILE_SLOW_THRESHOLD', 0))
+# Enables the X-Profile-Token header; see sign_profile_token()
+PROFILE_SECRET = os.getenv('PROFILE_SECRET')
+# 'spans' (timings only), 'cprofile' or 'stack' (sampled call stacks) for sampled and header-triggered requests
+PROFILE_MODE = os.getenv('PROFILE_MODE', 'spans')
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'instance/profiles')
+# Oldest dumps are deleted beyond this many
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', 200))
+STACK_SAMPLE_INTERVAL = 0.005  # seconds
+MAX_SPANS = 1000
+
+PROFILE_HEADER = 'X-Profile-Token'
+
+_current: ContextVar[Optional['RequestProfile']] = ContextVar('request_profile', default=None)
+# Only one cProfile profiler can be active per process on Python 3.12+; held by the request using it
+_cprofile_lock = threading.Lock()
+
+
+class RequestProfile:
+    """
+    Spans (name, start offset, duration, depth) recorded for one request, plus
+    an optional profiler. A request that asks for cProfile while another
+    request holds it records spans only.
+    """
+
+    def __init__(self, reason: Optional[str], mode: str = 'spans'):
+        self.id = uuid.uuid4().hex[:12]
+        self.reason = reason  # 'sampled', 'header', or None until the request turns out slow
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float, float, int]] = []
+        self.depth = 0
+        self.profiler = None
+        self._stopped_profiler = False
+        self.sampler = None
+        if reason is not None and mode == 'cprofile':
+            self._start_cprofile()
+        elif reason is not None and mode == 'stack':
+            self.sampler = StackSampler(threading.get_ident())
+            self.sampler.start()
+
+    def _start_cprofile(self):
+        if not _cprofile_lock.acquire(blocking=False):
+            logger.debug('cProfile busy with another request; recording spans only')
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiling tool (a debugger or coverage) owns the hook
+            _cprofile_lock.release()
+            logger.debug('cProfile unavailable; recording spans only', exc_info=True)
+            return
+        self.profiler = profiler
+
+    def stop(self):
+        if self.profiler is not None and not self._stopped_profiler:
+            self.profiler.disable()
+            self._stopped_profiler = True
+            _cprofile_lock.release()
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    @property
+    def duration(self) -> float:
+        return time.perf_counter() - self.started
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's call stack at a fixed interval into collapsed ('a;b;c') stack counts."""
+
+    def __init__(self, thread_id: int, interval: float = STACK_SAMPLE_INTERVAL):
+        super().__init__(name='profile-stack-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+@contextmanager
+def span(name: str):
+    """Time a block as part of the current request's profile; a no-op when the request is not profiled."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    profile.depth += 1
+    try:
+        yield
+    finally:
+        profile.depth -= 1
+        if len(profile.spans) < MAX_SPANS:
+            profile.spans.append((name, start - profile.started, time.perf_counter() - start, profile.depth))
+
+
+def traced(name: str):
+    """Decorator form of span()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def sign_profile_token(secret: str, ttl: float = 300) -> str:
+    """A value for the X-Profile-Token header, valid for `ttl` seconds."""
+    expires = str(int(time.time() + ttl))
+    return f'{expires}.{hmac.new(secret.encode(), expires.encode(), hashlib.sha256).hexdigest()}'
+
+
+def verify_profile_token(token: Optional[str], secret: Optional[str]) -> bool:
+    if not token or not secret or '.' not in token:
+        return False
+    expires, signature = token.split('.', 1)
+    expected = hmac.new(secret.encode(), expires.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature, expected) and expires.isdigit() and int(expires) >= time.time()
+
+
+def write_dump(profile: RequestProfile, details: dict, directory: Optional[str] = None,
+               max_files: Optional[int] = None) -> str:
+    """Write the profile as JSON (and a .prof file for cProfile), then prune old dumps. Returns the JSON path."""
+    directory = directory or PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f'{time.strftime("%Y%m%dT%H%M%S")}-{profile.id}')
+    dump = {
+        **details,
+        'id': profile.id,
+        'reason': profile.reason,
+        'spans': [{'name': name, 'start': round(start, 6), 'duration': round(duration, 6), 'depth': depth}
+                  for name, start, duration, depth in sorted(profile.spans, key=lambda item: item[1])],
+    }
+    if profile.sampler is not None:
+        dump['stacks'] = dict(profile.sampler.stacks.most_common())
+    if profile.profiler is not None:
+        profile.profiler.dump_stats(base + '.prof')
+        dump['cprofile'] = os.path.basename(base + '.prof')
+    with open(base + '.json', 'w') as f:
+        json.dump(dump, f, indent=1)
+    _prune(directory, max_files or PROFILE_MAX_FILES)
+    return base + '.json'
+
+
+def _prune(directory: str, max_files: int):
+    entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+    for entry in entries[:max(len(entries) - max_files, 0)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def init_profiling(app: Flask):
+    """
+    Profile requests chosen by PROFILE_SAMPLE_RATE or carrying a valid
+    X-Profile-Token header, and record the span breakdown of every request
+    when PROFILE_SLOW_THRESHOLD is set, keeping it only if the request was slow.
+    """
+
+    @app.before_request
+    def start_profile():
+        reason = None
+        if verify_profile_token(request.headers.get(PROFILE_HEADER), PROFILE_SECRET):
+            reason = 'header'
+        elif PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+            reason = 'sampled'
+        if reason is None and not PROFILE_SLOW_THRESHOLD:
+            return
+        _current.set(RequestProfile(reason, PROFILE_MODE))
+
+    @app.after_request
+    def finish_profile(response):
+        profile = _current.get()
+        if profile is None:
+            return response
+        _current.set(None)
+        duration = profile.duration
+        profile.stop()
+        if profile.reason is None:
+            if duration < PROFILE_SLOW_THRESHOLD:
+                return response
+            profile.reason = 'slow'
+        try:
+            write_dump(profile, {
+                'method': request.method, 'path': request.full_path, 'endpoint': request.endpoint,
+                'status': response.status_code, 'duration': round(duration, 6), 'time': time.time(),
+            })
+            response.headers['X-Profile-Id'] = profile.id
+        except OSError:
+            logger.warning('Writing request profile failed', exc_info=True)
+        return response
+
+    @app.teardown_request
+    def discard_profile(exc):
+        # Only set here if after_request never ran
+        profile = _current.get()
+        if profile is not None:
+            _current.set(None)
+            profile.stop()
@@ -0,0 +1,226 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import redis
+from flask import Flask, jsonify, request, session
+
+from music_ml.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv('REDIS_URL')
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+# 'redis' (shared by every worker and dyno) or 'memory' (per process); defaults to redis when REDIS_URL is set
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'redis' if REDIS_URL else 'memory')
+# Per-client limits as 'endpoint=requests_per_second:burst,...'; unlisted endpoints are not limited
+RATE_LIMITS = os.getenv(
+    'RATE_LIMITS',
+    'search.search_tracks=5:20,search.suggest=20:40,playlist.generate_playlist=1:5,'
+    'auth.export_playlist=0.2:3,auth.get_user_info=1:5,auth.callback=0.2:5',
+)
+# Endpoints served with the app's shared client-credentials quota
+UPSTREAM_ENDPOINTS = frozenset(filter(None, os.getenv(
+    'RATE_LIMIT_UPSTREAM_ENDPOINTS', 'search.search_tracks,search.suggest,playlist.generate_playlist').split(',')))
+# Requests per second to those endpoints, across all clients, split evenly between active clients (0 disables)
+RATE_LIMIT_UPSTREAM_BUDGET = float(os.getenv('RATE_LIMIT_UPSTREAM_BUDGET', 20))
+RATE_LIMIT_UPSTREAM_BURST = float(os.getenv('RATE_LIMIT_UPSTREAM_BURST', 10))
+# No client's share drops below this, however many are active
+RATE_LIMIT_MIN_SHARE = float(os.getenv('RATE_LIMIT_MIN_SHARE', 0.2))
+# Proxies in front of the app that append to X-Forwarded-For (Heroku's router is one)
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv('RATE_LIMIT_TRUSTED_PROXIES', 1 if os.getenv('DYNO') else 0))
+ACTIVE_WINDOW = 60  # seconds a client counts as active after its last upstream request
+MAX_LOCAL_BUCKETS = 100000
+
+RATE_LIMITED = REGISTRY.counter(
+    'music_ml_http_rate_limited_total', 'Requests rejected with 429 by the inbound rate limiter, by route.',
+    ('route',))
+
+# (key, refill rate per second, burst)
+Bucket = Tuple[str, float, float]
+
+
+def refill(tokens: float, updated: float, rate: float, burst: float, now: float) -> float:
+    return min(burst, tokens + max(0.0, now - updated) * rate)
+
+
+class MemoryRateLimitStore:
+    """Token buckets in this process only: each worker enforces the limits on its own share of traffic."""
+
+    def __init__(self, max_buckets: int = MAX_LOCAL_BUCKETS):
+        self._buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+        self._active: Dict[str, float] = {}
+        self._active_pruned = 0.0
+        self._max_buckets = max_buckets
+        self._lock = threading.Lock()
+
+    def take(self, buckets: List[Bucket], now: float) -> float:
+        """Take a token from every bucket, or from none. Returns 0, or seconds until all have one."""
+        with self._lock:
+            levels = []
+            for key, rate, burst in buckets:
+                tokens, updated = self._buckets.get(key, (burst, now))
+                levels.append(refill(tokens, updated, rate, burst, now))
+            wait = max([(1 - tokens) / rate for tokens, (_, rate, _) in zip(levels, buckets) if tokens < 1],
+                       default=0.0)
+            for tokens, (key, _, _) in zip(levels, buckets):
+                self._buckets[key] = (tokens - 1 if not wait else tokens, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self._max_buckets:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def active_clients(self, client: str, now: float) -> int:
+        """Record `client` as active and return how many clients were active in the last ACTIVE_WINDOW."""
+        with self._lock:
+            self._active[client] = now
+            if now - self._active_pruned > 1:
+                self._active = {key: seen for key, seen in self._active.items() if now - seen < ACTIVE_WINDOW}
+                self._active_pruned = now
+            return len(self._active)
+
+
+class RedisRateLimitStore:
+    """Token buckets in Redis, shared by every worker; each check is one atomic script call."""
+
+    TAKE_SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local levels = {}
+    local wait = 0
+    for i, key in ipairs(KEYS) do
+        local rate, burst = tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1])
+        local state = redis.call('HMGET', key, 'tokens', 'updated')
+        local tokens = tonumber(state[1]) or burst
+        local updated = tonumber(state[2]) or now
+        tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+        levels[i] = tokens
+        if tokens < 1 then wait = math.max(wait, (1 - tokens) / rate) end
+    end
+    for i, key in ipairs(KEYS) do
+        local rate, burst = tonumber(ARGV[2 * i]), tonumber(ARGV[2 * i + 1])
+        local tokens = levels[i]
+        if wait == 0 then tokens = tokens - 1 end
+        redis.call('HSET', key, 'tokens', tokens, 'updated', now)
+        redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000) + 1000)
+    end
+    return tostring(wait)
+    """
+    PREFIX = 'music_ml:ratelimit:'
+
+    def __init__(self, url: str = REDIS_URL, client=None):
+        if client is None:
+            client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._redis = client
+        self._take = client.register_script(self.TAKE_SCRIPT)
+
+    def take(self, buckets: List[Bucket], now: float) -> float:
+        args = [now]
+        for _, rate, burst in buckets:
+            args += [rate, burst]
+        return float(self._take(keys=[self.PREFIX + key for key, _, _ in buckets], args=args))
+
+    def active_clients(self, client: str, now: float) -> int:
+        # Distinct clients in this window and the last, approximately (HyperLogLog)
+        window = int(now // ACTIVE_WINDOW)
+        current, previous = f'{self.PREFIX}active:{window}', f'{self.PREFIX}active:{window - 1}'
+        with self._redis.pipeline() as pipe:
+            pipe.pfadd(current, client).expire(current, 2 * ACTIVE_WINDOW).pfcount(current, previous)
+            return pipe.execute()[-1]
+
+
+def parse_limits(value: str) -> Dict[str, Tuple[float, float]]:
+    """'search.search_tracks=5:20,...' -> {'search.search_tracks': (5.0, 20.0), ...}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        endpoint, _, limit = item.partition('=')
+        rate, _, burst = limit.partition(':')
+        limits[endpoint.strip()] = (float(rate), float(burst or rate))
+    return limits
+
+
+def client_ip(trusted_proxies: Optional[int] = None) -> str:
+    """The client address as seen by the outermost trusted proxy (entries left of it can be forged)."""
+    trusted_proxies = RATE_LIMIT_TRUSTED_PROXIES if trusted_proxies is None else trusted_proxies
+    forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+    if trusted_proxies and len(forwarded) >= trusted_proxies:
+        return forwarded[-trusted_proxies]
+    return request.remote_addr or 'unknown'
+
+
+def client_key(trusted_proxies: Optional[int] = None) -> str:
+    """
+    The session when it belongs to a signed-in user, otherwise the client IP.
+    Anonymous sessions cost nothing to mint, so rotating cookies must not earn
+    fresh buckets; the session is only loaded when the cookie is validly signed.
+    """
+    sid = getattr(session, 'sid', None)
+    if sid and not getattr(session, 'new', True) and 'access_token' in session:
+        return f'session:{sid}'
+    return f'ip:{client_ip(trusted_proxies)}'
+
+
+class RateLimiter:
+    """
+    Per-client token buckets for each limited endpoint, plus, for endpoints
+    that spend the shared Spotify quota, a per-client bucket refilled at an
+    even share of `upstream_budget` among the clients active in the last
+    minute, so one busy client can't crowd out the rest.
+    """
+
+    def __init__(self, store=None, limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 upstream_endpoints=UPSTREAM_ENDPOINTS, upstream_budget: float = RATE_LIMIT_UPSTREAM_BUDGET,
+                 upstream_burst: float = RATE_LIMIT_UPSTREAM_BURST, min_share: float = RATE_LIMIT_MIN_SHARE):
+        self.store = store or MemoryRateLimitStore()
+        self.limits = parse_limits(RATE_LIMITS) if limits is None else limits
+        self.upstream_endpoints = upstream_endpoints
+        self.upstream_budget = upstream_budget
+        self.upstream_burst = upstream_burst
+        self.min_share = min_share
+
+    def check(self, endpoint: Optional[str], client: str, now: Optional[float] = None) -> float:
+        """Returns 0 if the request may proceed, else seconds to wait."""
+        now = time.time() if now is None else now
+        buckets = []
+        if endpoint in self.limits:
+            rate, burst = self.limits[endpoint]
+            buckets.append((f'{endpoint}:{client}', rate, burst))
+        if self.upstream_budget and endpoint in self.upstream_endpoints:
+            share = max(self.min_share, self.upstream_budget / max(self.store.active_clients(client, now), 1))
+            buckets.append((f'upstream:{client}', share, self.upstream_burst))
+        return self.store.take(buckets, now) if buckets else 0.0
+
+
+def create_rate_limiter(backend: str = RATE_LIMIT_BACKEND) -> RateLimiter:
+    return RateLimiter(RedisRateLimitStore() if backend == 'redis' else MemoryRateLimitStore())
+
+
+def init_rate_limiting(app: Flask, limiter: Optional[RateLimiter] = None):
+    """Answer over-limit requests with 429 and Retry-After before any other work is done."""
+    if not RATE_LIMIT_ENABLED and limiter is None:
+        return None
+    limiter = limiter or create_rate_limiter()
+    app.extensions['rate_limiter'] = limiter
+
+    @app.before_request
+    def enforce_rate_limit():
+        if request.method == 'OPTIONS' or request.endpoint is None:
+            return None
+        try:
+            wait = limiter.check(request.endpoint, client_key())
+        except redis.exceptions.RedisError:
+            logger.warning('Rate limit check failed; allowing request', exc_info=True)
+            return None
+        if not wait:
+            return None
+        RATE_LIMITED.inc(route=request.url_rule.rule)
+        retry_after = max(1, math.ceil(wait))
+        response = jsonify({'error': 'Too many requests', 'retry_after': retry_after})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+
+    return limiter
@@ -1,30 +1,51 @@
 import os
 import requests
-from dotenv import load_dotenv
 from base64 import b64encode
 import json
 from typing import List
 
 from music_ml.models.track import Track
-from music_ml.models.artist import Artist
+from music_ml.models.artist import Artist, intern_artist
+from music_ml.stores.tiered_cache import get_cache
+from music_ml.utils.metrics import track_upstream
+from music_ml.utils.profiling import traced
 
 
-# Load environment variables from the .env file
-load_dotenv()
-
 # Fetch Spotify credentials from environment variables
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
+# Overridable so benchmarks can point the app at a local stand-in server
+SPOTIFY_API_URL = os.getenv("SPOTIFY_API_URL", "https://api.spotify.com/v1")
+SPOTIFY_ACCOUNTS_URL = os.getenv("SPOTIFY_ACCOUNTS_URL", "https://accounts.spotify.com")
+
+# Renew cached tokens this long before Spotify expires them
+TOKEN_EXPIRY_MARGIN = 60  # seconds
 
-def get_spotify_access_token():
+@traced('spotify.access_token')
+def get_spotify_access_token(force_refresh: bool = False):
     """
-    Request a new Spotify access token using the Client Credentials Flow.
+    Return a Client Credentials access token, shared by all workers through the
+    cache until shortly before it expires. Pass force_refresh after a 401.
     """
     if not SPOTIFY_CLIENT_ID or not SPOTIFY_CLIENT_SECRET:
         raise EnvironmentError("Spotify Client ID or Secret not set in environment variables")
 
+    cache = get_cache()
+    if force_refresh:
+        cache.invalidate('token', SPOTIFY_CLIENT_ID)
+    token_info = cache.get_or_load(
+        'token', SPOTIFY_CLIENT_ID, request_spotify_access_token,
+        ttl=lambda info: info.get('expires_in', 3600) - TOKEN_EXPIRY_MARGIN
+    )
+    return token_info['access_token']
+
+def request_spotify_access_token() -> dict:
+    """
+    Request a new Spotify access token using the Client Credentials Flow.
+    """
+
     # Spotify token URL
-    auth_url = "https://accounts.spotify.com/api/token"
+    auth_url = f"{SPOTIFY_ACCOUNTS_URL}/api/token"
     
     # Prepare the authorization header by encoding client_id:client_secret in Base64
     auth_header = b64encode(f"{SPOTIFY_CLIENT_ID}:{SPOTIFY_CLIENT_SECRET}".encode()).decode()
@@ -40,25 +61,50 @@ def get_spotify_access_token():
     }
     
     # Make the request to get the access token
-    response = requests.post(auth_url, headers=headers, data=data)
+    response = track_upstream(auth_url, lambda: requests.post(auth_url, headers=headers, data=data))
     
     if response.status_code == 200:
         token_info = response.json()
-        return token_info['access_token']
+        return {'access_token': token_info['access_token'], 'expires_in': token_info.get('expires_in', 3600)}
     else:
         raise Exception(f"Failed to retrieve access token: {response.status_code} - {response.text}")
     
 def load_spotify_artist(spotify_artist_json: json) -> Artist:
-    return Artist(
-        name=spotify_artist_json['name'],
-        spotify_artist_id=spotify_artist_json['id']
+    return intern_artist(
+        spotify_artist_id=spotify_artist_json['id'],
+        name=spotify_artist_json['name']
     )
     
+def load_spotify_audio_features(spotify_audio_features_json: json) -> dict:
+    return {
+        'spotify_track_id': spotify_audio_features_json['id'],
+        'tempo': spotify_audio_features_json.get('tempo'),
+        'energy': spotify_audio_features_json.get('energy'),
+        'valence': spotify_audio_features_json.get('valence'),
+        'danceability': spotify_audio_features_json.get('danceability')
+    }
+
+def slim_spotify_tracks(items) -> dict:
+    """
+    Keep only the parts of Spotify track objects load_spotify_tracks reads, in the
+    same response shape, so cached responses stay small.
+    """
+    return {'tracks': {'items': [
+        {
+            'id': item['id'],
+            'name': item['name'],
+            'artists': [{'id': artist['id'], 'name': artist['name']} for artist in item['artists'][:1]],
+            'album': {'images': item['album']['images'][:2]},
+        }
+        for item in items
+    ]}}
+
 def load_spotify_tracks(data):
     """Load tracks from Spotify API response."""
     tracks = []
     for item in data['tracks']['items']:
-        artist = Artist(
+        # Top-tracks responses repeat the same artist on every track; share one object
+        artist = intern_artist(
             spotify_artist_id=item['artists'][0]['id'],
             name=item['artists'][0]['name']
         )
@@ -0,0 +1,213 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from flask import Flask, g, has_request_context, request
+
+from music_ml.utils.metrics import REGISTRY
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# 'json' (one object per line) or 'text'; text by default in development
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text' if os.getenv('FLASK_ENV') == 'development' else 'json')
+# Records waiting for the writer thread; beyond this they are dropped rather than block a request
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+# Fraction of requests whose access line and sub-WARNING records are kept, by default and per
+# endpoint ('auth.check_auth=0.01,metrics.metrics=0'); errors and slow requests are always kept
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', 1.0))
+LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', 'auth.check_auth=0.01,metrics.metrics=0')
+LOG_SLOW_REQUEST = float(os.getenv('LOG_SLOW_REQUEST', 1.0))  # seconds
+
+REDACTED = '[REDACTED]'
+SECRET_KEYS = frozenset({
+    'access_token', 'refresh_token', 'client_secret', 'code', 'authorization', 'cookie', 'set-cookie',
+    'password', 'secret', 'token', 'spotify_auth_session',
+})
+_SECRET_PATTERN = re.compile(
+    r'(?i)(\b(?:access_token|refresh_token|client_secret|code|token|authorization|spotify_auth_session)'
+    r'["\']?\s*[:=]\s*["\']?)(?:(?:bearer|basic)\s+)?[^\s"\'&,;}]+'
+)
+_BEARER_PATTERN = re.compile(r'(?i)\b(bearer|basic)\s+[A-Za-z0-9._~+/=-]+')
+
+# LogRecord attributes; anything else on a record came in through `extra`
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+LOG_RECORDS_DROPPED = REGISTRY.counter(
+    'music_ml_log_records_dropped_total', 'Log records discarded because the log queue was full.')
+
+requests_logger = logging.getLogger('music_ml.requests')
+
+
+def redact(value):
+    """Copy of `value` with secrets masked: values under secret-looking keys, tokens in strings."""
+    if isinstance(value, str):
+        return _BEARER_PATTERN.sub(r'\1 ' + REDACTED, _SECRET_PATTERN.sub(r'\1' + REDACTED, value))
+    if isinstance(value, dict):
+        return {key: REDACTED if str(key).lower() in SECRET_KEYS else redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+def record_extras(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with secrets redacted and `extra` fields included."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': redact(record.getMessage()),
+            **redact(record_extras(record)),
+        }
+        if record.exc_text or record.exc_info:
+            entry['exception'] = redact(record.exc_text or self.formatException(record.exc_info))
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for development: the message, then `extra` fields as key=value."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        line = super().formatMessage(record)
+        extras = redact(record_extras(record))
+        if extras:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in extras.items())
+        return line
+
+    def format(self, record: logging.LogRecord) -> str:
+        return redact(super().format(record))
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to a writer thread. The calling thread only interpolates
+    the message (its arguments may change once the call returns); formatting,
+    redaction and I/O happen on the writer. A full queue drops the record.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class RequestSamplingFilter(logging.Filter):
+    """Drops records below WARNING logged while serving a request that was not sampled."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not has_request_context():
+            return True
+        return g.get('log_sampled', True)
+
+
+_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+
+def _start_listener(output: logging.Handler):
+    global _listener
+    _handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # The writer thread did not survive the fork, and its queue may be mid-operation
+    if _listener is not None:
+        _start_listener(_listener.handlers[0])
+
+
+def _stop_listener():
+    # Flush queued records at exit
+    if _listener is not None:
+        _listener.stop()
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream=None):
+    """
+    Route all logging through a bounded queue to a single writer thread.
+    Safe to call more than once; later calls only change the level.
+    """
+    global _handler
+    root = logging.getLogger()
+    root.setLevel(level)
+    with _lock:
+        if _handler is not None:
+            return _handler
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+        _handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        _handler.addFilter(RequestSamplingFilter())
+        root.addHandler(_handler)
+        _start_listener(output)
+        os.register_at_fork(after_in_child=_restart_after_fork)
+        atexit.register(_stop_listener)
+    return _handler
+
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """'auth.check_auth=0.01,metrics.metrics=0' -> {'auth.check_auth': 0.01, 'metrics.metrics': 0.0}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        endpoint, _, rate = item.partition('=')
+        rates[endpoint.strip()] = float(rate)
+    return rates
+
+
+def init_request_logging(app: Flask, default_rate: float = LOG_SAMPLE_RATE, rates: Optional[Dict[str, float]] = None,
+                         slow_threshold: float = LOG_SLOW_REQUEST):
+    """
+    Log one structured line per sampled request, and decide per request
+    whether its DEBUG/INFO records are kept (see RequestSamplingFilter).
+    Server errors and requests slower than `slow_threshold` are always logged.
+    """
+    rates = parse_sample_rates(LOG_SAMPLE_RATES) if rates is None else rates
+
+    @app.before_request
+    def sample_request():
+        rate = rates.get(request.endpoint, default_rate)
+        g.log_started = time.perf_counter()
+        g.log_sample_rate = rate
+        g.log_sampled = rate >= 1 or (rate > 0 and random.random() < rate)
+
+    @app.after_request
+    def log_request(response):
+        started = g.pop('log_started', None)
+        if started is None:
+            return response
+        duration = time.perf_counter() - started
+        if g.log_sampled or response.status_code >= 500 or duration >= slow_threshold:
+            g.log_sampled = True
+            requests_logger.log(
+                logging.WARNING if response.status_code >= 500 else logging.INFO, 'request',
+                extra={'method': request.method, 'path': request.path, 'endpoint': request.endpoint,
+                       'status': response.status_code, 'duration_ms': round(duration * 1000, 2),
+                       'sample_rate': g.log_sample_rate})
+        return response
@@ -0,0 +1,40 @@
+from music_ml.utils.heavy_hitters import SpaceSaving
+
+
+def test_counts_items_exactly_under_capacity():
+    sketch = SpaceSaving(capacity=10)
+    for item in ['a', 'b', 'a', 'c', 'a', 'b']:
+        sketch.add(item)
+
+    assert sketch.top(2) == [('a', 3, 0), ('b', 2, 0)]
+
+
+def test_new_item_replaces_minimum_when_full():
+    sketch = SpaceSaving(capacity=2)
+    for item in ['a', 'a', 'a', 'b', 'c']:
+        sketch.add(item)
+
+    assert len(sketch) == 2
+    # 'c' took over 'b''s count of 1 as its error
+    assert sketch.top(2) == [('a', 3, 0), ('c', 2, 1)]
+
+
+def test_frequent_items_survive_a_long_tail():
+    sketch = SpaceSaving(capacity=20)
+    for i in range(2000):
+        sketch.add('hot' if i % 4 == 0 else f'cold{i}')
+
+    item, count, error = sketch.top(1)[0]
+    assert item == 'hot'
+    assert count - error <= 500 <= count
+
+
+def test_decay_scales_counts():
+    sketch = SpaceSaving(capacity=2)
+    for item in ['a', 'a', 'b']:
+        sketch.add(item)
+    sketch.decay(0.5)
+    sketch.add('c')
+
+    # 'b' was down to 0.5, so it is the one evicted
+    assert sketch.top(2) == [('c', 1.5, 0.5), ('a', 1.0, 0.0)]
@@ -0,0 +1,69 @@
+import pytest
+from flask import Flask
+from music_ml.models.artist import Artist
+from music_ml.models.track import Track
+from music_ml.utils.http_caching import apply_caching, compute_etag, not_modified
+from music_ml.utils.json_serializer import search_response
+
+TRACKS = [
+    Track(spotify_track_id=f't{i}', track_name=f'Track {i}', artist=Artist(name='A', spotify_artist_id='a'))
+    for i in range(30)
+]
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['CACHE_CONTROL'] = {'cached': 'public, max-age=30'}
+
+    @app.route('/cached')
+    def cached():
+        etag = compute_etag([track.spotify_track_id for track in TRACKS])
+        response = not_modified(etag)
+        if response:
+            return response
+        return apply_caching(search_response(TRACKS), etag)
+
+    @app.after_request
+    def add_cors(response):
+        response.headers.add('Access-Control-Allow-Credentials', 'true')
+        return response
+
+    return app
+
+def test_compute_etag_depends_on_ids_order_and_variant():
+    assert compute_etag(['a', 'b']) == compute_etag(['a', 'b'])
+    assert compute_etag(['a', 'b']) != compute_etag(['b', 'a'])
+    assert compute_etag(['a', 'b']) != compute_etag(['a', 'b'], ('spotify_track_id',), False)
+    assert compute_etag(['ab']) != compute_etag(['a', 'b'])
+
+def test_sets_etag_and_cache_control(app):
+    response = app.test_client().get('/cached')
+    assert response.status_code == 200
+    assert response.headers['ETag'] == f'"{compute_etag([track.spotify_track_id for track in TRACKS])}"'
+    assert response.headers['Cache-Control'] == 'public, max-age=30'
+
+def test_conditional_get_returns_304_through_after_request(app):
+    client = app.test_client()
+    etag = client.get('/cached').headers['ETag']
+
+    response = client.get('/cached', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert response.headers['ETag'] == etag
+    assert response.headers['Cache-Control'] == 'public, max-age=30'
+    assert response.headers['Access-Control-Allow-Credentials'] == 'true'
+
+    assert client.get('/cached', headers={'If-None-Match': '"stale"'}).status_code == 200
+
+def test_gzip_representation_has_its_own_etag(app):
+    client = app.test_client()
+    plain = client.get('/cached')
+    compressed = client.get('/cached', headers={'Accept-Encoding': 'gzip'})
+
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.headers['ETag'] != plain.headers['ETag']
+    revalidated = client.get('/cached', headers={'Accept-Encoding': 'gzip',
+                                                 'If-None-Match': compressed.headers['ETag']})
+    assert revalidated.status_code == 304
+    # Without gzip support the compressed representation is no longer acceptable
+    assert client.get('/cached', headers={'If-None-Match': compressed.headers['ETag']}).status_code == 200
@@ -0,0 +1,95 @@
+import gzip
+import json
+import pytest
+from flask import Flask, jsonify
+from music_ml.models.artist import Artist
+from music_ml.models.playlist import Playlist
+from music_ml.models.track import Track
+from music_ml.utils.json_serializer import (
+    GZIP_MIN_SIZE,
+    encode_track,
+    parse_fields,
+    playlist_response,
+    search_response
+)
+
+def make_tracks():
+    return [
+        Track(spotify_track_id='t1', track_name='Café "Live"', artist=Artist(name='A', spotify_artist_id='a'),
+              album_image_url='one.jpg', tempo=120.5),
+        Track(spotify_track_id='t2', track_name='Two', artist=Artist(name='B', spotify_artist_id='b'),
+              genre=None, energy=None),
+    ]
+
+def test_responses_match_jsonify():
+    app = Flask(__name__)
+    tracks = make_tracks()
+    with app.app_context():
+        expected_playlist = jsonify({'playlist': Playlist(tracks=tracks)}).get_json()
+        expected_search = jsonify({'tracks': tracks, 'total_results': 2}).get_json()
+
+        playlist = playlist_response(Playlist(tracks=tracks))
+        search = search_response(tracks)
+
+    assert playlist.mimetype == 'application/json'
+    assert json.loads(playlist.get_data()) == expected_playlist
+    assert json.loads(search.get_data()) == expected_search
+
+def test_encoded_fragments_are_cached_until_the_track_changes():
+    track = make_tracks()[0]
+    first = encode_track(track)
+    assert encode_track(make_tracks()[0]) is first
+
+    track.tempo = 90.0
+    changed = encode_track(track)
+    assert changed is not first
+    assert json.loads(changed)['tempo'] == 90.0
+
+def test_empty_results():
+    app = Flask(__name__)
+    with app.app_context():
+        assert json.loads(search_response([]).get_data()) == {'total_results': 0, 'tracks': []}
+
+
+def test_parse_fields():
+    assert parse_fields(None) is None
+    assert parse_fields('spotify_track_id, artist ,track_name,artist.name') == (
+        'spotify_track_id', 'artist.name', 'artist.spotify_artist_id', 'track_name'
+    )
+    with pytest.raises(ValueError):
+        parse_fields('spotify_track_id,popularity')
+
+def test_field_projection():
+    app = Flask(__name__)
+    with app.app_context():
+        response = search_response(make_tracks(), fields=('spotify_track_id', 'artist.name'))
+    assert json.loads(response.get_data())['tracks'] == [
+        {'spotify_track_id': 't1', 'artist': {'name': 'A'}},
+        {'spotify_track_id': 't2', 'artist': {'name': 'B'}},
+    ]
+
+def test_compact_format():
+    app = Flask(__name__)
+    fields = ('spotify_track_id', 'track_name', 'artist.name')
+    with app.app_context():
+        data = json.loads(playlist_response(Playlist(tracks=make_tracks()), fields, compact=True).get_data())
+    assert data == {
+        'fields': list(fields),
+        'playlist': {'tracks': [['t1', 'Café "Live"', 'A'], ['t2', 'Two', 'B']]}
+    }
+
+def test_large_bodies_are_gzipped_when_accepted():
+    app = Flask(__name__)
+    tracks = make_tracks() * 20
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip, deflate'}):
+        compressed = search_response(tracks)
+        small = search_response(tracks[:1], fields=('spotify_track_id',))
+    with app.test_request_context():
+        plain = search_response(tracks)
+
+    assert len(plain.get_data()) >= GZIP_MIN_SIZE
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert 'Content-Encoding' not in small.headers
+    assert 'Content-Encoding' not in plain.headers
\ No newline at end of file
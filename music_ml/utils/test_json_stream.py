@@ -0,0 +1,27 @@
+import io
+import json
+import pytest
+from music_ml.utils.json_stream import iter_json_records
+
+RECORDS = [{'id': str(i), 'name': f'Track {i}', 'nested': {'values': list(range(i))}} for i in range(50)]
+
+def test_reads_json_lines():
+    stream = io.StringIO('\n'.join(json.dumps(record) for record in RECORDS) + '\n')
+    assert list(iter_json_records(stream, chunk_size=64)) == RECORDS
+
+def test_reads_top_level_array():
+    stream = io.StringIO(json.dumps(RECORDS, indent=2))
+    assert list(iter_json_records(stream, chunk_size=64)) == RECORDS
+
+def test_reads_concatenated_values_larger_than_a_chunk():
+    big = {'items': ['x' * 100] * 20}
+    stream = io.StringIO(json.dumps(big) + json.dumps(RECORDS[1]))
+    assert list(iter_json_records(stream, chunk_size=16)) == [big, RECORDS[1]]
+
+def test_empty_inputs():
+    assert list(iter_json_records(io.StringIO(''))) == []
+    assert list(iter_json_records(io.StringIO(' [ ] '))) == []
+
+def test_truncated_input_raises():
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_records(io.StringIO('{"id": "1", "name": '), chunk_size=8))
@@ -0,0 +1,141 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from flask import Flask
+
+from music_ml.utils.metrics import (
+    MetricsStore,
+    Registry,
+    endpoint_family,
+    init_metrics,
+    merge_snapshots,
+    render,
+    track_upstream,
+)
+
+
+def test_render_counter_and_gauge():
+    registry = Registry()
+    registry.counter('requests_total', 'Requests.', ('route',)).inc(route='/search')
+    registry.gauge('in_flight', 'In flight.').inc(2)
+
+    text = render(registry.snapshot())
+
+    assert '# TYPE requests_total counter\nrequests_total{route="/search"} 1.0\n' in text
+    assert 'in_flight 2.0\n' in text
+
+
+def test_render_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value)
+
+    text = render(registry.snapshot())
+
+    assert 'latency_seconds_bucket{le="0.1"} 1\n' in text
+    assert 'latency_seconds_bucket{le="1.0"} 3\n' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 4\n' in text
+    assert 'latency_seconds_count 4\n' in text
+    assert 'latency_seconds_sum 4.25\n' in text
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.counter('c', 'C.', ('q',)).inc(q='say "hi"\\\n')
+
+    assert 'c{q="say \\"hi\\"\\\\\\n"} 1.0' in render(registry.snapshot())
+
+
+def test_merge_sums_counters_and_only_live_gauges():
+    def snapshot(count, in_flight):
+        registry = Registry()
+        registry.counter('c', 'C.').inc(count)
+        registry.gauge('g', 'G.').inc(in_flight)
+        registry.histogram('h', 'H.', buckets=(1.0,)).observe(count)
+        return registry.snapshot()
+
+    merged = merge_snapshots([(snapshot(1, 1), True), (snapshot(2, 5), False)])
+
+    assert merged['c']['values'] == [[[], 3.0]]
+    assert merged['g']['values'] == [[[], 1.0]]
+    assert merged['h']['values'] == [[[], [1, 1, 3.0]]]
+
+
+def test_store_merges_workers(tmp_path):
+    path = str(tmp_path / 'metrics.db')
+    other, own = MetricsStore(path), MetricsStore(path)
+    other_registry, own_registry = Registry(), Registry()
+    other_registry.counter('c', 'C.').inc(2)
+    own_registry.counter('c', 'C.').inc(1)
+    other.publish(other_registry.snapshot())
+    # Both stores live in this process; give them distinct worker IDs as separate workers would have
+    own._connection()
+    own._worker_id = 'own'
+
+    merged = own.collect(own_registry.snapshot())
+
+    assert merged['c']['values'] == [[[], 3.0]]
+
+
+def test_store_folds_stopped_workers_into_one_row(tmp_path):
+    path = str(tmp_path / 'metrics.db')
+    stores = [MetricsStore(path) for _ in range(3)]
+    for index, store in enumerate(stores):
+        registry = Registry()
+        registry.counter('c', 'C.').inc(index + 1)
+        registry.gauge('g', 'G.').inc(1)
+        # The first two workers last published long ago
+        with patch('music_ml.utils.metrics.time.time', return_value=1000.0 if index < 2 else 5000.0):
+            store.publish(registry.snapshot())
+
+    rows = stores[2]._connection().execute('SELECT worker_id FROM worker_metrics').fetchall()
+    merged = stores[2].collect(registry.snapshot())
+
+    assert sorted(worker_id for worker_id, in rows) == sorted(['retired', stores[2].worker_id])
+    assert merged['c']['values'] == [[[], 6.0]]
+    assert merged['g']['values'] == [[[], 1.0]]
+
+
+@pytest.mark.parametrize('url, family', [
+    ('https://api.spotify.com/v1/search?q=x', 'search'),
+    ('https://api.spotify.com/v1/tracks/t1', 'tracks'),
+    ('https://api.spotify.com/v1/artists/a1/top-tracks?market=US', 'artist_top_tracks'),
+    ('https://api.spotify.com/v1/artists/a1/related-artists', 'artist_related_artists'),
+    ('https://api.spotify.com/v1/me', 'me'),
+    ('https://api.spotify.com/v1/users/u1/playlists', 'user_playlists'),
+    ('https://api.spotify.com/v1/playlists/p1/tracks', 'playlist_tracks'),
+    ('https://accounts.spotify.com/api/token', 'token'),
+])
+def test_endpoint_family(url, family):
+    assert endpoint_family(url) == family
+
+
+@patch('music_ml.utils.metrics.UPSTREAM_RATE_LIMITED')
+@patch('music_ml.utils.metrics.UPSTREAM_REQUESTS')
+def test_track_upstream_counts_status_and_rate_limits(mock_requests, mock_rate_limited):
+    response = MagicMock(status_code=429)
+
+    assert track_upstream('https://api.spotify.com/v1/search?q=x', lambda: response) is response
+
+    mock_requests.inc.assert_called_once_with(endpoint='search', status=429)
+    mock_rate_limited.inc.assert_called_once_with(endpoint='search')
+
+
+@patch('music_ml.utils.metrics.HTTP_IN_FLIGHT')
+@patch('music_ml.utils.metrics.HTTP_LATENCY')
+@patch('music_ml.utils.metrics.HTTP_REQUESTS')
+def test_init_metrics_records_requests_by_route(mock_requests, mock_latency, mock_in_flight):
+    app = Flask(__name__)
+    init_metrics(app)
+
+    @app.route('/tracks/<track_id>')
+    def track(track_id):
+        return 'ok'
+
+    app.test_client().get('/tracks/t1')
+
+    mock_requests.inc.assert_called_once_with(route='/tracks/<track_id>', method='GET', status=200)
+    assert mock_latency.observe.call_args.kwargs == {'route': '/tracks/<track_id>', 'method': 'GET'}
+    mock_in_flight.inc.assert_called_once_with(route='/tracks/<track_id>')
+    mock_in_flight.dec.assert_called_once_with(route='/tracks/<track_id>')
@@ -0,0 +1,27 @@
+import pytest
+from music_ml.utils.pagination import MAX_OFFSET, decode_cursor, encode_cursor, next_cursor, normalize_page_size
+
+def test_normalize_page_size():
+    assert normalize_page_size(None) == 20
+    assert normalize_page_size('1') == 10
+    assert normalize_page_size('20') == 20
+    assert normalize_page_size('21') == 50
+    assert normalize_page_size('5000') == 50
+    for bad in ('0', '-3', 'ten'):
+        with pytest.raises(ValueError):
+            normalize_page_size(bad)
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('héllo / world', 40, 20)
+    assert '=' not in cursor and '/' not in cursor
+    assert decode_cursor(cursor) == ('héllo / world', 40, 20)
+
+def test_invalid_cursors():
+    for bad in ('not a cursor', encode_cursor('q', -10, 20), encode_cursor('q', 0, 7), encode_cursor('q', MAX_OFFSET, 20)):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+def test_next_cursor():
+    assert decode_cursor(next_cursor('q', 0, 20, 20)) == ('q', 20, 20)
+    assert next_cursor('q', 0, 20, 13) is None
+    assert next_cursor('q', MAX_OFFSET - 20, 20, 20) is None
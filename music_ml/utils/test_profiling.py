@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from flask import Flask
+
+from music_ml.utils.profiling import (
+    PROFILE_HEADER,
+    init_profiling,
+    sign_profile_token,
+    span,
+    traced,
+    verify_profile_token,
+)
+
+
+@pytest.fixture
+def profile_dir(tmp_path):
+    directory = str(tmp_path / 'profiles')
+    with patch('music_ml.utils.profiling.PROFILE_DIR', directory), \
+            patch('music_ml.utils.profiling.PROFILE_MAX_FILES', 3):
+        yield directory
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    init_profiling(app)
+
+    @traced('load')
+    def load():
+        time.sleep(0.01)
+
+    @app.route('/work')
+    def work():
+        with span('outer'):
+            load()
+        return 'ok'
+
+    with app.test_client() as client:
+        yield client
+
+
+def read_dumps(directory):
+    if not os.path.isdir(directory):
+        return []
+    return [json.load(open(os.path.join(directory, name))) for name in sorted(os.listdir(directory))
+            if name.endswith('.json')]
+
+
+def test_profile_token_round_trip():
+    token = sign_profile_token('secret')
+
+    assert verify_profile_token(token, 'secret')
+    assert not verify_profile_token(token, 'other')
+    assert not verify_profile_token(token.replace('.', '.0'), 'secret')
+    assert not verify_profile_token(sign_profile_token('secret', ttl=-10), 'secret')
+    assert not verify_profile_token(token, None)
+
+
+def test_span_outside_profiled_request_is_noop():
+    with span('anything'):
+        pass
+
+
+def test_unprofiled_requests_write_nothing(client, profile_dir):
+    response = client.get('/work')
+
+    assert 'X-Profile-Id' not in response.headers
+    assert read_dumps(profile_dir) == []
+
+
+@patch('music_ml.utils.profiling.PROFILE_SECRET', 'secret')
+def test_signed_header_records_spans(client, profile_dir):
+    response = client.get('/work', headers={PROFILE_HEADER: sign_profile_token('secret')})
+
+    [dump] = read_dumps(profile_dir)
+    assert dump['id'] == response.headers['X-Profile-Id']
+    assert dump['reason'] == 'header'
+    assert dump['path'] == '/work?'
+    assert [(item['name'], item['depth']) for item in dump['spans']] == [('outer', 0), ('load', 1)]
+    assert dump['spans'][1]['duration'] >= 0.01
+
+
+@patch('music_ml.utils.profiling.PROFILE_SECRET', 'secret')
+def test_bad_signature_is_ignored(client, profile_dir):
+    client.get('/work', headers={PROFILE_HEADER: sign_profile_token('wrong')})
+
+    assert read_dumps(profile_dir) == []
+
+
+@patch('music_ml.utils.profiling.PROFILE_SLOW_THRESHOLD', 0.005)
+def test_slow_requests_are_kept(client, profile_dir):
+    client.get('/work')
+
+    [dump] = read_dumps(profile_dir)
+    assert dump['reason'] == 'slow'
+
+
+@patch('music_ml.utils.profiling.PROFILE_SLOW_THRESHOLD', 10)
+def test_fast_requests_are_dropped(client, profile_dir):
+    client.get('/work')
+
+    assert read_dumps(profile_dir) == []
+
+
+@patch('music_ml.utils.profiling.PROFILE_MODE', 'cprofile')
+@patch('music_ml.utils.profiling.PROFILE_SAMPLE_RATE', 1.0)
+def test_sampled_cprofile_dump(client, profile_dir):
+    client.get('/work')
+
+    [dump] = read_dumps(profile_dir)
+    assert dump['reason'] == 'sampled'
+    assert os.path.exists(os.path.join(profile_dir, dump['cprofile']))
+
+
+@patch('music_ml.utils.profiling.PROFILE_MODE', 'cprofile')
+@patch('music_ml.utils.profiling.PROFILE_SAMPLE_RATE', 1.0)
+def test_concurrent_cprofile_requests_fall_back_to_spans(profile_dir):
+    app = Flask(__name__)
+    init_profiling(app)
+    both_started = threading.Barrier(2, timeout=5)
+
+    @app.route('/work')
+    def work():
+        with span('outer'):
+            both_started.wait()
+        return 'ok'
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        statuses = list(executor.map(lambda _: app.test_client().get('/work').status_code, range(2)))
+
+    assert statuses == [200, 200]
+    dumps = read_dumps(profile_dir)
+    # One request had the profiler; the other kept its spans
+    assert sorted('cprofile' in dump for dump in dumps) == [False, True]
+    assert all(dump['spans'][0]['name'] == 'outer' for dump in dumps)
+
+
+@patch('music_ml.utils.profiling.PROFILE_MODE', 'stack')
+@patch('music_ml.utils.profiling.PROFILE_SAMPLE_RATE', 1.0)
+def test_sampled_stack_dump(client, profile_dir):
+    client.get('/work')
+
+    [dump] = read_dumps(profile_dir)
+    assert any('load' in stack for stack in dump['stacks'])
+
+
+@patch('music_ml.utils.profiling.PROFILE_SAMPLE_RATE', 1.0)
+def test_dump_directory_is_bounded(client, profile_dir):
+    for _ in range(5):
+        client.get('/work')
+
+    assert len(os.listdir(profile_dir)) == 3
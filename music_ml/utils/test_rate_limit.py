@@ -0,0 +1,126 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from flask import Flask
+
+from music_ml.stores.session_store import StoredSessionInterface
+from music_ml.utils.rate_limit import (
+    MemoryRateLimitStore,
+    RateLimiter,
+    client_key,
+    init_rate_limiting,
+    parse_limits,
+)
+
+
+def make_app(limiter):
+    app = Flask(__name__)
+    app.secret_key = 'test-secret'
+    init_rate_limiting(app, limiter)
+
+    @app.route('/search')
+    def search():
+        return 'ok'
+
+    @app.route('/status')
+    def status():
+        return 'ok'
+
+    return app
+
+
+def test_bucket_allows_burst_then_reports_wait():
+    store = MemoryRateLimitStore()
+    bucket = [('search:ip:1', 2.0, 3.0)]
+
+    assert [store.take(bucket, now=100.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert store.take(bucket, now=100.0) == pytest.approx(0.5)
+    # Half a second later one token has been refilled
+    assert store.take(bucket, now=100.5) == 0.0
+
+
+def test_take_is_all_or_nothing():
+    store = MemoryRateLimitStore()
+    store.take([('empty', 1.0, 1.0)], now=0.0)
+
+    assert store.take([('full', 1.0, 1.0), ('empty', 1.0, 1.0)], now=0.0) == pytest.approx(1.0)
+    # 'full' kept its token
+    assert store.take([('full', 1.0, 1.0)], now=0.0) == 0.0
+
+
+def test_local_buckets_are_bounded():
+    store = MemoryRateLimitStore(max_buckets=2)
+    for key in ('a', 'b', 'c'):
+        store.take([(key, 1.0, 1.0)], now=0.0)
+
+    # 'a' was evicted, so it starts over with a full bucket
+    assert store.take([('a', 1.0, 1.0)], now=0.0) == 0.0
+    assert store.take([('c', 1.0, 1.0)], now=0.0) > 0
+
+
+def test_upstream_budget_is_shared_between_active_clients():
+    limiter = RateLimiter(MemoryRateLimitStore(), limits={}, upstream_endpoints={'search'},
+                          upstream_budget=4.0, upstream_burst=1.0, min_share=0.5)
+
+    assert limiter.check('search', 'a', now=0.0) == 0.0
+    assert limiter.check('search', 'b', now=0.0) == 0.0
+    # Two active clients: 'a' refills at 2 per second
+    assert limiter.check('search', 'a', now=0.0) == pytest.approx(0.5)
+    for client in 'cdefghij':
+        limiter.check('search', client, now=0.0)
+    # Ten active clients would mean 0.4 per second; at the 0.5 floor 'a' has 0.25 tokens after 0.5 s
+    assert limiter.check('search', 'a', now=0.5) == pytest.approx(1.5)
+
+
+def test_over_limit_requests_get_429_with_retry_after():
+    client = make_app(RateLimiter(limits={'search': (1.0, 2.0)}, upstream_budget=0)).test_client()
+
+    statuses = [client.get('/search').status_code for _ in range(3)]
+    response = client.get('/search')
+
+    assert statuses == [200, 200, 429]
+    assert response.headers['Retry-After'] == '1'
+    assert response.get_json()['retry_after'] == 1
+    # Unlisted endpoints and CORS preflights are never limited
+    assert client.get('/status').status_code == 200
+    assert client.options('/search').status_code == 200
+
+
+def test_clients_are_limited_separately_by_forwarded_ip():
+    client = make_app(RateLimiter(limits={'search': (1.0, 1.0)}, upstream_budget=0)).test_client()
+
+    with patch('music_ml.utils.rate_limit.RATE_LIMIT_TRUSTED_PROXIES', 1):
+        first = [client.get('/search', headers={'X-Forwarded-For': 'spoofed, 1.1.1.1'}).status_code
+                 for _ in range(2)]
+        second = client.get('/search', headers={'X-Forwarded-For': 'spoofed, 2.2.2.2'}).status_code
+
+    assert first == [200, 429]
+    assert second == 200
+
+
+def test_client_key_uses_the_session_only_for_signed_in_users():
+    backend = MagicMock()
+    backend.load.side_effect = lambda sid: ({'access_token': 'token'}, 0.0) if sid == 'user' else ({}, 0.0)
+    app = Flask(__name__)
+    app.secret_key = 'test-secret'
+    app.session_interface = StoredSessionInterface(backend)
+    signer = app.session_interface._signer(app)
+    environ = {'REMOTE_ADDR': '3.3.3.3'}
+
+    with app.test_request_context(headers={'Cookie': f'session={signer.sign("user").decode()}'}, environ_base=environ):
+        assert client_key() == 'session:user'
+    # Anonymous sessions share their IP's buckets
+    with app.test_request_context(headers={'Cookie': f'session={signer.sign("anon").decode()}'}, environ_base=environ):
+        assert client_key() == 'ip:3.3.3.3'
+
+    backend.load.reset_mock()
+    with app.test_request_context(headers={'Cookie': 'session=forged'}, environ_base=environ):
+        assert client_key() == 'ip:3.3.3.3'
+    with app.test_request_context(environ_base=environ):
+        assert client_key() == 'ip:3.3.3.3'
+    backend.load.assert_not_called()
+
+
+def test_parse_limits():
+    assert parse_limits('search.search_tracks=5:20, auth.get_user_info=1') == \
+        {'search.search_tracks': (5.0, 20.0), 'auth.get_user_info': (1.0, 1.0)}
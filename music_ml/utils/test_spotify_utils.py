@@ -137,4 +137,19 @@ def test_load_spotify_tracks_without_images():
         }
     }
     tracks = load_spotify_tracks(search_response_json)
-    assert tracks[0].album_image_url is None  # Should handle missing images gracefully
\ No newline at end of file
+    assert tracks[0].album_image_url is None  # Should handle missing images gracefully
+
+def test_get_spotify_access_token_is_cached(monkeypatch):
+    calls = []
+    def mock_post(url, headers, data):
+        calls.append(url)
+        return MockResponseSuccess()
+    monkeypatch.setattr('requests.post', mock_post)
+
+    assert get_spotify_access_token() == "test_token"
+    assert get_spotify_access_token() == "test_token"
+    assert len(calls) == 1
+
+    # A 401 elsewhere forces a new token
+    get_spotify_access_token(force_refresh=True)
+    assert len(calls) == 2
@@ -0,0 +1,132 @@
+import json
+import logging
+import queue
+from unittest.mock import patch
+
+import pytest
+from flask import Flask
+
+from music_ml.utils.structured_logging import (
+    LOG_RECORDS_DROPPED,
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    RequestSamplingFilter,
+    init_request_logging,
+    parse_sample_rates,
+    redact,
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def captured():
+    handler = ListHandler()
+    handler.addFilter(RequestSamplingFilter())
+    logger = logging.getLogger('music_ml')
+    logger.addHandler(handler)
+    level = logger.level
+    logger.setLevel(logging.DEBUG)
+    yield handler.records
+    logger.removeHandler(handler)
+    logger.setLevel(level)
+
+
+def dropped_records():
+    values = LOG_RECORDS_DROPPED.snapshot()['values']
+    return values[0][1] if values else 0
+
+
+def make_app(**kwargs):
+    app = Flask(__name__)
+    init_request_logging(app, **kwargs)
+
+    @app.route('/poll')
+    def poll():
+        logging.getLogger('music_ml.test').debug('polled')
+        return 'ok'
+
+    @app.route('/fail')
+    def fail():
+        return 'error', 500
+
+    return app
+
+
+def test_redact_masks_secret_keys_and_tokens_in_text():
+    assert redact({'access_token': 'abc', 'nested': {'Authorization': 'Bearer x'}, 'n': 1}) == \
+        {'access_token': '[REDACTED]', 'nested': {'Authorization': '[REDACTED]'}, 'n': 1}
+    assert redact('Authorization: Bearer abc.def code=xyz status_code=200') == \
+        'Authorization: [REDACTED] code=[REDACTED] status_code=200'
+    assert redact("{'refresh_token': 'abc'}") == "{'refresh_token': '[REDACTED]'}"
+
+
+def test_json_formatter_includes_extras_and_redacts():
+    record = logging.makeLogRecord({'name': 'x', 'levelno': logging.INFO, 'levelname': 'INFO',
+                                    'msg': 'token=%s', 'args': ('abc',), 'route': '/search', 'cookie': 'c'})
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry['message'] == 'token=[REDACTED]'
+    assert entry['route'] == '/search'
+    assert entry['cookie'] == '[REDACTED]'
+
+
+def test_queue_handler_interpolates_eagerly_and_never_blocks():
+    handler = NonBlockingQueueHandler(queue.Queue(1))
+    logger = logging.getLogger('music_ml.test.queue')
+    logger.addHandler(handler)
+    logger.propagate = False
+    payload = {'n': 1}
+    try:
+        logger.warning('payload %s', payload)
+        payload['n'] = 2
+        dropped = dropped_records()
+        logger.warning('no room')
+    finally:
+        logger.removeHandler(handler)
+        logger.propagate = True
+
+    assert handler.queue.get_nowait().getMessage() == "payload {'n': 1}"
+    assert dropped_records() == dropped + 1
+
+
+def test_unsampled_requests_skip_access_line_and_debug_records(captured):
+    client = make_app(default_rate=1.0, rates={'poll': 0.0}).test_client()
+
+    client.get('/poll')
+
+    assert captured == []
+
+
+def test_sampled_requests_log_access_line(captured):
+    client = make_app(default_rate=1.0, rates={}).test_client()
+
+    client.get('/poll')
+
+    assert [record.getMessage() for record in captured] == ['polled', 'request']
+    assert captured[1].endpoint == 'poll'
+    assert captured[1].status == 200
+
+
+def test_server_errors_and_slow_requests_are_always_logged(captured):
+    client = make_app(default_rate=0.0, rates={}, slow_threshold=0.5).test_client()
+
+    client.get('/fail')
+    with patch('music_ml.utils.structured_logging.time.perf_counter', side_effect=[0.0, 1.0]):
+        client.get('/poll')
+
+    access = [record for record in captured if record.getMessage() == 'request']
+    assert [(record.status, record.levelname) for record in access] == [(500, 'WARNING'), (200, 'INFO')]
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates('auth.check_auth=0.01, metrics.metrics=0,') == \
+        {'auth.check_auth': 0.01, 'metrics.metrics': 0.0}
@@ -0,0 +1,79 @@
+import json
+import os
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask, jsonify, request
+
+from music_ml.stores.tiered_cache import Namespace, TieredCache
+from music_ml.utils.metrics import track_upstream
+from music_ml.utils.traffic_capture import CaptureWriter, init_traffic_capture
+
+
+def read_capture(directory):
+    with open(os.path.join(directory, f'traffic-{os.getpid()}.jsonl')) as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.fixture
+def capture(tmp_path):
+    directory = str(tmp_path / 'traffic')
+    writer = CaptureWriter(directory)
+    cache = TieredCache(namespaces={'search': Namespace(ttl=60)})
+    app = Flask(__name__)
+    init_traffic_capture(app, writer, exclude={'metrics'})
+
+    @app.route('/search', methods=['GET', 'POST'])
+    def search():
+        if request.is_json:
+            # Views may consume the parsed body
+            request.get_json().pop('tracks')
+        cache.get('search', 'q')
+        track_upstream('https://api.spotify.com/v1/search', MagicMock(return_value=MagicMock(status_code=200)))
+        cache.set('search', 'q', 'Q')
+        cache.get('search', 'q')
+        return jsonify([])
+
+    @app.route('/metrics')
+    def metrics():
+        return ''
+
+    yield app.test_client(), writer, directory
+    writer.close()
+
+
+def test_requests_are_captured_with_their_upstream_and_cache_counts(capture):
+    client, writer, directory = capture
+
+    client.get('/search?query=daft+punk&code=secret')
+    client.post('/search', json={'tracks': [{'spotify_track_id': 't1'}], 'access_token': 'secret'})
+    client.get('/metrics')
+    client.options('/search')
+    writer.close()
+
+    first, second = read_capture(directory)
+    assert first['method'] == 'GET'
+    assert first['endpoint'] == 'search'
+    assert first['route'] == '/search'
+    assert first['args'] == {'query': 'daft punk', 'code': '[REDACTED]'}
+    assert first['status'] == 200
+    assert first['duration_ms'] > 0
+    assert (first['upstream_requests'], first['cache_hits'], first['cache_misses']) == (1, 1, 1)
+    assert second['json'] == {'tracks': [{'spotify_track_id': 't1'}], 'access_token': '[REDACTED]'}
+
+
+def test_writer_rotates_and_keeps_a_bounded_number_of_files(tmp_path):
+    directory = str(tmp_path / 'traffic')
+    writer = CaptureWriter(directory, max_bytes=130, backups=2)
+
+    # Two 61-byte lines fit in a file
+    for i in range(10):
+        writer.write({'n': i, 'padding': 'x' * 40})
+    writer.close()
+
+    path = os.path.join(directory, f'traffic-{os.getpid()}.jsonl')
+    assert sorted(os.listdir(directory)) == [os.path.basename(path + suffix) for suffix in ('', '.1', '.2')]
+    with open(path) as f:
+        assert [json.loads(line)['n'] for line in f] == [8, 9]
+    with open(path + '.1') as f:
+        assert [json.loads(line)['n'] for line in f] == [6, 7]
@@ -0,0 +1,24 @@
+import re
+import unicodedata
+from typing import List
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize_text(text: str) -> str:
+    """
+    Case-fold, strip accents and punctuation, and collapse whitespace, so
+    'Beyoncé - Halo' and 'beyonce halo' compare equal.
+    """
+    if not text:
+        return ''
+    text = text.casefold()
+    if not text.isascii():
+        decomposed = unicodedata.normalize('NFKD', text)
+        text = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(_NON_WORD.sub(' ', text).split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized word tokens."""
+    return normalize_text(text).split()
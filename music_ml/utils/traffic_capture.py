@@ -0,0 +1,189 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Iterable, Optional
+
+from flask import Flask, g, request
+
+from music_ml.utils.metrics import REGISTRY, start_request_counts, stop_request_counts
+from music_ml.utils.structured_logging import redact
+
+logger = logging.getLogger(__name__)
+
+# Directory for captured requests, one file per worker process (unset disables capture)
+TRAFFIC_CAPTURE_DIR = os.getenv('TRAFFIC_CAPTURE_DIR')
+# Fraction of requests captured
+TRAFFIC_CAPTURE_SAMPLE_RATE = float(os.getenv('TRAFFIC_CAPTURE_SAMPLE_RATE', 1.0))
+# Endpoints never captured
+TRAFFIC_CAPTURE_EXCLUDE = os.getenv('TRAFFIC_CAPTURE_EXCLUDE', 'metrics.metrics')
+# Each file is rotated at this size, keeping this many old ones
+TRAFFIC_CAPTURE_MAX_BYTES = int(os.getenv('TRAFFIC_CAPTURE_MAX_BYTES', 50 * 1024 * 1024))
+TRAFFIC_CAPTURE_BACKUPS = int(os.getenv('TRAFFIC_CAPTURE_BACKUPS', 5))
+# Records waiting for the writer thread; beyond this they are dropped rather than block a request
+CAPTURE_QUEUE_SIZE = 10000
+# Larger JSON bodies are captured without the body
+MAX_CAPTURED_BODY = 64 * 1024  # bytes
+
+TRAFFIC_RECORDS_DROPPED = REGISTRY.counter(
+    'music_ml_traffic_records_dropped_total', 'Captured requests discarded because the capture queue was full.')
+
+
+class CaptureWriter:
+    """
+    Appends records as JSON lines to <directory>/traffic-<pid>.jsonl from a
+    background thread. Each process writes its own file, so workers never
+    interleave lines or rotate each other's files; a file is rotated at
+    `max_bytes` to .1 (newest) up to .<backups>. A record's raw 'json' body
+    is parsed and secrets are redacted on the writer thread, and a full
+    queue drops records.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = TRAFFIC_CAPTURE_MAX_BYTES,
+                 backups: int = TRAFFIC_CAPTURE_BACKUPS, queue_size: int = CAPTURE_QUEUE_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.queue_size = queue_size
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f'traffic-{os.getpid()}.jsonl')
+
+    def write(self, record: dict):
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            TRAFFIC_RECORDS_DROPPED.inc()
+
+    def close(self, timeout: float = 5.0):
+        """Write out queued records and stop this process's writer thread."""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._pid = None
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Started per process: a writer thread does not survive a fork
+            self._queue = queue.Queue(self.queue_size)
+            self._thread = threading.Thread(target=self._run, args=(self._queue, self.path),
+                                            name='traffic-capture', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self, records: queue.Queue, path: str):
+        output = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            output = open(path, 'ab')
+            while True:
+                record = records.get()
+                if record is None:
+                    break
+                if 'json' in record:
+                    try:
+                        record['json'] = json.loads(record['json'])
+                    except ValueError:
+                        del record['json']
+                line = json.dumps(redact(record), separators=(',', ':'), default=str).encode() + b'\n'
+                if output.tell() and output.tell() + len(line) > self.max_bytes:
+                    output.close()
+                    self._rotate(path)
+                    output = open(path, 'ab')
+                output.write(line)
+                # Flush whenever the queue drains, so the file is current once traffic pauses
+                if records.empty():
+                    output.flush()
+        except Exception:
+            logger.exception('Traffic capture stopped')
+        finally:
+            if output is not None:
+                output.close()
+
+    def _rotate(self, path: str):
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f'{path}.{index}'):
+                os.replace(f'{path}.{index}', f'{path}.{index + 1}')
+        if self.backups:
+            os.replace(path, f'{path}.1')
+        else:
+            os.remove(path)
+
+
+def init_traffic_capture(app: Flask, writer: Optional[CaptureWriter] = None,
+                         sample_rate: float = TRAFFIC_CAPTURE_SAMPLE_RATE,
+                         exclude: Optional[Iterable[str]] = None) -> Optional[CaptureWriter]:
+    """
+    Capture sampled requests for benchmarks/traffic_replay.py: method, route,
+    query parameters and JSON body, status, duration, and the Spotify
+    requests and cache lookups serving them took. No cookies, headers or
+    client addresses are kept. Does nothing unless TRAFFIC_CAPTURE_DIR is set
+    (or a writer is given).
+    """
+    if writer is None:
+        if not TRAFFIC_CAPTURE_DIR:
+            return None
+        writer = CaptureWriter(TRAFFIC_CAPTURE_DIR)
+    if exclude is None:
+        exclude = filter(None, (endpoint.strip() for endpoint in TRAFFIC_CAPTURE_EXCLUDE.split(',')))
+    exclude = frozenset(exclude)
+
+    @app.before_request
+    def start_capture():
+        if request.method == 'OPTIONS' or request.endpoint in exclude:
+            return
+        if sample_rate < 1 and random.random() >= sample_rate:
+            return
+        g.capture_started = (time.time(), time.perf_counter())
+        g.capture_counts = start_request_counts()
+        # The raw body, since views may change the parsed JSON in place; it is parsed on the writer thread
+        if request.is_json and (request.content_length or 0) <= MAX_CAPTURED_BODY:
+            g.capture_body = request.get_data(cache=True)
+
+    @app.after_request
+    def capture_request(response):
+        started = g.pop('capture_started', None)
+        if started is None:
+            return response
+        stop_request_counts()
+        counts = g.pop('capture_counts')
+        record = {
+            'time': round(started[0], 6), 'method': request.method, 'endpoint': request.endpoint,
+            'route': request.url_rule.rule if request.url_rule is not None else None,
+            'path': request.path, 'args': request.args.to_dict(),
+            'status': response.status_code, 'duration_ms': round((time.perf_counter() - started[1]) * 1000, 3),
+            'upstream_requests': counts.get('upstream_requests', 0),
+            'cache_hits': counts.get('cache_hits', 0), 'cache_misses': counts.get('cache_misses', 0),
+        }
+        body = g.pop('capture_body', None)
+        if body:
+            record['json'] = body
+        writer.write(record)
+        return response
+
+    @app.teardown_request
+    def discard_counts(exc):
+        # Only set here if after_request never ran
+        if g.pop('capture_started', None) is not None:
+            stop_request_counts()
+
+    return writer
@@ -1,7 +1,32 @@
-import React from "react";
-import { TextField, Button, Box } from "@mui/material";
+import React, { useEffect, useState } from "react";
+import { Autocomplete, TextField, Button, Box } from "@mui/material";
+import { suggestSongs } from "../services/searchService";
+
+// Suggestions are requested once typing pauses this long, not on every keystroke
+const SUGGEST_DEBOUNCE_MS = 250;
 
 const SearchBar = ({ query, setQuery, onSearch }) => {
+  const [suggestions, setSuggestions] = useState([]);
+
+  useEffect(() => {
+    if (!query.trim()) {
+      setSuggestions([]);
+      return undefined;
+    }
+    let stale = false;
+    const timer = setTimeout(async () => {
+      const results = await suggestSongs(query);
+      // Drop answers to text that has changed since
+      if (!stale) {
+        setSuggestions(results);
+      }
+    }, SUGGEST_DEBOUNCE_MS);
+    return () => {
+      stale = true;
+      clearTimeout(timer);
+    };
+  }, [query]);
+
   return (
     <Box
       sx={{
@@ -11,42 +36,58 @@ const SearchBar = ({ query, setQuery, onSearch }) => {
         marginBottom: 2,
       }}
     >
-      <TextField
-        placeholder="Search for a song"
-        value={query}
-        onChange={(e) => setQuery(e.target.value)}
+      <Autocomplete
+        freeSolo
         fullWidth
-        variant="outlined"
-        size="small"
-        InputProps={{
-          sx: {
-            color: 'white',
-            backgroundColor: 'rgba(255,255,255,0.1)',
-            '&:hover': {
-              backgroundColor: 'rgba(255,255,255,0.15)',
-            },
-            '&.Mui-focused': {
-              backgroundColor: 'rgba(255,255,255,0.1)',
-            },
-            '& input::placeholder': {
-              color: 'rgba(255,255,255,0.7)',
-              opacity: 1,
-            },
-          }
-        }}
-        sx={{
-          '& .MuiOutlinedInput-root': {
-            '& fieldset': {
-              borderColor: '#404040',
-            },
-            '&:hover fieldset': {
-              borderColor: '#666',
-            },
-            '&.Mui-focused fieldset': {
-              borderColor: '#fff',
-            },
-          },
-        }}
+        options={suggestions}
+        // The server already matched and ranked them
+        filterOptions={(options) => options}
+        getOptionLabel={(option) => (typeof option === 'string' ? option : option.text)}
+        renderOption={(props, option) => (
+          <li {...props} key={`${option.type}-${option.spotify_id || option.text}`}>
+            {option.artist_name ? `${option.text} - ${option.artist_name}` : option.text}
+          </li>
+        )}
+        inputValue={query}
+        onInputChange={(event, value) => setQuery(value)}
+        renderInput={(params) => (
+          <TextField
+            {...params}
+            placeholder="Search for a song"
+            variant="outlined"
+            size="small"
+            InputProps={{
+              ...params.InputProps,
+              sx: {
+                color: 'white',
+                backgroundColor: 'rgba(255,255,255,0.1)',
+                '&:hover': {
+                  backgroundColor: 'rgba(255,255,255,0.15)',
+                },
+                '&.Mui-focused': {
+                  backgroundColor: 'rgba(255,255,255,0.1)',
+                },
+                '& input::placeholder': {
+                  color: 'rgba(255,255,255,0.7)',
+                  opacity: 1,
+                },
+              }
+            }}
+            sx={{
+              '& .MuiOutlinedInput-root': {
+                '& fieldset': {
+                  borderColor: '#404040',
+                },
+                '&:hover fieldset': {
+                  borderColor: '#666',
+                },
+                '&.Mui-focused fieldset': {
+                  borderColor: '#fff',
+                },
+              },
+            }}
+          />
+        )}
       />
       <Button
         variant="contained"
@@ -2,12 +2,14 @@ import axios from 'axios';
 
 const API_URL = process.env.REACT_APP_API_URL || 'http://127.0.0.1:5000';
 
-export const searchSongs = async (query, limit = 20) => {
+// Pass the previous response's next_cursor as `cursor` to load the following page
+export const searchSongs = async (query, limit = 20, cursor = null) => {
   try {
     const response = await axios.get(`${API_URL}/search`, {
       params: {
-        query: query,
-        limit: limit,
+        ...(cursor ? { cursor: cursor } : { query: query, limit: limit }),
+        // Only what the result list and selected song display
+        fields: 'spotify_track_id,track_name,artist.name,album_image_url',
       },
       headers: {
         'Content-Type': 'application/json',
@@ -19,4 +21,21 @@ export const searchSongs = async (query, limit = 20) => {
     console.error("Error fetching search results:", error.response?.data || error.message);
     throw error;
   }
-};
\ No newline at end of file
+};
+
+// Search-as-you-type completions; errors give no suggestions rather than interrupt typing
+export const suggestSongs = async (query, limit = 8) => {
+  try {
+    const response = await axios.get(`${API_URL}/search/suggest`, {
+      params: {
+        query: query,
+        limit: limit,
+      },
+    });
+
+    return response.data.suggestions;
+  } catch (error) {
+    console.error("Error fetching suggestions:", error.response?.data || error.message);
+    return [];
+  }
+};